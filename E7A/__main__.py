@@ -0,0 +1,6 @@
+import sys
+
+from E7A.cli import main
+
+
+sys.exit(main())
@@ -1 +1,13 @@
-from .epic7_automator import Epic7Automator
+from E7A.common.utils import lazy_attributes
+
+# Epic7Automator pulls in PyQt6 and adbutils, only import it when it is used.
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    'Epic7Automator': '.epic7_automator',
+    'HeadlessSession': '.headless_runner',
+    'FleetRunner': '.headless_runner',
+    'Watchdog': '.watchdog',
+    'WatchedInstance': '.watchdog'
+})
+
+
+__all__ = ['Epic7Automator', 'HeadlessSession', 'FleetRunner', 'Watchdog', 'WatchedInstance']
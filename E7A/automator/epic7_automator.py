@@ -1,11 +1,10 @@
 import time
 
-from adbutils import adb
 from PyQt6.QtCore import (
     pyqtSignal, pyqtSlot, QObject, QThreadPool, QTimer
 )
 
-from E7A.common import Config, Logger
+from E7A.common import AdbDevicePool, Config, Logger
 from E7A.emulator import MuMuEmulator
 from E7A.ui.ui_main_window import UIMain
 from E7A.ui.utils import ThreadWorker, RunnableWorker
@@ -14,6 +13,8 @@ from E7A.ui.utils import ThreadWorker, RunnableWorker
 class Epic7Automator(QObject):
     emulators_info_updated = pyqtSignal(MuMuEmulator)
     apps_info_updated = pyqtSignal(MuMuEmulator)
+    emulators_diff = pyqtSignal(dict)
+    apps_diff = pyqtSignal(dict)
 
     def __init__(self):
         super().__init__()
@@ -26,8 +27,11 @@ class Epic7Automator(QObject):
             log_name=Config.logger.log_name.replace("TIMESTAMP", TIMESTAMP),
             fmt=Config.logger.fmt
         )
+        # adb devices, connected and health-checked in the background.
+        self.adb_pool = AdbDevicePool(self.logger)
+
         # Initialize Ui windows.
-        self.main_window: UIMain = UIMain(self.logger)
+        self.main_window: UIMain = UIMain(self.logger, self.adb_pool)
 
 
         # Initialize emulator
@@ -48,11 +52,15 @@ class Epic7Automator(QObject):
         self._initialize_automator()
 
     def _setup_connections(self) -> None:
+        # adb state changes are reported from the pool thread, the signal is queued to the GUI thread.
+        self.adb_pool.add_listener(lambda serial, state: self.emulators_info_updated.emit(self._emulator))
         # periodic_task
         self._periodic_task_timer.timeout.connect(self._on_periodic_timer_timeout)
         # emulator info update
         self.emulators_info_updated.connect(self.main_window.on_emulator_info_updated)
         self.apps_info_updated.connect(self.main_window.on_apps_info_updated)
+        self.emulators_diff.connect(self.main_window.on_emulators_diff)
+        self.apps_diff.connect(self.main_window.on_apps_diff)
 
         # main window
         self.main_window.emulator_launch_button.pressed.connect(self._launch_target_emulator)
@@ -67,8 +75,8 @@ class Epic7Automator(QObject):
 
     def _initialize_automator(self):
         # self._periodic_task_timer.start(3000)
-        self.emulators_info_updated.emit(self._emulator)
-        self.apps_info_updated.emit(self._emulator)
+        self._track_target_adb()
+        self.main_window.reset_models(self._emulator)
 
     @pyqtSlot()
     def _on_periodic_timer_timeout(self) -> None:
@@ -80,25 +88,33 @@ class Epic7Automator(QObject):
 
     def _periodic_tasks(self):
         self._periodic_task_count += 1
-        # Update emulators and app info
-        previous_emulator_info = self._emulator.get_emulator_info()
-        previous_apps_info = self._emulator.get_app_info()
-        self._emulator.update()
-        if previous_emulator_info != self._emulator.get_emulator_info():
-            self.emulators_info_updated.emit(self._emulator)
-        if previous_apps_info != self._emulator.get_app_info():
-            self.apps_info_updated.emit(self._emulator)
+        self._update_emulator()
         self.logger.debug(f"periodic_task_count: {self._periodic_task_count}")
 
+    def _update_emulator(self) -> None:
+        # Update emulators and app info, records are updated in place and only the diffs are sent to the UI.
+        diff = self._emulator.update()
+        if diff["emulators"]:
+            self.emulators_diff.emit(diff["emulators"])
+        if diff["apps"]:
+            self.apps_diff.emit(diff["apps"])
+
     @pyqtSlot()
     def _on_target_assigned(self):
         # Target emulator index is changed through UI.
         if new_index := self.main_window.emulator_index_comboBox.currentText():
             self._emulator.target_emulator_index = new_index
-            self._emulator.update()
+            self._update_emulator()
+            self._track_target_adb()
             self.emulators_info_updated.emit(self._emulator)
             self.apps_info_updated.emit(self._emulator)
 
+    def _track_target_adb(self) -> None:
+        # Let the pool connect the running target emulator in the background.
+        adb_ip, adb_port = self._emulator.target_emulator_adb_address
+        if adb_ip and adb_port:
+            self.adb_pool.add(f"{adb_ip}:{adb_port}")
+
     @pyqtSlot()
     def _launch_target_emulator(self):
         self._emulator.launch_target_emulator()
@@ -108,19 +124,16 @@ class Epic7Automator(QObject):
     def _shutdown_target_emulator(self):
         self._emulator.shutdown_target_emulator()
         self.main_window.logger.info(f"Emulator {self._emulator.target_emulator_index} stopping...")
-        QTimer.singleShot(500, self._emulator.update)
-        QTimer.singleShot(600, lambda: self.emulators_info_updated.emit(self._emulator))
+        QTimer.singleShot(500, self._update_emulator)
 
     @pyqtSlot()
     def _launch_target_app(self):
         app_name = self.main_window.applist_combobox.currentText()
-        reverse_dict = self._emulator.app_name2pkg_dict(
-            self._emulator.target_emulator_apps_info
-        )
-        pkg_name = reverse_dict[app_name]
+        # The app model keeps the package of every row.
+        pkg_name = self.main_window.applist_combobox.currentData()
         self._emulator.launch_app_on_target_emulator(pkg_name)
         self.main_window.logger.info(f"App {app_name} launched")
-        self._emulator.update()
+        self._update_emulator()
         self.apps_info_updated.emit(self._emulator)
 
     @pyqtSlot()
@@ -128,27 +141,28 @@ class Epic7Automator(QObject):
         active_app_pkg = self._emulator.target_emulator_apps_info["active"]
         self._emulator.close_app_on_target_emulator(active_app_pkg)
         self.main_window.logger.info(f"App {active_app_pkg} closed")
-        self._emulator.update()
+        self._update_emulator()
         self.apps_info_updated.emit(self._emulator)
 
     @pyqtSlot()
     def _connect_target_adb(self):
         adb_serial = self.main_window.adb_address_lineEdit.text()
         if adb_serial:
-            adb.connect(adb_serial)
-            self.main_window.logger.info(f"Connected to {adb_serial}")
+            self.adb_pool.add(adb_serial)
+            self.adb_pool.check_now(adb_serial)
+            self.main_window.logger.info(f"Connecting to {adb_serial}...")
         else:
             self.main_window.logger.error(f"Failed to connect adb. Adb address is empty")
-        self._emulator.update()
+        self._update_emulator()
         self.emulators_info_updated.emit(self._emulator)
 
     @pyqtSlot()
     def _disconnect_target_adb(self):
         adb_serial = self.main_window.adb_address_lineEdit.text()
         if adb_serial:
-            adb.disconnect(adb_serial)
+            self.adb_pool.remove(adb_serial)
             self.main_window.logger.info(f"Disconnected from {adb_serial}")
         else:
             self.main_window.logger.error(f"Failed to disconnect adb. Adb address is empty")
-        self._emulator.update()
+        self._update_emulator()
         self.emulators_info_updated.emit(self._emulator)
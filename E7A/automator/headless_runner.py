@@ -0,0 +1,449 @@
+import os
+import time
+import threading
+from typing import TYPE_CHECKING, Optional
+
+import yaml
+
+from E7A.common import Config, Logger
+from E7A.common.frame_pool import memory_accounting
+from E7A.common.profiles import EmulatorProfile
+from E7A.emulator import ActionLayer, DeviceTransform, MuMuEmulator
+
+if TYPE_CHECKING:
+    from E7A.fleet.task_queue import WorkStealingQueue
+
+
+def load_script(script_path: str) -> list[dict]:
+    """
+    Load a task script, a YAML list of single-key steps, e.g.
+
+        - launch_app: com.stove.epic7.google
+        - sleep: 5
+        - tap: [640, 360]
+        - tap_at: [0.5, 0.5]    # normalized, needs capture
+        - tap_confirm: {at: [0.5, 0.9], region: [0.4, 0.8, 0.2, 0.2], timeout: 1, retries: 1}
+        - wait_settle: {timeout: 10, threshold: 2, stable_frames: 5, region: [0, 0, 1, 0.8]}
+        - swipe: [[100, 500], [900, 500], 300]
+        - key: 4
+        - screenshot: arena.png    # relative to the profile screenshot_save_dir
+        - capture_state: idle    # paused / idle / active / critical, see CaptureGovernor
+        - expect_transition: 2
+
+    :param script_path: Path of the YAML script.
+    :return: List of steps.
+    """
+    with open(script_path, "rb") as f:
+        steps = yaml.safe_load(f.read().decode("utf-8"))
+    return steps if steps else []
+
+
+class LatencyStats:
+    """
+    Collects durations in seconds and summarizes them.
+    """
+    __slots__ = ("samples",)
+
+    def __init__(self):
+        self.samples: list[float] = []
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    @property
+    def count(self) -> int:
+        return len(self.samples)
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def summary(self) -> str:
+        return (
+            f"n={self.count:<5} p50={self.percentile(50) * 1000:8.1f}ms "
+            f"p95={self.percentile(95) * 1000:8.1f}ms max={self.percentile(100) * 1000:8.1f}ms"
+        )
+
+
+class HeadlessSession:
+    """
+    Drive a single emulator without any Qt object: emulator control, scrcpy capture and scripted steps.
+    """
+    def __init__(
+            self,
+            index: int,
+            logger: Logger = None,
+            capture: bool = True,
+            max_fps: Optional[int] = None,
+            launch: bool = False,
+            launch_timeout: float = 120.0,
+            profile: Optional[EmulatorProfile] = None,
+            emulator: Optional[MuMuEmulator] = None
+    ):
+        """
+        :param index: MuMu emulator index.
+        :param logger: Parent logger.
+        :param capture: Stream frames, unless the profile capture backend is "none".
+        :param max_fps: Capture frame rate, default profile.max_fps.
+        :param launch: Launch the emulator if it is not running.
+        :param launch_timeout: Seconds to wait for the emulator to finish starting.
+        :param profile: Emulator settings, default Config.profile(index).
+        :param emulator: MuMuEmulator to control, e.g. a simulated one, default a new one.
+        """
+        if logger is None:
+            self.logger = Logger(f"{self.__class__.__name__}-{index}")
+        else:
+            self.logger = logger.get_child_logger(f"{self.__class__.__name__}-{index}")
+        self.index = index
+        self.profile = profile if profile is not None else Config.profile(index)
+        self.capture = capture and self.profile.capture_backend != "none"
+        self.max_fps = max_fps if max_fps is not None else self.profile.max_fps
+        self.launch = launch
+        self.launch_timeout = launch_timeout
+
+        if emulator is None:
+            emulator = MuMuEmulator(self.logger)
+        else:
+            emulator.update()
+        # The index setter only logs an invalid index and keeps the old target, usually VM 0.
+        if index not in emulator.available_emulators:
+            raise ValueError(f"Invalid emulator index: {index}. Valid indices: {emulator.available_emulators}")
+        self.emulator = emulator
+        self.emulator.target_emulator_index = index
+        self.scrcpy_manager = None
+        self.adb_serial: Optional[str] = None
+        self.actions: Optional[ActionLayer] = None
+        self.governor = None
+        self.step_stats: dict[str, LatencyStats] = {}
+        self.frame_intervals = LatencyStats()
+        self._last_frame: Optional[tuple[int, float]] = None    # (frame_count, frame_time)
+        self.steps_done = 0
+        self.errors = 0
+        self._started_at = 0.0
+        self._stopped_at = 0.0
+
+    @property
+    def elapsed(self) -> float:
+        end = self._stopped_at or time.perf_counter()
+        return end - self._started_at if self._started_at else 0.0
+
+    def start(self) -> bool:
+        """
+        Make sure the emulator runs and start capturing.
+
+        :return: Whether the session is ready.
+        """
+        self._started_at = time.perf_counter()
+        if self.emulator.target_emulator_state != "start_finished":
+            if not self.launch:
+                self.logger.error(f"Emulator {self.index} is not running, use launch=True to start it.")
+                return False
+            self.emulator.launch_target_emulator()
+            deadline = time.monotonic() + self.launch_timeout
+            while self.emulator.target_emulator_state != "start_finished":
+                if time.monotonic() > deadline:
+                    self.logger.error(f"Emulator {self.index} did not start in {self.launch_timeout}s.")
+                    return False
+                time.sleep(self.profile.poll_interval)
+                self.emulator.update()
+
+        if self.capture:
+            from adbutils import adb
+            from E7A.common import ScrcpyManager
+
+            if self.profile.adb_address:
+                serial = self.profile.adb_address
+            else:
+                adb_ip, adb_port = self.emulator.target_emulator_adb_address
+                serial = f"{adb_ip}:{adb_port}" if adb_ip else self.profile.adb_serial
+            adb.connect(serial)
+            self.adb_serial = serial
+            device = adb.device(serial=serial)
+            self.scrcpy_manager = ScrcpyManager(self.logger, device, self.max_fps)
+            self.scrcpy_manager.start()
+            self.actions = ActionLayer(
+                self.emulator, DeviceTransform.for_device(device, self.profile.roi_scale), self.logger,
+                self.scrcpy_manager
+            )
+            from E7A.common import CaptureGovernor
+            self.governor = CaptureGovernor(self.scrcpy_manager, self.logger)
+            self.governor.start()
+        return True
+
+    def stop(self) -> None:
+        if self.governor is not None:
+            self.governor.stop()
+        if self.scrcpy_manager is not None:
+            self.scrcpy_manager.stop()
+        if self.adb_serial is not None:
+            # The next start queries the resolution again, it may have changed in between.
+            DeviceTransform.invalidate(self.adb_serial)
+        self._stopped_at = time.perf_counter()
+
+    def run_script(self, steps: list[dict], loops: int = 1, stop_event: threading.Event = None) -> None:
+        """
+        Run the steps of a script, measuring the latency of each step type.
+
+        :param steps: Steps from load_script.
+        :param loops: Number of times the script is repeated.
+        :param stop_event: Set to abort between steps.
+        """
+        for _ in range(loops):
+            for step in steps:
+                if stop_event is not None and stop_event.is_set():
+                    return
+                (action, argument), = step.items()
+                start = time.perf_counter()
+                try:
+                    self._run_step(action, argument)
+                except Exception as e:
+                    self.errors += 1
+                    self.logger.error(f"Step {action} failed: {e.__class__.__name__}: {e}")
+                    continue
+                self.step_stats.setdefault(action, LatencyStats()).add(time.perf_counter() - start)
+                self.steps_done += 1
+                self._sample_frames()
+
+    def run_for(self, duration: float, stop_event: threading.Event = None) -> None:
+        """
+        Only capture frames for duration seconds.
+        """
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            if stop_event is not None and stop_event.is_set():
+                return
+            self._sample_frames()
+            time.sleep(0.001)
+
+    def summary(self) -> str:
+        elapsed = max(self.elapsed, 1e-9)
+        lines = [
+            f"emulator {self.index}: {self.steps_done} steps in {elapsed:.1f}s "
+            f"({self.steps_done / elapsed:.2f} steps/s), {self.errors} errors"
+        ]
+        for action, stats in sorted(self.step_stats.items()):
+            lines.append(f"  {action:<12} {stats.summary()}")
+        if self.scrcpy_manager is not None:
+            frames = self.scrcpy_manager.frame_count
+            lines.append(
+                f"  {'frames':<12} {frames} ({frames / elapsed:.1f} fps), interval {self.frame_intervals.summary()}"
+            )
+        if self.governor is not None:
+            lines.append(f"  {'governor':<12} {self.governor.summary()}")
+        return "\n".join(lines)
+
+    def _run_step(self, action: str, argument) -> None:
+        match action:
+            case "tap":
+                self.emulator.send_tap(*argument)
+            case "tap_at":
+                if self.actions is None:
+                    raise RuntimeError("normalized taps need a capture device")
+                self.actions.tap(*argument)
+            case "tap_confirm":
+                if self.actions is None:
+                    raise RuntimeError("confirmed taps need a capture device")
+                argument = dict(argument)
+                nx, ny = argument.pop("at")
+                if self.governor is not None:
+                    self.governor.expect_transition(argument.get("timeout", 1.0) * (argument.get("retries", 1) + 1))
+                confirmation = self.actions.tap_and_confirm(nx, ny, **argument)
+                if not confirmation:
+                    raise RuntimeError(f"tap at {(nx, ny)} not confirmed after {confirmation.attempts} attempts")
+            case "swipe":
+                self.emulator.send_swipe(*argument)
+            case "key":
+                self.emulator.send_key(argument)
+            case "sleep":
+                time.sleep(float(argument))
+            case "launch_app":
+                self.emulator.launch_app_on_target_emulator(argument)
+            case "close_app":
+                self.emulator.close_app_on_target_emulator(argument)
+            case "capture_state" | "expect_transition":
+                if self.governor is None:
+                    raise RuntimeError("capture is disabled")
+                if action == "capture_state":
+                    self.governor.set_state(argument)
+                else:
+                    self.governor.expect_transition(float(argument))
+            case "wait_settle":
+                if self.scrcpy_manager is None:
+                    raise RuntimeError("capture is disabled")
+                from E7A.graphics.settle_detector import SettleDetector
+
+                argument = dict(argument or {})
+                timeout = argument.pop("timeout", 10.0)
+                if not SettleDetector(**argument).wait(self.scrcpy_manager, timeout):
+                    raise RuntimeError(f"screen did not settle in {timeout}s")
+            case "update":
+                self.emulator.update()
+            case "screenshot":
+                if self.scrcpy_manager is None or self.scrcpy_manager.frame_count == 0:
+                    raise RuntimeError("no frame captured yet")
+                self.scrcpy_manager.capture_screenshot(self._screenshot_path(argument))
+            case _:
+                raise ValueError(f"Unknown step: {action}")
+
+    def _screenshot_path(self, file_name: str) -> str:
+        save_dir = self.profile.screenshot_save_dir
+        if save_dir is None:
+            ui_config = getattr(Config, "ui", None)
+            save_dir = getattr(ui_config, "screenshot_save_dir", None)
+        if not save_dir or os.path.isabs(file_name):
+            return file_name
+        os.makedirs(save_dir, exist_ok=True)
+        return os.path.join(save_dir, file_name)
+
+    def _sample_frames(self) -> None:
+        # Frame intervals are sampled from the latest frame timestamps, no per-frame callback is added.
+        if self.scrcpy_manager is None:
+            return
+        frame_count, frame_time = self.scrcpy_manager.frame_count, self.scrcpy_manager.frame_time
+        previous = self._last_frame
+        if previous is not None and frame_count > previous[0]:
+            self.frame_intervals.add((frame_time - previous[1]) / (frame_count - previous[0]))
+        self._last_frame = (frame_count, frame_time)
+
+
+class FleetRunner:
+    """
+    Run one HeadlessSession per emulator in its own thread and summarize throughput.
+    """
+    def __init__(
+            self,
+            indices: list[int],
+            logger: Logger = None,
+            watchdog: bool = False,
+            app_package: Optional[str] = None,
+            **session_kwargs
+    ):
+        """
+        :param indices: MuMu emulator indices.
+        :param logger: Parent logger.
+        :param watchdog: Watch the sessions and recover stuck instances.
+        :param app_package: Package the watchdog expects in the foreground, None to skip that check.
+        :param session_kwargs: Arguments of HeadlessSession.
+        """
+        if logger is None:
+            self.logger = Logger(self.__class__.__name__)
+        else:
+            self.logger = logger.get_child_logger(self.__class__.__name__)
+        self.sessions = [HeadlessSession(index, self.logger, **session_kwargs) for index in indices]
+        self.stop_event = threading.Event()
+        self.task_queue: Optional["WorkStealingQueue"] = None
+        self._elapsed = 0.0
+        self.app_package = app_package
+        self.watchdog = None
+        if watchdog:
+            from E7A.common import AdbDevicePool
+            from E7A.automator.watchdog import Watchdog
+            self.watchdog = Watchdog(self.logger, AdbDevicePool(self.logger))
+
+    def run(
+            self,
+            steps: Optional[list[dict]] = None,
+            loops: int = 1,
+            duration: float = 0.0,
+            task_queue: "WorkStealingQueue" = None,
+            accounts: Optional[dict[int, str]] = None
+    ) -> None:
+        """
+        :param steps: Script steps run by every session, None to only capture.
+        :param loops: Script repetitions.
+        :param duration: Capture-only duration when steps is None.
+        :param task_queue: Run the tasks of this queue instead of steps, every task payload holds its own steps.
+        :param accounts: Account logged in on each emulator index, for tasks pinned to an account.
+        """
+        start = time.perf_counter()
+        self.task_queue = task_queue
+        if task_queue is not None:
+            for session in self.sessions:
+                task_queue.register(session.index, (accounts or {}).get(session.index))
+        if self.watchdog is not None:
+            self.watchdog.adb_pool.start()
+            self.watchdog.start()
+        threads = [
+            threading.Thread(target=self._run_session, args=(session, steps, loops, duration), daemon=True)
+            for session in self.sessions
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            self.stop_event.set()
+            for thread in threads:
+                thread.join()
+        if self.watchdog is not None:
+            self.watchdog.stop()
+            self.watchdog.adb_pool.stop()
+        self._elapsed = time.perf_counter() - start
+
+    def summary(self) -> str:
+        lines = [session.summary() for session in self.sessions]
+        elapsed = max(self._elapsed, 1e-9)
+        steps = sum(session.steps_done for session in self.sessions)
+        all_steps = LatencyStats()
+        for session in self.sessions:
+            for stats in session.step_stats.values():
+                all_steps.samples.extend(stats.samples)
+        lines.append(
+            f"fleet: {len(self.sessions)} emulators, {steps} steps in {elapsed:.1f}s "
+            f"({steps / elapsed:.2f} steps/s), step latency {all_steps.summary()}"
+        )
+        if self.watchdog is not None:
+            lines.append(f"watchdog: {self.watchdog.summary()}")
+        if self.task_queue is not None:
+            lines.append(f"tasks: {self.task_queue.summary()}")
+        lines.append(f"memory: {memory_accounting.summary()}")
+        return "\n".join(lines)
+
+    def _run_session(self, session: HeadlessSession, steps, loops: int, duration: float) -> None:
+        try:
+            if not session.start():
+                return
+            if self.watchdog is not None:
+                from E7A.automator.watchdog import WatchedInstance
+                self.watchdog.watch(WatchedInstance(
+                    session.index, session.scrcpy_manager, session.governor,
+                    session.adb_serial, self.app_package
+                ))
+            if self.task_queue is not None:
+                self._work_queue(session)
+            elif steps is not None:
+                session.run_script(steps, loops, self.stop_event)
+            else:
+                session.run_for(duration, self.stop_event)
+        except Exception as e:
+            session.errors += 1
+            self.logger.error(f"Session {session.index} failed: {e.__class__.__name__}: {e}")
+        finally:
+            if self.task_queue is not None and not self.stop_event.is_set():
+                # Left to the other sessions, or failed if pinned to this emulator.
+                self.task_queue.retire(session.index)
+            if self.watchdog is not None:
+                self.watchdog.unwatch(session.index)
+            session.stop()
+
+    def _work_queue(self, session: HeadlessSession) -> None:
+        while not self.stop_event.is_set():
+            task = self.task_queue.take(session.index, stop_event=self.stop_event)
+            if task is None:
+                return
+            errors = session.errors
+            try:
+                session.run_script(task.payload.get("steps", []), task.payload.get("loops", 1), self.stop_event)
+            except Exception as e:
+                self.task_queue.complete(task.task_id, False, error=f"{e.__class__.__name__}: {e}")
+                raise
+            if self.stop_event.is_set():
+                # Interrupted, the journal keeps the task running so that the next run starts it again.
+                return
+            failed = session.errors - errors
+            self.task_queue.complete(
+                task.task_id, failed == 0, error=f"{failed} steps failed" if failed else None
+            )
@@ -0,0 +1,338 @@
+import time
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional
+
+from E7A.common import Logger
+from E7A.common.metrics import metrics_registry
+from E7A.emulator import DeviceTransform, MuMuEmulator
+
+# Recovery steps tried in order for each kind of problem, and the seconds each step may take to fix it.
+ESCALATION = {
+    "frozen": ["restart_capture", "restart_app", "reconnect_adb", "restart_emulator"],
+    "app": ["restart_app", "restart_emulator"],
+    "adb": ["reconnect_adb", "restart_emulator"],
+    "emulator": ["restart_emulator"],
+}
+DEFAULT_STEP_BUDGETS = {
+    "restart_capture": 10.0,
+    "restart_app": 60.0,
+    "reconnect_adb": 20.0,
+    "restart_emulator": 180.0,
+}
+# adb states a healthy instance may be in. After reconnect_adb and restart_emulator only "device" counts,
+# a just re-added serial is "connecting" before anything is known about it.
+HEALTHY_ADB_STATES = ("device", "connecting")
+_RECOVERIES = metrics_registry.counter(
+    "e7a_watchdog_recoveries_total", "Watchdog recoveries by problem and outcome.", ["problem", "result"]
+)
+_RECOVERY_SECONDS = metrics_registry.histogram(
+    "e7a_watchdog_recovery_seconds", "Duration of watchdog recoveries.", ["problem"],
+    buckets=(1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+)
+
+
+@dataclass
+class WatchedInstance:
+    """
+    What the watchdog needs to know about one emulator instance.
+    """
+    index: int
+    scrcpy_manager: Optional[object] = None
+    governor: Optional[object] = None    # CaptureGovernor of scrcpy_manager, capture restarts go through it
+    adb_serial: Optional[str] = None
+    app_package: Optional[str] = None
+    recovering: bool = field(default=False, init=False)
+    unhealthy_since: Optional[float] = field(default=None, init=False)
+    # Thread of the latest recovery step, it may outlive its budget.
+    step_thread: Optional[threading.Thread] = field(default=None, init=False)
+
+
+@dataclass(frozen=True)
+class RecoveryRecord:
+    index: int
+    problem: str
+    steps: tuple[str, ...]
+    duration: float
+    success: bool
+
+
+class Watchdog:
+    """
+    Detect stuck instances (frozen frames, dead adb, stopped emulator or game) and recover them
+    by escalating through capture restart, app restart, adb reconnect and emulator restart.
+    Every recovery runs in its own thread, so one bad instance never stalls the others.
+
+    Emulator and app states come from a MuMuEmulator of the watchdog, polled at most once per interval
+    for the whole fleet, and recovery steps are sent through it too, never through the MuMuEmulator
+    the session of an instance is using.
+    """
+    def __init__(
+            self,
+            logger: Logger = None,
+            adb_pool=None,
+            interval: float = 2.0,
+            frame_timeout: float = 10.0,
+            grace: float = 5.0,
+            step_budgets: Optional[dict[str, float]] = None,
+            emulator: Optional[MuMuEmulator] = None
+    ):
+        """
+        :param logger: Parent logger.
+        :param adb_pool: AdbDevicePool used for adb health and reconnects.
+        :param interval: Seconds between health checks.
+        :param frame_timeout: Seconds without a new frame before a capturing instance counts as frozen.
+        :param grace: Seconds a problem must persist before recovery starts.
+        :param step_budgets: Seconds each recovery step may take, default DEFAULT_STEP_BUDGETS.
+        :param emulator: MuMuEmulator polled for the states of all instances, default a new one on start().
+        """
+        if logger is None:
+            self.logger = Logger(self.__class__.__name__)
+        else:
+            self.logger = logger.get_child_logger(self.__class__.__name__)
+        self.adb_pool = adb_pool
+        self.interval = interval
+        self.frame_timeout = frame_timeout
+        self.grace = grace
+        self.step_budgets = dict(DEFAULT_STEP_BUDGETS, **(step_budgets or {}))
+
+        self.emulator = emulator
+        self.instances: dict[int, WatchedInstance] = {}
+        self.records: list[RecoveryRecord] = []
+        self._lock = threading.Lock()
+        # Serializes polls of emulator between the watch thread and recovery threads.
+        self._poll_lock = threading.Lock()
+        # Held while the target emulator of emulator is set and a command is sent to it.
+        self._target_lock = threading.Lock()
+        self._polled_at = 0.0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self, instance: WatchedInstance) -> None:
+        with self._lock:
+            self.instances[instance.index] = instance
+        if self.adb_pool is not None and instance.adb_serial:
+            self.adb_pool.add(instance.adb_serial)
+
+    def unwatch(self, index: int) -> None:
+        with self._lock:
+            self.instances.pop(index, None)
+
+    def start(self) -> None:
+        if self.emulator is None:
+            self.emulator = MuMuEmulator(self.logger)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._watch_loop, name="Watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def check(self, instance: WatchedInstance, adb_states: tuple[str, ...] = HEALTHY_ADB_STATES) -> Optional[str]:
+        """
+        :param instance: Watched instance.
+        :param adb_states: adb pool states counted as healthy.
+        :return: The problem of the instance, a key of ESCALATION, or None if it is healthy.
+        """
+        self._poll()
+        if self._emulator_state(instance.index) != "start_finished":
+            return "emulator"
+        if self.adb_pool is not None and instance.adb_serial:
+            if self.adb_pool.state(instance.adb_serial) not in adb_states:
+                return "adb"
+        scrcpy_manager = instance.scrcpy_manager
+        if scrcpy_manager is not None and scrcpy_manager.alive and scrcpy_manager.frame_count > 0:
+            if time.monotonic() - scrcpy_manager.frame_time > self.frame_timeout:
+                return "frozen"
+        if instance.app_package:
+            apps_info = self.emulator.get_app_info(instance.index)
+            if apps_info and apps_info.get("active") != instance.app_package:
+                return "app"
+        return None
+
+    def summary(self) -> str:
+        with self._lock:
+            records = list(self.records)
+        if not records:
+            return "no recoveries"
+        succeeded = [record for record in records if record.success]
+        durations = sorted(record.duration for record in succeeded)
+        median = durations[len(durations) // 2] if durations else 0.0
+        return (
+            f"{len(records)} recoveries, {len(succeeded)} succeeded, "
+            f"median recovery {median:.1f}s, max {max((r.duration for r in records), default=0.0):.1f}s"
+        )
+
+    def _poll(self) -> None:
+        # One "info all" and "app info all" per interval serve every instance.
+        with self._poll_lock:
+            if time.monotonic() - self._polled_at >= self.interval / 2:
+                self.emulator.update()
+                self._polled_at = time.monotonic()
+
+    def _emulator_state(self, index: int) -> str:
+        info = self.emulator.get_emulator_info(index)
+        return (info or {}).get("player_state") or "stopped"
+
+    def _watch_loop(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            with self._lock:
+                instances = [instance for instance in self.instances.values() if not instance.recovering]
+            for instance in instances:
+                try:
+                    problem = self.check(instance)
+                except Exception as e:
+                    self.logger.error(f"Health check of emulator {instance.index} failed: {e.__class__.__name__}: {e}")
+                    continue
+                if problem is None:
+                    instance.unhealthy_since = None
+                    continue
+                now = time.monotonic()
+                if instance.unhealthy_since is None:
+                    instance.unhealthy_since = now
+                if now - instance.unhealthy_since >= self.grace:
+                    instance.recovering = True
+                    threading.Thread(
+                        target=self._recover, args=(instance, problem), name=f"Recovery-{instance.index}", daemon=True
+                    ).start()
+
+    def _recover(self, instance: WatchedInstance, problem: str) -> None:
+        start = time.monotonic()
+        steps = []
+        success = False
+        self.logger.warning(f"Emulator {instance.index} is unhealthy ({problem}), recovering")
+        try:
+            for step in ESCALATION[problem]:
+                if self._stop_event.is_set():
+                    break
+                if instance.step_thread is not None and instance.step_thread.is_alive():
+                    # Two steps on one instance would fight each other, e.g. a launch during a shutdown.
+                    self.logger.error(
+                        f"Emulator {instance.index} is still running step {instance.step_thread.name}, "
+                        f"giving up this recovery"
+                    )
+                    break
+                steps.append(step)
+                deadline = time.monotonic() + self.step_budgets[step]
+                if not self._run_step_within(instance, step, deadline):
+                    continue
+                adb_states = ("device",) if step in ("reconnect_adb", "restart_emulator") else HEALTHY_ADB_STATES
+                if self._wait_healthy(instance, deadline, adb_states):
+                    success = True
+                    break
+        finally:
+            duration = time.monotonic() - start
+            with self._lock:
+                self.records.append(RecoveryRecord(instance.index, problem, tuple(steps), duration, success))
+            _RECOVERIES.labels(problem=problem, result="recovered" if success else "failed").inc()
+            _RECOVERY_SECONDS.labels(problem=problem).observe(duration)
+            instance.unhealthy_since = None
+            instance.recovering = False
+        if success:
+            self.logger.info(f"Emulator {instance.index} recovered by {steps[-1]} in {duration:.1f}s")
+        else:
+            self.logger.error(f"Emulator {instance.index} not recovered after {steps} ({duration:.1f}s)")
+
+    def _run_step_within(self, instance: WatchedInstance, step: str, deadline: float) -> bool:
+        """
+        Run a step in its own thread and give up on it at deadline, a hung MuMuManager or adb call
+        must not hold the watch loop. A step given up on keeps running in the background,
+        no other step of the instance is started until it ends.
+
+        :return: Whether the step finished without error before deadline.
+        """
+        errors = []
+
+        def run() -> None:
+            try:
+                self._run_step(instance, step, deadline)
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=run, name=f"Recovery-{instance.index}-{step}", daemon=True)
+        instance.step_thread = thread
+        thread.start()
+        thread.join(max(0.0, deadline - time.monotonic()))
+        if thread.is_alive():
+            self.logger.error(f"Recovery step {step} of emulator {instance.index} exceeded its budget")
+            return False
+        if errors:
+            self.logger.error(f"Recovery step {step} of emulator {instance.index} failed: {errors[0]}")
+            return False
+        return True
+
+    def _wait_healthy(
+            self,
+            instance: WatchedInstance,
+            deadline: float,
+            adb_states: tuple[str, ...] = HEALTHY_ADB_STATES
+    ) -> bool:
+        while time.monotonic() < deadline:
+            if self._stop_event.wait(min(self.interval, max(0.0, deadline - time.monotonic()))):
+                return False
+            try:
+                if self.check(instance, adb_states) is None:
+                    # A restarted emulator or adb connection leaves the scrcpy client dead.
+                    self._restart_capture(instance, only_dead=True)
+                    return True
+            except Exception:
+                continue
+        return False
+
+    @staticmethod
+    def _restart_capture(instance: WatchedInstance, only_dead: bool = False) -> None:
+        scrcpy_manager = instance.scrcpy_manager
+        if scrcpy_manager is None or (only_dead and scrcpy_manager.alive):
+            return
+        if instance.governor is not None:
+            # The governor keeps its frame rate and leaves a paused stream paused.
+            instance.governor.restart_capture()
+        else:
+            scrcpy_manager.restart()
+            if not scrcpy_manager.alive:
+                scrcpy_manager.start()
+
+    @contextmanager
+    def _targeting(self, index: int):
+        """
+        Point emulator at index for the commands sent inside the block.
+        """
+        with self._target_lock:
+            self.emulator.target_emulator_index = index
+            yield self.emulator
+
+    def _run_step(self, instance: WatchedInstance, step: str, deadline: float) -> None:
+        self.logger.info(f"Emulator {instance.index}: {step}")
+        match step:
+            case "restart_capture":
+                self._restart_capture(instance)
+            case "restart_app":
+                if instance.app_package:
+                    with self._targeting(instance.index) as emulator:
+                        emulator.close_app_on_target_emulator(instance.app_package)
+                    time.sleep(1)
+                    with self._targeting(instance.index) as emulator:
+                        emulator.launch_app_on_target_emulator(instance.app_package)
+            case "reconnect_adb":
+                if self.adb_pool is not None and instance.adb_serial:
+                    self.adb_pool.remove(instance.adb_serial)
+                    self.adb_pool.add(instance.adb_serial)
+            case "restart_emulator":
+                with self._targeting(instance.index) as emulator:
+                    emulator.shutdown_target_emulator()
+                # Half of the budget at most, the other half is left for the launch.
+                stop_deadline = min(time.monotonic() + 30, deadline - self.step_budgets[step] / 2)
+                while self._emulator_state(instance.index) != "stopped" and time.monotonic() < stop_deadline:
+                    if self._stop_event.wait(1):
+                        return
+                    self._poll()
+                with self._targeting(instance.index) as emulator:
+                    emulator.launch_target_emulator()
+                if instance.adb_serial:
+                    DeviceTransform.invalidate(instance.adb_serial)
+            case _:
+                raise ValueError(f"Unknown recovery step: {step}")
@@ -0,0 +1,244 @@
+"""
+Headless entry point of E7A. Nothing here imports PyQt6, run it with "python -m E7A".
+"""
+import sys
+import time
+import argparse
+from pprint import pformat
+
+from E7A.common import Config, Logger
+from E7A.common.utils import import_time_report, cold_start_time
+
+# Modules reported by "import-report" when none are given.
+DEFAULT_REPORT_MODULES = [
+    "E7A.common",
+    "E7A.emulator",
+    "E7A.graphics",
+    "E7A.common.ScrcpyManager",
+    "E7A.automator.epic7_automator",
+]
+
+
+def create_logger() -> Logger:
+    """
+    Create the root logger from Config.logger, falling back to console logging.
+    """
+    timestamp = time.strftime("%Y-%m-%d_%H-%M-%S", time.localtime(time.time()))
+    logger_config = getattr(Config, "logger", None)
+    if logger_config is None:
+        return Logger("E7A")
+    return Logger(
+        logger_name=logger_config.logger_name,
+        log_dir=logger_config.log_dir,
+        log_name=logger_config.log_name.replace("TIMESTAMP", timestamp),
+        fmt=logger_config.fmt
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="e7a", description="Headless Epic7 Automation runner.")
+    parser.add_argument("--config", default="config/config.yaml", help="Path or URL of config.yaml.")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("info", help="Print emulator and app info reported by MuMuManager.")
+
+    run_parser = subparsers.add_parser("run", help="Run a script on a single emulator.")
+    run_parser.add_argument("--index", type=int, default=None, help="Emulator index, default Config.emulator.vm_index.")
+    add_session_arguments(run_parser)
+
+    fleet_parser = subparsers.add_parser("fleet", help="Run a script on several emulators in parallel.")
+    fleet_indices = fleet_parser.add_mutually_exclusive_group(required=True)
+    fleet_indices.add_argument("--indices", type=int, nargs="+", help="Emulator indices.")
+    fleet_indices.add_argument("--all", action="store_true", help="Every emulator known to MuMuManager.")
+    add_session_arguments(fleet_parser)
+    fleet_parser.add_argument("--routine", default=None,
+                              help="YAML daily routine shared by the emulators, see task_queue.load_routine.")
+    fleet_parser.add_argument("--journal", default=None,
+                              help="Progress journal of the routine, an interrupted run resumes from it.")
+    fleet_parser.add_argument("--accounts", nargs="+", default=[], metavar="INDEX=ACCOUNT",
+                              help="Account logged in on each emulator, for tasks pinned to an account.")
+
+    coordinator_parser = subparsers.add_parser("coordinator", help="Distribute tasks over fleet agents.")
+    coordinator_parser.add_argument("--listen", default="127.0.0.1:7770", help="Listening host:port.")
+    coordinator_parser.add_argument("--script", default=None, help="YAML task script submitted as each task.")
+    coordinator_parser.add_argument("--tasks", type=int, default=10, help="Number of tasks submitted.")
+    coordinator_parser.add_argument("--sleep", type=float, default=0.5,
+                                    help="Seconds of each synthetic task when no script is given.")
+    coordinator_parser.add_argument("--agents", type=int, default=1, help="Agents to wait for before submitting.")
+    coordinator_parser.add_argument("--spawn-agents", type=int, default=0,
+                                    help="Start this many local agent processes, for tests on one machine.")
+    coordinator_parser.add_argument("--simulate", type=int, default=4,
+                                    help="Simulated emulators of every spawned agent.")
+    coordinator_parser.add_argument("--timeout", type=float, default=600.0, help="Seconds to wait for the tasks.")
+
+    agent_parser = subparsers.add_parser("agent", help="Run tasks of a coordinator on local emulators.")
+    agent_parser.add_argument("--connect", default="127.0.0.1:7770", help="Coordinator host:port.")
+    agent_emulators = agent_parser.add_mutually_exclusive_group(required=True)
+    agent_emulators.add_argument("--indices", type=int, nargs="+", help="Local emulator indices.")
+    agent_emulators.add_argument("--simulate", type=int, help="Drive this many simulated emulators instead.")
+    agent_parser.add_argument("--no-capture", action="store_true", help="Do not stream frames with scrcpy.")
+
+    report_parser = subparsers.add_parser("import-report", help="Show where import time goes.")
+    report_parser.add_argument("modules", nargs="*", default=DEFAULT_REPORT_MODULES)
+    report_parser.add_argument("--top", type=int, default=15, help="Number of slowest imports listed.")
+    report_parser.add_argument("--repeats", type=int, default=5, help="Cold start runs per module.")
+    return parser
+
+
+def add_session_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--script", default=None, help="YAML task script, see headless_runner.load_script.")
+    parser.add_argument("--loops", type=int, default=1, help="Script repetitions.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Capture-only seconds without a script.")
+    parser.add_argument("--max-fps", type=int, default=None, help="Capture frame rate, default from the profile.")
+    parser.add_argument("--no-capture", action="store_true", help="Do not stream frames with scrcpy.")
+    parser.add_argument("--launch", action="store_true", help="Launch emulators which are not running.")
+    parser.add_argument("--watchdog", action="store_true", help="Recover stuck emulators, apps and adb.")
+    parser.add_argument("--app-package", default=None, help="Package the watchdog expects in the foreground.")
+
+
+def run_sessions(args: argparse.Namespace) -> int:
+    from E7A.automator.headless_runner import FleetRunner, load_script
+    from E7A.emulator import MuMuEmulator
+
+    Config.load_config(args.config)
+    logger = create_logger()
+    if args.command == "run":
+        indices = [args.index if args.index is not None else Config.emulator.vm_index]
+    elif args.all:
+        indices = MuMuEmulator(logger).available_emulators
+    else:
+        indices = args.indices
+
+    runner = FleetRunner(
+        indices,
+        logger,
+        capture=not args.no_capture,
+        max_fps=args.max_fps,
+        launch=args.launch,
+        watchdog=args.watchdog,
+        app_package=args.app_package
+    )
+    steps = load_script(args.script) if args.script else None
+    task_queue = None
+    if getattr(args, "routine", None):
+        from E7A.fleet.task_queue import WorkStealingQueue, load_routine
+
+        task_queue = WorkStealingQueue(args.journal, logger)
+        added = task_queue.add(load_routine(args.routine))
+        logger.info(f"Routine {args.routine}: {added} new tasks, {len(task_queue.tasks)} in total")
+    accounts = {int(index): account for index, _, account in (item.partition("=") for item in args.accounts)} \
+        if getattr(args, "accounts", None) else None
+    try:
+        runner.run(steps, args.loops, args.duration, task_queue, accounts)
+    finally:
+        if task_queue is not None:
+            task_queue.close()
+    print(runner.summary())
+    return 0 if all(session.errors == 0 for session in runner.sessions) else 1
+
+
+def run_coordinator(args: argparse.Namespace) -> int:
+    import subprocess
+    from E7A.fleet.coordinator import FleetCoordinator
+    from E7A.fleet.protocol import parse_address
+    from E7A.automator.headless_runner import load_script
+
+    Config.load_config(args.config)
+    logger = create_logger()
+    coordinator = FleetCoordinator(*parse_address(args.listen, 7770), logger)
+    coordinator.start()
+    host, port = coordinator.address
+    agents = [
+        subprocess.Popen([
+            sys.executable, "-m", "E7A", "--config", args.config,
+            "agent", "--connect", f"{host}:{port}", "--simulate", str(args.simulate)
+        ])
+        for _ in range(args.spawn_agents)
+    ]
+    try:
+        if not coordinator.wait_for_agents(max(args.agents, args.spawn_agents), timeout=60):
+            logger.error("Not enough agents connected in 60s")
+            return 1
+        if args.script:
+            steps = load_script(args.script)
+            task_ids = [coordinator.submit("script", {"steps": steps}) for _ in range(args.tasks)]
+        else:
+            task_ids = [coordinator.submit("sleep", {"seconds": args.sleep}) for _ in range(args.tasks)]
+        finished = coordinator.wait(task_ids, args.timeout)
+        print(coordinator.summary())
+        return 0 if finished and coordinator.metrics()["failed"] == 0 else 1
+    finally:
+        coordinator.stop()
+        for agent in agents:
+            agent.wait(timeout=30)
+
+
+def run_agent(args: argparse.Namespace) -> int:
+    from E7A.fleet.agent import FleetAgent
+    from E7A.fleet.protocol import parse_address
+
+    Config.load_config(args.config)
+    logger = create_logger()
+    if args.simulate:
+        from E7A.simulator.fake_manager import FakeMuMuManager, SimulatedMuMuEmulator
+
+        manager = FakeMuMuManager.create(count=args.simulate)
+        agent = FleetAgent(
+            parse_address(args.connect, 7770),
+            list(range(args.simulate)),
+            logger,
+            emulator_factory=lambda index: SimulatedMuMuEmulator(manager, logger),
+            capture=False
+        )
+    else:
+        agent = FleetAgent(parse_address(args.connect, 7770), args.indices, logger, capture=not args.no_capture)
+    agent.run()
+    return 0
+
+
+def run_info(args: argparse.Namespace) -> int:
+    from E7A.emulator import MuMuEmulator
+
+    Config.load_config(args.config)
+    emulator = MuMuEmulator(create_logger())
+    print(pformat(emulator.get_emulator_info()))
+    print(pformat(emulator.get_app_info()))
+    return 0
+
+
+def run_import_report(args: argparse.Namespace) -> int:
+    for module in args.modules:
+        print(import_time_report(module, args.top))
+        try:
+            print(f"cold start (best of {args.repeats}): {cold_start_time(module, args.repeats) * 1000:.1f} ms\n")
+        except Exception as e:
+            print(f"cold start failed: {e}\n")
+    return 0
+
+
+def main(argv: list[str] = None) -> int:
+    # Unknown arguments are left for Config, e.g. --emulator_vm_index 1.
+    args, _ = build_parser().parse_known_args(argv)
+    if args.metrics_port is not None:
+        from E7A.common.metrics import MetricsServer, metrics_registry
+        server = MetricsServer(metrics_registry, port=args.metrics_port)
+        server.start()
+        print(f"Metrics on http://{server.address[0]}:{server.address[1]}/metrics", file=sys.stderr)
+    match args.command:
+        case "info":
+            return run_info(args)
+        case "run" | "fleet":
+            return run_sessions(args)
+        case "coordinator":
+            return run_coordinator(args)
+        case "agent":
+            return run_agent(args)
+        case "import-report":
+            return run_import_report(args)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
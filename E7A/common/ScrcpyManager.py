@@ -1,4 +1,8 @@
+import time
+import weakref
+import threading
 import traceback
+from typing import Optional
 
 import cv2
 import scrcpy
@@ -6,6 +10,28 @@ import numpy
 from adbutils import adb, AdbDevice
 
 from E7A.common import Logger
+from E7A.common.frame_pool import memory_accounting
+from E7A.common.metrics import metrics_registry
+
+_FRAMES = metrics_registry.counter("e7a_capture_frames_total", "Frames received from scrcpy.", ["serial"])
+_FRAMES_DROPPED = metrics_registry.counter(
+    "e7a_capture_frames_dropped_total", "Frames replaced by a newer one before any consumer read them.", ["serial"]
+)
+# Live managers, read by the frame rate gauge at scrape time.
+_managers: "weakref.WeakSet[ScrcpyManager]" = weakref.WeakSet()
+
+
+def _frame_rates() -> dict[tuple, float]:
+    now = time.monotonic()
+    rates = {}
+    for manager in list(_managers):
+        # A stalled stream reads 0, not the rate it had before stalling.
+        stalled = manager.frame_time == 0.0 or now - manager.frame_time > max(1.0, 3 * manager._frame_interval)
+        rates[(manager.serial,)] = 0.0 if stalled or not manager._frame_interval else 1 / manager._frame_interval
+    return rates
+
+
+metrics_registry.gauge("e7a_capture_fps", "Frame rate received from scrcpy.", ["serial"], _frame_rates)
 
 
 class ScrcpyManager:
@@ -14,8 +40,16 @@ class ScrcpyManager:
             logger: Logger = None,
             device: AdbDevice = None,
             max_frame: int = 30,
-            threaded: bool = True
+            threaded: bool = True,
+            bitrate: int = 8000000
     ):
+        """
+        :param logger: Parent logger.
+        :param device: adb device to stream, None leaves the manager unconnected.
+        :param max_frame: Maximum frame rate.
+        :param threaded: Run the client in its own thread.
+        :param bitrate: Video bitrate in bit/s.
+        """
         super().__init__()
         if logger is not None:
             self.logger = logger.get_child_logger(self.__class__.__name__)
@@ -24,37 +58,194 @@ class ScrcpyManager:
         self.device = device
         self.max_frame = max_frame
         self.threaded = threaded
+        self.bitrate = bitrate
         self.client = None
         self._frame = None
+        self._frame_count: int = 0
+        self._frame_time: float = 0.0    # time.monotonic() of the latest frame
+        # CPU time of the client (decoder) threads, measured from inside the frame callback.
+        self._decode_cpu_time: float = 0.0
+        self._decoded_frames: int = 0
+        self._thread_cpu_mark: Optional[float] = None
+        # Smoothed seconds between frames, and whether a consumer read the latest frame.
+        self._frame_interval: float = 0.0
+        self._frame_read = True
+        self._frames_metric = _FRAMES.labels(serial=self.serial)
+        self._frames_dropped_metric = _FRAMES_DROPPED.labels(serial=self.serial)
+        _managers.add(self)
+        self._views = None
+        self._graph = None
+        # Notified on every frame, see wait_for_frame().
+        self._frame_condition = threading.Condition()
         self._initialize_scrcpy()
 
     @property
     def frame(self):
+        self._frame_read = True
         return self._frame
 
+    @property
+    def serial(self) -> str:
+        return getattr(self.device, "serial", None) or "none"
+
+    def snapshot(self) -> tuple[Optional[numpy.ndarray], int]:
+        """
+        :return: The latest frame and its id, read together so the id always belongs to the frame.
+        """
+        with self._frame_condition:
+            self._frame_read = True
+            return self._frame, self._frame_count
+
+    @property
+    def views(self):
+        """
+        FrameViews of the frame of the last refresh(): BGR, gray and HSV, each converted at most once per frame.
+        Consumers declare their needs with views.require(name, {"gray", ...}).
+        Reading it never converts, so the buffers only change when refresh() is called.
+        """
+        if self._views is None:
+            from E7A.graphics.frame_views import FrameViews
+            self._views = FrameViews()
+        return self._views
+
+    def refresh(self) -> int:
+        """
+        Move views to the latest frame, converting the declared views of it.
+
+        :return: Id of the frame views now holds, 0 if no frame was received.
+        """
+        frame, frame_count = self.snapshot()
+        if frame is not None and frame_count > 0:
+            self.views.update(frame, frame_count)
+        return frame_count
+
+    @property
+    def graph(self):
+        """
+        FrameGraph of the latest frame, recognizer nodes are memoized per frame.
+        It converts into its own FrameViews, so the buffers of views are never rewritten by it.
+        """
+        if self._graph is None:
+            from E7A.graphics.frame_graph import FrameGraph
+            self._graph = FrameGraph()
+        frame, frame_count = self.snapshot()
+        if frame is not None and frame_count > 0:
+            self._graph.update(frame, frame_count)
+        return self._graph
+
+    @property
+    def frame_count(self) -> int:
+        """
+        Number of frames received since the manager was created, also used as the id of the latest frame.
+        """
+        return self._frame_count
+
+    @property
+    def frame_time(self) -> float:
+        """
+        time.monotonic() of the latest frame, 0 if no frame was received.
+        """
+        return self._frame_time
+
+    @property
+    def decode_cpu_time(self) -> float:
+        """
+        CPU seconds spent by the scrcpy client threads between the first and the latest frame of each run.
+        """
+        return self._decode_cpu_time
+
+    @property
+    def cpu_per_frame(self) -> float:
+        """
+        Average CPU seconds spent per received frame, 0 until two frames were received.
+        """
+        return self._decode_cpu_time / self._decoded_frames if self._decoded_frames else 0.0
+
+    @property
+    def alive(self) -> bool:
+        return self.client is not None and self.client.alive
+
+    def wait_for_frame(self, after: int, timeout: Optional[float] = None) -> bool:
+        """
+        Block until a frame newer than the frame id after arrives.
+
+        :param after: Frame id (frame_count) already seen.
+        :param timeout: Maximum seconds to wait, None to wait forever.
+        :return: Whether a newer frame arrived.
+        """
+        with self._frame_condition:
+            return self._frame_condition.wait_for(lambda: self._frame_count > after, timeout)
+
     def connect(self, device: AdbDevice, max_frame: int = 30):
-        self.client = scrcpy.Client(device, max_fps=max_frame)
+        self.client = scrcpy.Client(device, max_fps=max_frame, bitrate=self.bitrate)
         self.client.add_listener(scrcpy.EVENT_FRAME, self._on_frame)
         self.client.add_listener(scrcpy.EVENT_INIT, self._on_init)
 
     def start(self):
         self.client.start(threaded=self.threaded)
 
+    def stop(self):
+        if self.client is not None:
+            self.client.stop()
+        self._thread_cpu_mark = None
+
+    def restart(self, max_frame: Optional[int] = None, bitrate: Optional[int] = None):
+        """
+        Restart the client with another frame rate or bitrate, scrcpy can not change them on a live stream.
+
+        :param max_frame: New maximum frame rate, None to keep the current one.
+        :param bitrate: New video bitrate in bit/s, None to keep the current one.
+        """
+        if self.device is None:
+            return
+        was_alive = self.alive
+        self.stop()
+        if max_frame is not None:
+            self.max_frame = max_frame
+        if bitrate is not None:
+            self.bitrate = bitrate
+        self.connect(self.device, self.max_frame)
+        if was_alive:
+            self.start()
+
     def _initialize_scrcpy(self):
         if self.device is None:
             self.logger.warning(f"scrcpy failed to initialize with empty adb device list")
         else:
-            self._frame = numpy.zeros(self.device.window_size())
+            # window_size() is (width, height), the placeholder is a black BGR frame like the decoded ones.
+            width, height = self.device.window_size()
+            self._frame = numpy.zeros((height, width, 3), dtype=numpy.uint8)
             self.connect(self.device, self.max_frame)
 
     def _on_frame(self, frame):
         if frame is not None:
-            self._frame = frame
+            # The decoder allocates every frame and never writes it again, so it is published as is:
+            # consumers may keep a frame, e.g. an ROI view of it, for as long as they need.
+            memory_accounting.set("decoder", self, frame.nbytes)
+            now = time.monotonic()
+            if self._frame_time:
+                interval = now - self._frame_time
+                self._frame_interval = 0.9 * self._frame_interval + 0.1 * interval if self._frame_interval else interval
+            if not self._frame_read:
+                self._frames_dropped_metric.inc()
+            self._frames_metric.inc()
+            with self._frame_condition:
+                self._frame = frame
+                self._frame_count += 1
+                self._frame_time = now
+                self._frame_read = False
+                self._frame_condition.notify_all()
+            # The callback runs on the client thread, so thread_time() includes the decoding of this frame.
+            thread_cpu = time.thread_time()
+            if self._thread_cpu_mark is not None:
+                self._decode_cpu_time += thread_cpu - self._thread_cpu_mark
+                self._decoded_frames += 1
+            self._thread_cpu_mark = thread_cpu
 
     def _on_init(self):
         if self.client:
             self.logger.info(f"Scrcpy initialized with device: {self.client.device_name}")
 
     def capture_screenshot(self, save_path: str):
-        cv2.imwrite(save_path, self.current_frame)
+        cv2.imwrite(save_path, self.frame)
         self.logger.info(f"Screenshot saved to {save_path}")
@@ -1,8 +1,18 @@
 from .utils import *
-from .config import Config
 from .error_handler import error_handler
 from .logger import Logger
-from .ScrcpyManager import ScrcpyManager
+
+# Heavier submodules are imported on first access, so that "from E7A.common import Config"
+# does not pay for cv2, scrcpy and numpy pulled in by ScrcpyManager.
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    'Config': '.config',
+    'ScrcpyManager': '.ScrcpyManager',
+    'AdbDevicePool': '.adb_pool',
+    'CaptureGovernor': '.capture_governor',
+    'MemoryAccounting': '.frame_pool',
+    'MetricsRegistry': '.metrics',
+    'MetricsServer': '.metrics'
+})
 
 
 __all__ = [
@@ -10,5 +20,10 @@ __all__ = [
     'Config',
     'error_handler',
     'Logger',
-    'ScrcpyManager'
+    'ScrcpyManager',
+    'AdbDevicePool',
+    'CaptureGovernor',
+    'MemoryAccounting',
+    'MetricsRegistry',
+    'MetricsServer'
 ]
@@ -0,0 +1,212 @@
+import time
+import threading
+from typing import Callable, Optional
+
+from adbutils import adb, AdbDevice
+from adbutils.errors import AdbError
+
+from E7A.common.logger import Logger
+
+
+class _PooledDevice:
+    __slots__ = ("serial", "device", "state", "name", "failures", "next_check")
+
+    def __init__(self, serial: str):
+        self.serial = serial
+        self.device: Optional[AdbDevice] = None
+        self.state: str = "connecting"
+        self.name: Optional[str] = None    # ro.product.name, cached once read
+        self.failures: int = 0
+        self.next_check: float = 0.0
+
+
+class AdbDevicePool:
+    """
+    Keep one AdbDevice per serial alive.
+    A background thread health-checks the devices, reconnects dropped ones with exponential backoff
+    and caches static props, so callers (e.g. the GUI thread) never block on adb.
+    """
+    def __init__(
+            self,
+            logger: Logger = None,
+            check_interval: float = 2.0,
+            min_backoff: float = 1.0,
+            max_backoff: float = 30.0,
+            connect_timeout: float = 3.0
+    ):
+        """
+        :param logger: Parent logger.
+        :param check_interval: Seconds between health checks of a healthy device.
+        :param min_backoff: First reconnect delay in seconds after a failure.
+        :param max_backoff: Maximum reconnect delay in seconds.
+        :param connect_timeout: Timeout of adb connect in seconds.
+        """
+        if logger is None:
+            self.logger = Logger(self.__class__.__name__)
+        else:
+            self.logger = logger.get_child_logger(self.__class__.__name__)
+        self.check_interval = check_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.connect_timeout = connect_timeout
+
+        self._devices: dict[str, _PooledDevice] = {}
+        self._listeners: list[Callable[[str, str], None]] = []
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    @property
+    def serials(self) -> list[str]:
+        return list(self._devices)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._health_loop, name="AdbDevicePool", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def add_listener(self, callback: Callable[[str, str], None]) -> None:
+        """
+        :param callback: Called with (serial, new state) from the pool thread when a device state changes.
+        """
+        self._listeners.append(callback)
+
+    def add(self, serial: str) -> None:
+        """
+        Track a serial. It is connected in the background, this never blocks.
+
+        :param serial: adb serial, e.g. "127.0.0.1:16384".
+        """
+        with self._condition:
+            if serial not in self._devices:
+                self._devices[serial] = _PooledDevice(serial)
+                self._condition.notify_all()
+        self.start()
+
+    def remove(self, serial: str, disconnect: bool = True) -> None:
+        """
+        Stop tracking a serial.
+
+        :param serial: adb serial.
+        :param disconnect: Also run adb disconnect.
+        """
+        with self._condition:
+            entry = self._devices.pop(serial, None)
+        if entry is not None and disconnect:
+            try:
+                adb.disconnect(serial)
+            except AdbError as e:
+                self.logger.warning(f"adb disconnect {serial} failed: {e}")
+            self._notify(serial, "removed")
+
+    def get(self, serial: str, timeout: float = 0.0) -> Optional[AdbDevice]:
+        """
+        Return the device of serial if it is ready.
+
+        :param serial: adb serial, added to the pool if unknown.
+        :param timeout: Seconds to wait for the device to become ready, 0 to return immediately.
+        :return: The AdbDevice, or None if it is not ready.
+        """
+        if serial not in self._devices:
+            self.add(serial)
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                entry = self._devices.get(serial)
+                if entry is not None and entry.state == "device":
+                    return entry.device
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+
+    def state(self, serial: str) -> str:
+        """
+        :return: Last known state: "device", "offline", "connecting", or "unknown" for untracked serials.
+        """
+        entry = self._devices.get(serial)
+        return entry.state if entry is not None else "unknown"
+
+    def name(self, serial: str) -> Optional[str]:
+        """
+        :return: Cached product name of the device, None until it was read.
+        """
+        entry = self._devices.get(serial)
+        return entry.name if entry is not None else None
+
+    def check_now(self, serial: str) -> None:
+        """
+        Ask the pool thread to check serial at once, e.g. after the emulator restarted.
+        """
+        with self._condition:
+            entry = self._devices.get(serial)
+            if entry is not None:
+                entry.next_check = 0.0
+                entry.failures = 0
+                self._condition.notify_all()
+
+    def _health_loop(self) -> None:
+        while True:
+            with self._condition:
+                if not self._running:
+                    return
+                now = time.monotonic()
+                due = [entry for entry in self._devices.values() if entry.next_check <= now]
+                if not due:
+                    next_check = min((entry.next_check for entry in self._devices.values()), default=now + 1.0)
+                    self._condition.wait(max(0.0, next_check - now))
+                    continue
+            # adb calls are made without holding the lock.
+            for entry in due:
+                self._check(entry)
+
+    def _check(self, entry: _PooledDevice) -> None:
+        previous_state = entry.state
+        try:
+            if entry.device is None or previous_state != "device":
+                adb.connect(entry.serial, timeout=self.connect_timeout)
+                entry.device = adb.device(serial=entry.serial)
+            state = entry.device.get_state()
+            if state == "device" and entry.name is None:
+                entry.name = entry.device.prop.name
+        except (AdbError, OSError) as e:
+            state = "offline"
+            self.logger.debug(f"adb check of {entry.serial} failed: {e}")
+
+        with self._condition:
+            if self._devices.get(entry.serial) is not entry:
+                # Removed while it was being checked.
+                return
+            entry.state = state
+            if state == "device":
+                entry.failures = 0
+                entry.next_check = time.monotonic() + self.check_interval
+            else:
+                backoff = min(self.max_backoff, self.min_backoff * 2 ** entry.failures)
+                entry.failures += 1
+                entry.next_check = time.monotonic() + backoff
+            self._condition.notify_all()
+
+        if state != previous_state:
+            if state == "device":
+                self.logger.info(f"adb device {entry.serial} ready")
+            elif previous_state == "device":
+                self.logger.warning(f"adb device {entry.serial} dropped, reconnecting with backoff")
+            self._notify(entry.serial, state)
+
+    def _notify(self, serial: str, state: str) -> None:
+        for callback in self._listeners:
+            try:
+                callback(serial, state)
+            except Exception as e:
+                self.logger.error(f"Unhandled {e.__class__.__name__} in adb state listener: {e}")
@@ -0,0 +1,211 @@
+import time
+import threading
+from typing import Optional
+
+from E7A.common.logger import Logger
+
+# Capture frame rate per automation state, 0 pauses the stream (and its decoding) entirely.
+DEFAULT_STATE_FPS = {
+    "paused": 0,
+    "idle": 5,
+    "active": 15,
+    "critical": 30,
+}
+
+
+class CaptureGovernor:
+    """
+    Adapt the scrcpy frame rate of one ScrcpyManager to the automation state.
+
+    Raising the frame rate is applied at once, lowering it only after the state was held for min_dwell
+    seconds, since every change restarts the scrcpy client. expect_transition() boosts to "critical"
+    for a while, e.g. right before a tap whose result must be seen quickly.
+
+    Frame rates are capped at the manager's max_frame when the governor is created, e.g. --max-fps or the
+    profile max_fps. Until the first set_state() the stream keeps that rate, so starting causes no restart.
+    """
+    def __init__(
+            self,
+            scrcpy_manager,
+            logger: Logger = None,
+            state_fps: Optional[dict[str, int]] = None,
+            baseline_fps: Optional[int] = None,
+            min_dwell: float = 3.0,
+            tick_interval: float = 0.25
+    ):
+        """
+        :param scrcpy_manager: ScrcpyManager of the instance.
+        :param logger: Parent logger.
+        :param state_fps: State to frame rate, default DEFAULT_STATE_FPS.
+        :param baseline_fps: Frame rate the savings are reported against, default the manager's max_frame.
+        :param min_dwell: Seconds a lower state must be held before the frame rate is lowered.
+        :param tick_interval: Seconds between checks of pending changes.
+        """
+        if logger is None:
+            self.logger = Logger(self.__class__.__name__)
+        else:
+            self.logger = logger.get_child_logger(self.__class__.__name__)
+        self.scrcpy_manager = scrcpy_manager
+        self.max_fps = scrcpy_manager.max_frame
+        self.state_fps = {state: min(fps, self.max_fps) for state, fps in (state_fps or DEFAULT_STATE_FPS).items()}
+        self.baseline_fps = baseline_fps if baseline_fps is not None else scrcpy_manager.max_frame
+        self.min_dwell = min_dwell
+        self.tick_interval = tick_interval
+
+        self._lock = threading.Lock()
+        # Serializes client restarts between the tick thread and callers.
+        self._apply_lock = threading.Lock()
+        # None until the first set_state(): capture at max_fps.
+        self._state: Optional[str] = None
+        self._state_since = time.monotonic()
+        self._boost_until = 0.0
+        self._applied_fps = scrcpy_manager.max_frame
+        self._restarts = 0
+        self._started_at = time.monotonic()
+        self._start_frames = scrcpy_manager.frame_count
+        self._seconds_at_fps: dict[int, float] = {}
+        self._fps_since = self._started_at
+
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def state(self) -> Optional[str]:
+        return self._state
+
+    @property
+    def fps(self) -> int:
+        """
+        Frame rate currently applied to the stream.
+        """
+        return self._applied_fps
+
+    def start(self) -> None:
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._tick_loop, name="CaptureGovernor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def set_state(self, state: str) -> None:
+        """
+        Report the automation state, e.g. "idle" on a loading screen or "critical" while waiting for a button.
+
+        :param state: A key of state_fps.
+        """
+        if state not in self.state_fps:
+            raise ValueError(f"Unknown capture state: {state}. Valid states: {list(self.state_fps)}")
+        with self._lock:
+            if state != self._state:
+                self._state = state
+                self._state_since = time.monotonic()
+        self.tick()
+
+    def expect_transition(self, seconds: float = 2.0) -> None:
+        """
+        Capture at the "critical" rate for the next seconds regardless of the state.
+        """
+        with self._lock:
+            self._boost_until = max(self._boost_until, time.monotonic() + seconds)
+        self.tick()
+
+    def tick(self) -> None:
+        """
+        Apply the frame rate of the current state if it is due.
+        """
+        with self._apply_lock:
+            self._tick()
+
+    def _tick(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            target = self.state_fps[self._state] if self._state is not None else self.max_fps
+            if now < self._boost_until:
+                target = max(target, self.state_fps.get("critical", self.max_fps))
+                hold_since = now
+            else:
+                hold_since = max(self._state_since, self._boost_until)
+            current = self._applied_fps
+            if target == current:
+                return
+            # Ramp up at once, ramp down only after the lower state was held long enough.
+            if target < current and now - hold_since < self.min_dwell:
+                return
+            self._account_fps(now)
+            self._applied_fps = target
+        self._apply(current, target)
+
+    def restart_capture(self) -> None:
+        """
+        Restart the scrcpy client at the applied frame rate, e.g. when the watchdog found it frozen.
+        A paused stream stays paused.
+        """
+        with self._apply_lock:
+            if self._applied_fps == 0:
+                return
+            self.scrcpy_manager.restart(max_frame=self._applied_fps)
+            if not self.scrcpy_manager.alive:
+                self.scrcpy_manager.start()
+
+    def report(self) -> dict:
+        """
+        Savings of this instance compared with capturing at baseline_fps the whole time.
+
+        :return: Dict with elapsed time, frames, average fps, CPU per frame and estimated CPU seconds saved.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._account_fps(now)
+            seconds_at_fps = dict(self._seconds_at_fps)
+        elapsed = now - self._started_at
+        frames = self.scrcpy_manager.frame_count - self._start_frames
+        expected_frames = sum(fps * seconds for fps, seconds in seconds_at_fps.items())
+        baseline_frames = self.baseline_fps * elapsed
+        cpu_per_frame = self.scrcpy_manager.cpu_per_frame
+        return {
+            "elapsed": elapsed,
+            "frames": frames,
+            "average_fps": frames / elapsed if elapsed > 0 else 0.0,
+            "target_average_fps": expected_frames / elapsed if elapsed > 0 else 0.0,
+            "restarts": self._restarts,
+            "cpu_per_frame": cpu_per_frame,
+            "cpu_saved": max(0.0, baseline_frames - expected_frames) * cpu_per_frame,
+            "seconds_at_fps": seconds_at_fps,
+        }
+
+    def summary(self) -> str:
+        report = self.report()
+        return (
+            f"{report['average_fps']:.1f} fps average (baseline {self.baseline_fps}), "
+            f"{report['restarts']} restarts, {report['cpu_per_frame'] * 1000:.2f} ms CPU/frame, "
+            f"~{report['cpu_saved']:.1f} CPU s saved in {report['elapsed']:.0f}s"
+        )
+
+    def _account_fps(self, now: float) -> None:
+        self._seconds_at_fps[self._applied_fps] = (
+            self._seconds_at_fps.get(self._applied_fps, 0.0) + now - self._fps_since
+        )
+        self._fps_since = now
+
+    def _apply(self, current: int, target: int) -> None:
+        self._restarts += 1
+        self.logger.debug(f"Capture {current} -> {target} fps ({self._state})")
+        if target == 0:
+            self.scrcpy_manager.stop()
+        elif current == 0:
+            self.scrcpy_manager.max_frame = target
+            self.scrcpy_manager.connect(self.scrcpy_manager.device, target)
+            self.scrcpy_manager.start()
+        else:
+            self.scrcpy_manager.restart(max_frame=target)
+
+    def _tick_loop(self) -> None:
+        while not self._stop_event.wait(self.tick_interval):
+            try:
+                self.tick()
+            except Exception as e:
+                self.logger.error(f"Unhandled {e.__class__.__name__} in capture governor: {e}")
@@ -1,9 +1,13 @@
+import os
 import yaml
 import argparse
-import urllib.request
+import threading
 from pprint import pformat
+from typing import Callable
 from dataclasses import dataclass, make_dataclass, is_dataclass
 
+from E7A.common.logger import Logger
+
 
 class MetaConfig(type):
     """
@@ -29,46 +33,200 @@ class Config(metaclass=MetaConfig):
     """
     Config class to read and manage configuration from YAML file.
     Access parameters using Config.section.parameter.
+
+    Parsed files are cached on their mtime (ETag for URLs), the argument parser and the section
+    dataclasses are cached on the config schema, so reloading an unchanged config is cheap.
+    Config.watch reloads the config when it changes and notifies Config.subscribe callbacks.
     """
     dataclasses_list = []
 
+    # (source key, config data) of the last read, per path or URL.
+    _yaml_cache = {}
+    # Config schema -> (argument parser, command line overrides), the command line is parsed once per schema.
+    _parser_cache = {}
+    # (section, fields) -> section dataclass.
+    _section_class_cache = {}
+    _loaded_key = None
+    _lock = threading.RLock()
+    _subscribers = []
+    _watch_thread = None
+    _watch_stop = threading.Event()
+    # ProfileTable built from the "profiles" section, reset when the section changes.
+    _profile_table = None
+
     @classmethod
-    def load_config(cls, config_file_path: str = "config.yaml") -> None:
+    def load_config(cls, config_file_path: str = "config.yaml", url_timeout: float = 10.0) -> set[str]:
         """
         Load configuration from a YAML file or URL and update the class attributes.
+        Nothing is rebuilt if the source did not change since the last load.
 
         :param config_file_path: Path to the YAML file or URL.
+        :param url_timeout: Timeout in seconds when the config is fetched from a URL.
+        :return: Names of the sections whose values changed.
         """
-        config_data = cls._load_yaml(config_file_path)
+        with cls._lock:
+            source_key, config_data = cls._load_yaml_cached(config_file_path, url_timeout)
+            if (config_file_path, source_key) == cls._loaded_key:
+                return set()
 
-        parser = cls._create_arg_parser(config_data)
-        args, _ = parser.parse_known_args()
+            overrides = cls._get_overrides(config_data)
+            # 将命令行参数更新至类
+            changed = cls._update_class_attributes(config_data, overrides)
+            cls._loaded_key = (config_file_path, source_key)
+            subscribers = list(cls._subscribers)
 
-        # 将命令行参数更新至类
-        cls._update_class_attributes(config_data, args)
+        if changed:
+            for callback in subscribers:
+                callback(changed)
+        return changed
 
-    @staticmethod
-    def _load_yaml(config_file_path: str) -> dict:
+    @classmethod
+    def profile(cls, index: int) -> "EmulatorProfile":
+        """
+        Settings of one emulator, from the "profiles" section with inheritance from "default".
+
+        :param index: Emulator index.
+        :return: Immutable EmulatorProfile.
+        """
+        table = cls._profile_table
+        if table is None:
+            from E7A.common.profiles import ProfileTable
+            table = ProfileTable(getattr(cls, "profiles", None))
+            cls._profile_table = table
+        return table.get(index)
+
+    @classmethod
+    def subscribe(cls, callback: Callable[[set[str]], None]) -> None:
+        """
+        Register a callback called with the names of the changed sections after each reload.
+
+        :param callback: Callable taking a set of section names.
         """
-        Load YAML content from a file or URL.
+        with cls._lock:
+            if callback not in cls._subscribers:
+                cls._subscribers.append(callback)
+
+    @classmethod
+    def unsubscribe(cls, callback: Callable[[set[str]], None]) -> None:
+        with cls._lock:
+            if callback in cls._subscribers:
+                cls._subscribers.remove(callback)
+
+    @classmethod
+    def watch(cls, config_file_path: str = "config.yaml", interval: float = 1.0, logger: Logger = None) -> None:
+        """
+        Reload the config in a daemon thread whenever the file (or URL ETag) changes.
 
         :param config_file_path: Path to the YAML file or URL.
-        :return: Parsed YAML data as a dictionary.
+        :param interval: Polling interval in seconds.
+        :param logger: Parent logger, reload failures are logged to it.
+        """
+        if logger is None:
+            logger = Logger("ConfigWatcher")
+        else:
+            logger = logger.get_child_logger("ConfigWatcher")
+        cls.stop_watching()
+        cls._watch_stop.clear()
+        cls._watch_thread = threading.Thread(
+            target=cls._watch_loop, args=(config_file_path, interval, logger), name="ConfigWatcher", daemon=True
+        )
+        cls._watch_thread.start()
+
+    @classmethod
+    def stop_watching(cls) -> None:
+        if cls._watch_thread is not None:
+            cls._watch_stop.set()
+            cls._watch_thread.join()
+            cls._watch_thread = None
+
+    @classmethod
+    def _watch_loop(cls, config_file_path: str, interval: float, logger: Logger) -> None:
+        while not cls._watch_stop.wait(interval):
+            try:
+                cls.load_config(config_file_path)
+            except Exception as e:
+                # Keep the previous config when the new one is broken, e.g. half written.
+                logger.error(f"Config reload failed: {e.__class__.__name__}: {e}")
+
+    @classmethod
+    def _load_yaml_cached(cls, config_file_path: str, url_timeout: float) -> tuple[tuple, dict]:
+        """
+        Return the parsed config, parsing it only if the source changed.
+
+        :return: (source key, config data).
         """
+        cached = cls._yaml_cache.get(config_file_path)
         if config_file_path.startswith("http"):
-            response = urllib.request.urlopen(config_file_path)
-            data = response.read().decode("utf-8")
+            # urllib.request pulls in http.client and ssl, only import it for remote configs.
+            import urllib.request
+            import urllib.error
+
+            request = urllib.request.Request(config_file_path)
+            if cached is not None and cached[0][0]:
+                request.add_header("If-None-Match", cached[0][0])
+            try:
+                with urllib.request.urlopen(request, timeout=url_timeout) as response:
+                    data = response.read().decode("utf-8")
+                    etag = response.headers.get("ETag")
+            except urllib.error.HTTPError as e:
+                if e.code == 304 and cached is not None:
+                    return cached
+                raise
+            # Without an ETag the content itself identifies the version.
+            source_key = (etag, None if etag else hash(data))
+            if cached is not None and cached[0] == source_key:
+                return cached
+            config_data = yaml.safe_load(data)
         else:
-            with open(config_file_path, "rb") as f:
-                data = f.read().decode("utf-8")
+            stat = os.stat(config_file_path)
+            source_key = (stat.st_mtime_ns, stat.st_size)
+            if cached is not None and cached[0] == source_key:
+                return cached
+            config_data = cls._load_yaml(config_file_path)
+
+        cls._yaml_cache[config_file_path] = (source_key, config_data if config_data else {})
+        return cls._yaml_cache[config_file_path]
+
+    @staticmethod
+    def _load_yaml(config_file_path: str) -> dict:
+        """
+        Load YAML content from a file, URLs are read by _load_yaml_cached.
+
+        :param config_file_path: Path to the YAML file.
+        :return: Parsed YAML data as a dictionary.
+        """
+        with open(config_file_path, "rb") as f:
+            data = f.read().decode("utf-8")
 
         config_data = yaml.safe_load(data)
         return config_data if config_data else {}
 
+    @classmethod
+    def _get_overrides(cls, config_data: dict) -> dict:
+        """
+        Parse the command line once per config schema.
+
+        :param config_data: Configuration data dictionary.
+        :return: Values given explicitly on the command line, keyed by argument dest.
+        """
+        schema = tuple(
+            (section, tuple((parameter, type(value)) for parameter, value in parameters.items()))
+            if isinstance(parameters, dict) else (section, type(parameters))
+            for section, parameters in config_data.items()
+        )
+        cached = cls._parser_cache.get(schema)
+        if cached is None:
+            parser = cls._create_arg_parser(config_data)
+            args, _ = parser.parse_known_args()
+            cached = (parser, vars(args))
+            cls._parser_cache[schema] = cached
+        return cached[1]
+
     @staticmethod
     def _create_arg_parser(config_data: dict) -> argparse.ArgumentParser:
         """
         Create an argument parser and add arguments based on the config data.
+        Defaults are suppressed, so the parsed namespace only holds arguments given on the command line.
 
         :param config_data: Configuration data dictionary.
         :return: Argument parser.
@@ -76,11 +234,13 @@ class Config(metaclass=MetaConfig):
         parser = argparse.ArgumentParser(description="Modified config class.")
         for section, parameters in config_data.items():
             if isinstance(parameters, dict):
+                if not _is_flat_section(parameters):
+                    continue
                 for parameter, value in parameters.items():
                     if not parameter.endswith("_help"):
                         parser.add_argument(
                             f"--{section}_{parameter}",
-                            default=value,
+                            default=argparse.SUPPRESS,
                             type=type(value),
                             help=config_data[section].get(f"{parameter}_help", "No help provided.")
                         )
@@ -88,47 +248,76 @@ class Config(metaclass=MetaConfig):
                 if not section.endswith("_help"):
                     parser.add_argument(
                         f"--{section}",
-                        default=parameters,
+                        default=argparse.SUPPRESS,
                         type=type(parameters),
                         help=config_data.get("_help", {}).get(f"{section}", "No help provided.")
                     )
         return parser
 
     @classmethod
-    def _update_class_attributes(cls, config_data: dict, args: argparse.Namespace) -> None:
+    def _update_class_attributes(cls, config_data: dict, overrides: dict) -> set[str]:
         """
-        Update the class attributes with the parsed arguments.
+        Update the class attributes with the config data and command line overrides.
+        Every section object is built first and then swapped in, readers holding a section
+        never see it half updated.
 
         :param config_data: Configuration data dictionary.
-        :param args: Parsed arguments.
+        :param overrides: Values given on the command line, keyed by argument dest.
+        :return: Names of the sections whose values changed.
         """
+        sections = {}
         for section, parameters in config_data.items():
-            if isinstance(parameters, dict) is True:
+            if isinstance(parameters, dict) and not _is_flat_section(parameters):
+                # 嵌套的section (如profiles) 保持原样, 由专门的类解析.
+                sections[section] = parameters
+            elif isinstance(parameters, dict) is True:
                 # 键, 类型, 默认值
-                section_fields = [
+                section_fields = tuple(
                     (parameter, type(value), value)
                     for parameter, value in parameters.items()
                     if not parameter.endswith("_help")
-                ]
-                # 以section名命名的dataclass类
-                SectionClass = make_dataclass(
-                    section.capitalize() + "Config", section_fields
                 )
-                # 用args中的参数初始化数据类.
-                section_instance = SectionClass(
+                # 以section名命名的dataclass类, 按字段缓存.
+                class_key = (section, tuple((name, field_type) for name, field_type, _ in section_fields))
+                SectionClass = cls._section_class_cache.get(class_key)
+                if SectionClass is None:
+                    SectionClass = make_dataclass(
+                        section.capitalize() + "Config", [field[:2] for field in section_fields]
+                    )
+                    cls._section_class_cache[class_key] = SectionClass
+                # 用命令行参数覆盖yaml中的值.
+                sections[section] = SectionClass(
                     **{
-                        parameter: getattr(args, f"{section}_{parameter}")
-                        for parameter in parameters
-                        if not parameter.endswith("_help")
+                        parameter: overrides.get(f"{section}_{parameter}", value)
+                        for parameter, _, value in section_fields
                     }
                 )
-                # 将子数据类设为Config的属性.
-                setattr(cls, section, section_instance)
-                cls.dataclasses_list.append(section)
             else:
                 # 非字典类型参数.
-                setattr(cls, section, parameters)
-                cls.dataclasses_list.append(section)
+                sections[section] = overrides.get(section, parameters)
+
+        changed = {
+            section for section, value in sections.items()
+            if section not in cls.dataclasses_list or getattr(cls, section, None) != value
+        }
+        changed |= set(cls.dataclasses_list) - set(sections)
+        # 将子数据类设为Config的属性.
+        for section, value in sections.items():
+            setattr(cls, section, value)
+        cls.dataclasses_list = list(sections)
+        if "profiles" in changed:
+            cls._profile_table = None
+        return changed
+
+
+def _is_flat_section(parameters: dict) -> bool:
+    """
+    Whether a section can become a dataclass: identifier keys and no nested mappings.
+    """
+    return all(
+        isinstance(parameter, str) and parameter.isidentifier() and not isinstance(value, dict)
+        for parameter, value in parameters.items()
+    )
 
 
 if __name__ == "__main__":
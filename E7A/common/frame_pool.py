@@ -0,0 +1,64 @@
+import threading
+import weakref
+
+from E7A.common.metrics import metrics_registry
+
+# Components reported by MemoryAccounting, others are allowed too.
+COMPONENTS = ("decoder", "recognizers", "ui")
+
+
+class MemoryAccounting:
+    """
+    Bytes of frame-sized buffers held per component, e.g. "decoder", "recognizers", "ui".
+
+    Every owner reports its current total with set(), the entry disappears when the owner is garbage
+    collected. Only large, long-lived buffers are reported, not temporaries.
+    """
+    def __init__(self):
+        self._entries: dict[str, dict[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def set(self, component: str, owner: object, nbytes: int) -> None:
+        """
+        :param component: Component the owner belongs to.
+        :param owner: Object holding the memory.
+        :param nbytes: Bytes it holds now.
+        """
+        key = id(owner)
+        with self._lock:
+            entries = self._entries.setdefault(component, {})
+            if key not in entries:
+                weakref.finalize(owner, self.remove, component, key)
+            entries[key] = nbytes
+
+    def remove(self, component: str, key: int) -> None:
+        with self._lock:
+            self._entries.get(component, {}).pop(key, None)
+
+    def snapshot(self) -> dict[str, int]:
+        """
+        :return: Component to bytes held, every component of COMPONENTS is included.
+        """
+        with self._lock:
+            totals = {component: 0 for component in COMPONENTS}
+            for component, entries in self._entries.items():
+                totals[component] = sum(entries.values())
+            return totals
+
+    @property
+    def total(self) -> int:
+        return sum(self.snapshot().values())
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{component} {nbytes / 1024 ** 2:.1f} MB" for component, nbytes in self.snapshot().items()
+        )
+
+
+# Process-wide accounting, read by the session summaries and the metrics.
+memory_accounting = MemoryAccounting()
+metrics_registry.gauge(
+    "e7a_frame_memory_bytes", "Bytes of frame buffers held per component.", ["component"],
+    lambda: {(component,): nbytes for component, nbytes in memory_accounting.snapshot().items()}
+)
+
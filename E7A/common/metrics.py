@@ -0,0 +1,378 @@
+"""
+Metrics registry with Prometheus text exposition, served on a loopback HTTP endpoint.
+
+    requests = metrics_registry.counter("e7a_requests_total", "Requests.", ["kind"])
+    taps = requests.labels(kind="tap")    # bind labels once, outside the hot path
+    taps.inc()
+
+    server = MetricsServer(metrics_registry, port=9464)
+    server.start()    # curl http://127.0.0.1:9464/metrics
+"""
+import math
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterable, Optional, Sequence
+
+# Seconds, from fast recognizers to slow MuMuManager commands.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Metric:
+    """
+    Counters and histograms are aggregated per thread: every thread writes only its own shard, a dict
+    of label values to value, so updates take no lock. Collection sums the shards of all threads.
+    Shards of finished threads are folded into a retired total, so thread churn does not grow the list.
+    """
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: list[tuple[threading.Thread, dict]] = []
+        self._retired: dict = {}
+        self._shards_lock = threading.Lock()
+        self._children: dict[tuple, object] = {}
+
+    def labels(self, **labels):
+        """
+        :return: The metric bound to these label values. Keep it to skip the label lookup on hot paths.
+        """
+        key = self._key(labels)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children.setdefault(key, self._child(key))
+        return child
+
+    def collect(self) -> list[tuple[str, tuple, float]]:
+        """
+        :return: (sample name, label values, value) of every sample.
+        """
+        raise NotImplementedError
+
+    def _child(self, key: tuple):
+        raise NotImplementedError
+
+    def _merge(self, totals: dict, shard: dict) -> None:
+        """
+        Add the values of shard to totals.
+        """
+        raise NotImplementedError
+
+    def _key(self, labels: dict) -> tuple:
+        if labels.keys() != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {sorted(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = {}
+            with self._shards_lock:
+                self._fold_finished()
+                self._shards.append((threading.current_thread(), values))
+            self._local.values = values
+            return values
+
+    def _snapshot(self) -> list[dict]:
+        with self._shards_lock:
+            self._fold_finished()
+            retired = {}
+            self._merge(retired, self._retired)
+            shards = [shard for _, shard in self._shards]
+        # dict() copies under the GIL, a concurrent write lands in this or the next scrape.
+        return [retired] + [dict(shard) for shard in shards]
+
+    def _fold_finished(self) -> None:
+        # Called with _shards_lock held. A finished thread writes no more, its shard can be merged safely.
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                self._merge(self._retired, shard)
+        self._shards = live
+
+
+class _CounterChild:
+    __slots__ = ("_metric", "_key")
+
+    def __init__(self, metric: "Counter", key: tuple):
+        self._metric = metric
+        self._key = key
+
+    def inc(self, amount: float = 1.0) -> None:
+        shard = self._metric._shard()
+        shard[self._key] = shard.get(self._key, 0.0) + amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        self.labels(**labels).inc(amount)
+
+    def collect(self) -> list[tuple[str, tuple, float]]:
+        totals: dict[tuple, float] = {}
+        for shard in self._snapshot():
+            self._merge(totals, shard)
+        return [(self.name, key, value) for key, value in sorted(totals.items())]
+
+    def _child(self, key: tuple) -> _CounterChild:
+        return _CounterChild(self, key)
+
+    def _merge(self, totals: dict, shard: dict) -> None:
+        for key, value in list(shard.items()):
+            totals[key] = totals.get(key, 0.0) + value
+
+
+class _HistogramChild:
+    __slots__ = ("_metric", "_key", "_buckets")
+
+    def __init__(self, metric: "Histogram", key: tuple):
+        self._metric = metric
+        self._key = key
+        self._buckets = metric.buckets
+
+    def observe(self, value: float) -> None:
+        shard = self._metric._shard()
+        # [count per bucket..., count above the last bucket, sum]
+        state = shard.get(self._key)
+        if state is None:
+            state = shard[self._key] = [0] * (len(self._buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self._buckets, value)] += 1
+        state[-1] += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        self.labels(**labels).observe(value)
+
+    def collect(self) -> list[tuple[str, tuple, float]]:
+        totals: dict[tuple, list] = {}
+        for shard in self._snapshot():
+            self._merge(totals, shard)
+        samples = []
+        for key, state in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", key + (_format_value(bound),), cumulative))
+            cumulative += state[len(self.buckets)]
+            samples.append((f"{self.name}_bucket", key + ("+Inf",), cumulative))
+            samples.append((f"{self.name}_sum", key, state[-1]))
+            samples.append((f"{self.name}_count", key, cumulative))
+        return samples
+
+    def _child(self, key: tuple) -> _HistogramChild:
+        return _HistogramChild(self, key)
+
+    def _merge(self, totals: dict, shard: dict) -> None:
+        for key, state in list(shard.items()):
+            total = totals.get(key)
+            if total is None:
+                totals[key] = list(state)
+            else:
+                for i, value in enumerate(state):
+                    total[i] += value
+
+
+class _GaugeChild:
+    __slots__ = ("_metric", "_key")
+
+    def __init__(self, metric: "Gauge", key: tuple):
+        self._metric = metric
+        self._key = key
+
+    def set(self, value: float) -> None:
+        self._metric._values[self._key] = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._metric._lock:
+            self._metric._values[self._key] = self._metric._values.get(self._key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+
+class Gauge(_Metric):
+    """
+    A value set by its owner, or computed by function at scrape time so that nothing runs on the hot path.
+    function returns {label values tuple: value}, e.g. {("decoder",): 2764800}.
+    """
+    kind = "gauge"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Sequence[str] = (),
+            function: Optional[Callable[[], dict[tuple, float]]] = None
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels) -> None:
+        self.labels(**labels).set(value)
+
+    def remove(self, **labels) -> None:
+        self._values.pop(self._key(labels), None)
+
+    def collect(self) -> list[tuple[str, tuple, float]]:
+        values = dict(self._values)
+        if self.function is not None:
+            values.update({tuple(str(v) for v in key): value for key, value in self.function().items()})
+        return [(self.name, key, value) for key, value in sorted(values.items())]
+
+    def _child(self, key: tuple) -> _GaugeChild:
+        return _GaugeChild(self, key)
+
+
+class MetricsRegistry:
+    """
+    Named metrics of the process. Creating a metric that exists returns the existing one,
+    so modules can declare their metrics at import time or per instance.
+    """
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Sequence[str] = (),
+            function: Optional[Callable[[], dict[tuple, float]]] = None
+    ) -> Gauge:
+        gauge = self._register(Gauge, name, documentation, labelnames)
+        if function is not None:
+            gauge.function = function
+        return gauge
+
+    def histogram(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """
+        :return: Every metric in the Prometheus text exposition format 0.0.4.
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            labelnames = metric.labelnames + (("le",) if metric.kind == "histogram" else ())
+            for sample_name, key, value in metric.collect():
+                names = labelnames if len(key) == len(labelnames) else metric.labelnames
+                if key:
+                    labels = ",".join(f'{name}="{_escape_label(value)}"' for name, value in zip(names, key))
+                    lines.append(f"{sample_name}{{{labels}}} {_format_value(value)}")
+                else:
+                    lines.append(f"{sample_name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _register(self, cls, name: str, documentation: str, labelnames: Iterable[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, tuple(labelnames), **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered as {metric.kind} {metric.labelnames}")
+            return metric
+
+
+class MetricsServer:
+    """
+    Serve GET /metrics of a registry over HTTP from a daemon thread, on the loopback interface by default.
+    """
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9464):
+        """
+        :param registry: Registry to expose.
+        :param host: Listening address, expose it beyond loopback only behind a firewall.
+        :param port: Listening port, 0 picks a free one, see address.
+        """
+        self.registry = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path.split("?")[0] not in ("/metrics", "/"):
+                    handler.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                handler.send_response(200)
+                handler.send_header("Content-Type", CONTENT_TYPE)
+                handler.send_header("Content-Length", str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, *args):
+                # Scrapes every few seconds would flood the console.
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.address: tuple[str, int] = self._server.server_address[:2]
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._server.serve_forever, name="MetricsServer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+# Process-wide registry fed by the emulator, capture, recognizers, tasks and the watchdog.
+metrics_registry = MetricsRegistry()
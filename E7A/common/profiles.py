@@ -0,0 +1,84 @@
+from dataclasses import dataclass, fields, replace
+from typing import Optional
+
+# MuMu 12 assigns adb ports 16384, 16416, 16448... to emulator 0, 1, 2...
+MUMU_ADB_BASE_PORT = 16384
+MUMU_ADB_PORT_STEP = 32
+
+
+@dataclass(frozen=True, slots=True)
+class EmulatorProfile:
+    """
+    Resolved settings of one emulator. Instances are immutable and shared, compare them with ==.
+    """
+    index: int
+    adb_address: Optional[str] = None
+    max_fps: int = 30
+    capture_backend: str = "scrcpy"
+    roi_scale: float = 1.0
+    poll_interval: float = 1.0                   # seconds between emulator state polls while waiting for it
+    screenshot_save_dir: Optional[str] = None    # None falls back to ui.screenshot_save_dir
+
+    @property
+    def adb_serial(self) -> str:
+        """
+        adb_address, or the MuMu default address of the emulator index if it is not set.
+        """
+        if self.adb_address:
+            return self.adb_address
+        return f"127.0.0.1:{MUMU_ADB_BASE_PORT + MUMU_ADB_PORT_STEP * self.index}"
+
+
+PROFILE_FIELDS = {field.name for field in fields(EmulatorProfile)} - {"index"}
+
+
+class ProfileTable:
+    """
+    Per-emulator profiles from the "profiles" config section:
+
+        profiles:
+          default:      # inherited by every emulator
+            max_fps: 30
+          3:            # emulator index 3 only overrides what differs
+            max_fps: 15
+
+    Profiles are resolved once per index, lookups are a dict access.
+    """
+    def __init__(self, profiles_config: Optional[dict] = None):
+        """
+        :param profiles_config: The raw "profiles" section.
+        """
+        profiles_config = dict(profiles_config or {})
+        default_values = profiles_config.pop("default", None) or {}
+        self._check_keys("default", default_values)
+        self._default = EmulatorProfile(index=-1, **default_values)
+        self._overrides: dict[int, dict] = {}
+        for index, values in profiles_config.items():
+            values = values or {}
+            self._check_keys(index, values)
+            self._overrides[int(index)] = values
+        self._resolved: dict[int, EmulatorProfile] = {}
+
+    @property
+    def indices(self) -> list[int]:
+        """
+        Emulator indices with their own profile entry.
+        """
+        return sorted(self._overrides)
+
+    def get(self, index: int) -> EmulatorProfile:
+        """
+        :param index: Emulator index.
+        :return: The default profile with the overrides of index applied.
+        """
+        profile = self._resolved.get(index)
+        if profile is None:
+            profile = replace(self._default, index=index, **self._overrides.get(index, {}))
+            self._resolved[index] = profile
+        return profile
+
+    @staticmethod
+    def _check_keys(name, values: dict) -> None:
+        unknown = set(values) - PROFILE_FIELDS
+        if unknown:
+            raise ValueError(f"Unknown keys in profile {name}: {sorted(unknown)}. Valid keys: {sorted(PROFILE_FIELDS)}")
@@ -1,4 +1,6 @@
 from .generate_file_structure import generate_file_structure
+from .lazy_import import lazy_attributes
+from .import_report import import_time_report, cold_start_time
 
 
-__all__ = ['generate_file_structure']
+__all__ = ['generate_file_structure', 'lazy_attributes', 'import_time_report', 'cold_start_time']
@@ -0,0 +1,58 @@
+import sys
+import subprocess
+
+
+def import_time_report(module: str, top: int = 15) -> str:
+    """
+    Import module in a fresh interpreter with "-X importtime" and report where the time goes.
+
+    :param module: Dotted module name, e.g. "E7A.emulator".
+    :param top: Number of slowest imports to list.
+    :return: A text table sorted by cumulative import time.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    rows = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    if process.returncode != 0:
+        error = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else ""
+        return f"import {module} failed: {error}"
+
+    total_us = next((row[0] for row in rows if row[2].strip() == module), 0)
+    lines = [
+        f"import {module}: {total_us / 1000:.1f} ms, {len(rows)} modules",
+        f"{'cumulative [ms]':>15} {'self [ms]':>10}  module"
+    ]
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        lines.append(f"{cumulative_us / 1000:>15.1f} {self_us / 1000:>10.1f}  {name}")
+    return "\n".join(lines)
+
+
+def cold_start_time(module: str, repeats: int = 5) -> float:
+    """
+    Best wall time of importing module in a fresh interpreter, interpreter startup excluded.
+
+    :param module: Dotted module name.
+    :param repeats: Number of runs, the minimum is returned.
+    :return: Import time in seconds.
+    """
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - start)"
+    )
+    results = []
+    for _ in range(repeats):
+        process = subprocess.run(
+            [sys.executable, "-c", code], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+        process.check_returncode()
+        results.append(float(process.stdout.strip()))
+    return min(results)
@@ -0,0 +1,44 @@
+import sys
+import types
+import importlib.util
+from typing import Callable
+
+
+def lazy_attributes(package: str, attributes: dict[str, str]) -> tuple[Callable, Callable]:
+    """
+    Build module level __getattr__ and __dir__ (PEP 562) that import submodules on first access.
+    This keeps heavy dependencies (cv2, scrcpy, PyQt6...) out of scripts which never use them.
+
+    Importing a submodule binds it on the package under its own name. For a class named like its
+    module (e.g. ScrcpyManager) the package binds the class instead, as an eager import would.
+
+    :param package: __name__ of the package.
+    :param attributes: Exported name to relative submodule name, e.g. {"Config": ".config"}.
+    :return: (__getattr__, __dir__) for the package.
+    """
+    def __getattr__(name: str):
+        module_name = attributes.get(name)
+        if module_name is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(module_name, package), name)
+        # Cache on the package so later accesses skip __getattr__.
+        setattr(importlib.import_module(package), name, value)
+        return value
+
+    def __dir__() -> list[str]:
+        return sorted(set(vars(importlib.import_module(package))) | set(attributes))
+
+    shadowed = {
+        name: importlib.util.resolve_name(module_name, package)
+        for name, module_name in attributes.items() if module_name.rsplit(".", 1)[-1] == name
+    }
+    if shadowed:
+        class LazyPackage(types.ModuleType):
+            def __setattr__(self, name: str, value) -> None:
+                if isinstance(value, types.ModuleType) and value.__name__ == shadowed.get(name):
+                    value = getattr(value, name)
+                super().__setattr__(name, value)
+
+        sys.modules[package].__class__ = LazyPackage
+
+    return __getattr__, __dir__
@@ -1 +1,2 @@
 from .mumu_emulator import MuMuEmulator
+from .action_layer import ActionLayer, Confirmation, DeviceTransform
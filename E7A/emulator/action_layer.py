@@ -0,0 +1,296 @@
+import time
+import subprocess
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from E7A.common.logger import Logger
+from E7A.emulator.mumu_emulator import MuMuEmulator
+
+# Resolution the templates and pixel ROIs are authored at.
+REFERENCE_WIDTH = 1280
+REFERENCE_HEIGHT = 720
+
+
+@dataclass(frozen=True, slots=True)
+class DeviceTransform:
+    """
+    Mapping between normalized coordinates (0-1), reference pixels and device pixels of one device.
+    Compute it once per device with DeviceTransform.for_device and rescale assets at load time.
+    """
+    width: int
+    height: int
+    reference_width: int = REFERENCE_WIDTH
+    reference_height: int = REFERENCE_HEIGHT
+    ui_scale: float = 1.0    # extra scale of UI elements, e.g. EmulatorProfile.roi_scale
+
+    @property
+    def scale_x(self) -> float:
+        return self.width / self.reference_width * self.ui_scale
+
+    @property
+    def scale_y(self) -> float:
+        return self.height / self.reference_height * self.ui_scale
+
+    @property
+    def is_identity(self) -> bool:
+        return self.scale_x == 1.0 and self.scale_y == 1.0
+
+    def to_pixels(self, nx: float, ny: float) -> (int, int):
+        """
+        :param nx: Normalized x, 0 is the left edge and 1 the right edge.
+        :param ny: Normalized y.
+        :return: Device pixel coordinates.
+        """
+        return (
+            min(self.width - 1, max(0, round(nx * self.width))),
+            min(self.height - 1, max(0, round(ny * self.height)))
+        )
+
+    def to_normalized(self, x: float, y: float) -> (float, float):
+        return x / self.width, y / self.height
+
+    def rect_to_pixels(self, rect: tuple[float, float, float, float]) -> tuple[int, int, int, int]:
+        """
+        :param rect: Normalized (x, y, width, height).
+        :return: Device pixel (x, y, width, height).
+        """
+        x, y = self.to_pixels(rect[0], rect[1])
+        return x, y, max(1, round(rect[2] * self.width)), max(1, round(rect[3] * self.height))
+
+    def reference_rect_to_pixels(self, rect: tuple[int, int, int, int]) -> tuple[int, int, int, int]:
+        """
+        UI elements are scaled by ui_scale about the center of the rect, so the ROI stays on the element.
+
+        :param rect: (x, y, width, height) in reference pixels.
+        :return: Device pixel (x, y, width, height).
+        """
+        center_x = (rect[0] + rect[2] / 2) * self.width / self.reference_width
+        center_y = (rect[1] + rect[3] / 2) * self.height / self.reference_height
+        width = max(1, round(rect[2] * self.scale_x))
+        height = max(1, round(rect[3] * self.scale_y))
+        return round(center_x - width / 2), round(center_y - height / 2), width, height
+
+    def scale_regions(self, regions: dict[str, tuple], normalized: bool = True) -> dict[str, tuple[int, int, int, int]]:
+        """
+        Resolve a table of ROIs to device pixels, e.g. for DigitReader.
+
+        :param regions: Name to (x, y, width, height).
+        :param normalized: Whether regions are normalized, otherwise they are reference pixels.
+        :return: Name to device pixel rect.
+        """
+        convert = self.rect_to_pixels if normalized else self.reference_rect_to_pixels
+        return {name: convert(rect) for name, rect in regions.items()}
+
+    def scale_image(self, image):
+        """
+        Rescale a template authored at the reference resolution to this device.
+        Call it when templates are loaded, never per frame.
+
+        :param image: Template image (numpy array).
+        :return: The rescaled image, or image itself if no scaling is needed.
+        """
+        if self.is_identity:
+            return image
+        import cv2
+
+        height, width = image.shape[:2]
+        size = (max(1, round(width * self.scale_x)), max(1, round(height * self.scale_y)))
+        interpolation = cv2.INTER_AREA if self.scale_x < 1.0 else cv2.INTER_LINEAR
+        return cv2.resize(image, size, interpolation=interpolation)
+
+    @classmethod
+    def for_device(cls, device, ui_scale: float = 1.0) -> "DeviceTransform":
+        """
+        Transform of an AdbDevice, window_size() is only queried the first time a serial is seen
+        or after DeviceTransform.invalidate. The game runs in landscape, so the longer side is used as width.
+
+        :param device: AdbDevice.
+        :param ui_scale: Extra scale of UI elements.
+        :return: Cached DeviceTransform.
+        """
+        key = (device.serial, ui_scale)
+        with _transform_lock:
+            transform = _transform_cache.get(key)
+        if transform is None:
+            width, height = device.window_size()
+            transform = cls(max(width, height), min(width, height), ui_scale=ui_scale)
+            with _transform_lock:
+                _transform_cache[key] = transform
+        return transform
+
+    @staticmethod
+    def invalidate(serial: Optional[str] = None) -> None:
+        """
+        Forget cached transforms, e.g. after the emulator restarted or its resolution changed.
+
+        :param serial: Device serial, None to forget every device.
+        """
+        with _transform_lock:
+            for key in list(_transform_cache):
+                if serial is None or key[0] == serial:
+                    del _transform_cache[key]
+
+
+_transform_cache: dict[tuple, DeviceTransform] = {}
+_transform_lock = threading.Lock()
+
+
+@dataclass(frozen=True, slots=True)
+class Confirmation:
+    """
+    Outcome of ActionLayer.act_and_confirm.
+    """
+    confirmed: bool
+    attempts: int    # number of times the action was sent
+    frames: int      # frames inspected after the last attempt
+    latency: float   # seconds from the last attempt to the confirming frame, or to the timeout
+    change: float    # largest mean absolute difference of the region seen after the last attempt, 0-255
+
+    def __bool__(self) -> bool:
+        return self.confirmed
+
+
+class ActionLayer:
+    """
+    Resolution independent input: scripts use normalized coordinates, the device transform turns them into pixels.
+    """
+    def __init__(
+            self,
+            emulator: MuMuEmulator,
+            transform: DeviceTransform,
+            logger: Logger = None,
+            scrcpy_manager=None
+    ):
+        """
+        :param emulator: Emulator the input is sent to, its target emulator is used.
+        :param transform: Transform of the target emulator.
+        :param logger: Parent logger.
+        :param scrcpy_manager: ScrcpyManager of the same emulator, needed by act_and_confirm.
+        """
+        if logger is None:
+            self.logger = Logger(self.__class__.__name__)
+        else:
+            self.logger = logger.get_child_logger(self.__class__.__name__)
+        self.emulator = emulator
+        self.transform = transform
+        self.scrcpy_manager = scrcpy_manager
+
+    def tap(self, nx: float, ny: float) -> subprocess.CompletedProcess:
+        """
+        :param nx: Normalized x.
+        :param ny: Normalized y.
+        """
+        return self.emulator.send_tap(*self.transform.to_pixels(nx, ny))
+
+    def tap_rect(self, rect: tuple[float, float, float, float]) -> subprocess.CompletedProcess:
+        """
+        Tap the center of a normalized rect.
+        """
+        return self.tap(rect[0] + rect[2] / 2, rect[1] + rect[3] / 2)
+
+    def tap_pixels(self, x: int, y: int) -> subprocess.CompletedProcess:
+        """
+        Tap device pixels, e.g. the center of a Match found on a frame of this device.
+        """
+        return self.emulator.send_tap(x, y)
+
+    def swipe(
+            self,
+            start: tuple[float, float],
+            end: tuple[float, float],
+            duration: int = 200
+    ) -> subprocess.CompletedProcess:
+        """
+        :param start: Normalized start point.
+        :param end: Normalized end point.
+        :param duration: Swipe duration in ms.
+        """
+        return self.emulator.send_swipe(
+            self.transform.to_pixels(*start), self.transform.to_pixels(*end), duration
+        )
+
+    def key(self, keycode) -> subprocess.CompletedProcess:
+        return self.emulator.send_key(keycode)
+
+    def act_and_confirm(
+            self,
+            action: Callable[[], Any],
+            region: Optional[tuple[float, float, float, float]] = None,
+            min_change: float = 10.0,
+            timeout: float = 1.0,
+            retries: int = 1
+    ) -> Confirmation:
+        """
+        Send an input and watch the following frames until the region changes, instead of sleeping.
+        The frame shown before the input is the baseline, every newer frame is compared with it
+        as soon as it arrives, so a landed tap is confirmed one or two frames after the game reacts.
+
+        :param action: Sends the input, e.g. lambda: layer.tap(0.5, 0.8).
+        :param region: Normalized (x, y, width, height) expected to change, None for the whole frame.
+        :param min_change: Mean absolute difference (0-255) of the region that counts as a change.
+        :param timeout: Seconds to wait for the change after each attempt.
+        :param retries: Times the action is sent again when no change was seen.
+        :return: Confirmation, truthy if the change was seen.
+        """
+        scrcpy_manager = self.scrcpy_manager
+        if scrcpy_manager is None or scrcpy_manager.frame_count == 0:
+            raise RuntimeError("act_and_confirm needs a ScrcpyManager which has received frames")
+
+        attempt, frames, change = 0, 0, 0.0
+        for attempt in range(1, retries + 2):
+            seen = scrcpy_manager.frame_count
+            rect = _region_pixels(scrcpy_manager.frame, region)
+            baseline = _crop(scrcpy_manager.frame, rect).copy()
+            action()
+            sent = time.monotonic()
+            deadline = sent + timeout
+            frames, change = 0, 0.0
+            while (remaining := deadline - time.monotonic()) > 0:
+                if not scrcpy_manager.wait_for_frame(seen, remaining):
+                    break
+                seen = scrcpy_manager.frame_count
+                frames += 1
+                change = max(change, _mean_difference(baseline, _crop(scrcpy_manager.frame, rect)))
+                if change >= min_change:
+                    return Confirmation(True, attempt, frames, time.monotonic() - sent, change)
+            self.logger.debug(
+                f"No change in region {region} after attempt {attempt} ({frames} frames, change {change:.1f})"
+            )
+        return Confirmation(False, attempt, frames, timeout, change)
+
+    def tap_and_confirm(
+            self,
+            nx: float,
+            ny: float,
+            region: Optional[tuple[float, float, float, float]] = None,
+            **kwargs
+    ) -> Confirmation:
+        """
+        Tap normalized coordinates and wait for region to change, see act_and_confirm.
+        """
+        return self.act_and_confirm(lambda: self.tap(nx, ny), region, **kwargs)
+
+
+def _region_pixels(frame, region: Optional[tuple[float, float, float, float]]) -> tuple[int, int, int, int]:
+    # Resolved against the frame itself, the stream may be scaled down from the device resolution.
+    height, width = frame.shape[:2]
+    if region is None:
+        return 0, 0, width, height
+    x, y = min(width - 1, round(region[0] * width)), min(height - 1, round(region[1] * height))
+    return x, y, max(1, round(region[2] * width)), max(1, round(region[3] * height))
+
+
+def _crop(frame, rect: tuple[int, int, int, int]):
+    x, y, width, height = rect
+    return frame[y:y + height, x:x + width]
+
+
+def _mean_difference(a, b) -> float:
+    import cv2
+
+    if a.shape != b.shape:
+        # The stream was restarted at another size, which is a change by itself.
+        return 255.0
+    channels = a.shape[2] if a.ndim == 3 else 1
+    return sum(cv2.mean(cv2.absdiff(a, b))[:channels]) / channels
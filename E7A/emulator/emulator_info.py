@@ -0,0 +1,223 @@
+import json
+from typing import Any, Optional
+
+try:
+    # orjson parses MuMuManager output several times faster, it is optional.
+    import orjson
+
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+
+class EmulatorInfo:
+    """
+    Typed record of one emulator from "MuMuManager info". Fields not known here are kept in extra.
+    Records are updated in place and support the read-only dict access the UI uses (info["name"], info.get(...)).
+    """
+    FIELDS = (
+        "index", "name", "player_state", "is_process_started", "is_android_started",
+        "adb_host_ip", "adb_port", "pid", "headless_pid", "main_wnd", "render_wnd",
+        "launch_time", "launch_err_code", "launch_err_msg", "error_code",
+        "disk_size_bytes", "created_timestamp", "hyperv_enabled", "vt_enabled", "is_main",
+    )
+    __slots__ = FIELDS + ("extra",)
+
+    def __init__(self, data: Optional[dict] = None):
+        for field in self.FIELDS:
+            setattr(self, field, None)
+        self.extra: dict = {}
+        if data:
+            self.update(data)
+
+    def update(self, data: dict) -> dict[str, Any]:
+        """
+        Update the record from parsed JSON.
+
+        :param data: Info of one emulator.
+        :return: Changed fields and their new values, fields missing from data become None.
+        """
+        changed = {}
+        for field in self.FIELDS:
+            value = data.get(field)
+            if getattr(self, field) != value:
+                setattr(self, field, value)
+                changed[field] = value
+        extra = {key: value for key, value in data.items() if key not in _EMULATOR_FIELD_SET}
+        if extra != self.extra:
+            for key in self.extra.keys() | extra.keys():
+                if self.extra.get(key) != extra.get(key):
+                    changed[key] = extra.get(key)
+            self.extra = extra
+        return changed
+
+    def to_dict(self) -> dict:
+        result = {field: getattr(self, field) for field in self.FIELDS if getattr(self, field) is not None}
+        result.update(self.extra)
+        return result
+
+    def __getitem__(self, key: str):
+        if key in _EMULATOR_FIELD_SET:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        elif key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def keys(self):
+        return self.to_dict().keys()
+
+    def items(self):
+        return self.to_dict().items()
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, EmulatorInfo):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"EmulatorInfo({self.to_dict()})"
+
+
+_EMULATOR_FIELD_SET = frozenset(EmulatorInfo.FIELDS)
+
+
+class AppInfo:
+    """
+    Installed apps of one emulator from "MuMuManager control app info -i".
+    Dict access mirrors the raw JSON: package -> {"app_name": ..., "version": ...}, plus "active" -> package.
+    """
+    __slots__ = ("packages", "active", "extra")
+
+    def __init__(self, data: Optional[dict] = None):
+        self.packages: dict[str, dict] = {}
+        self.active: Optional[str] = None
+        self.extra: dict = {}    # e.g. errcode when the emulator is not running
+        if data:
+            self.update(data)
+
+    def update(self, data: dict) -> dict[str, Any]:
+        """
+        :param data: App info of one emulator.
+        :return: Changed keys and their new values, removed packages map to None.
+        """
+        changed = {}
+        packages = {key: value for key, value in data.items() if isinstance(value, dict)}
+        for pkg in self.packages.keys() | packages.keys():
+            if self.packages.get(pkg) != packages.get(pkg):
+                changed[pkg] = packages.get(pkg)
+        self.packages = packages
+
+        active = data.get("active")
+        if active != self.active:
+            changed["active"] = active
+            self.active = active
+
+        extra = {
+            key: value for key, value in data.items()
+            if key != "active" and not isinstance(value, dict)
+        }
+        for key in self.extra.keys() | extra.keys():
+            if self.extra.get(key) != extra.get(key):
+                changed[key] = extra.get(key)
+        self.extra = extra
+        return changed
+
+    def to_dict(self) -> dict:
+        result = dict(self.packages)
+        if self.active is not None:
+            result["active"] = self.active
+        result.update(self.extra)
+        return result
+
+    def __getitem__(self, key: str):
+        if key == "active" and self.active is not None:
+            return self.active
+        if key in self.packages:
+            return self.packages[key]
+        return self.extra[key]
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self.packages) + (self.active is not None) + len(self.extra)
+
+    def keys(self):
+        return self.to_dict().keys()
+
+    def items(self):
+        return self.to_dict().items()
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, AppInfo):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"AppInfo({self.to_dict()})"
+
+
+class InfoTable:
+    """
+    Records of every emulator, updated in place from raw MuMuManager output.
+    Output identical to the previous poll is not even parsed.
+    """
+    def __init__(self, record_class: type):
+        """
+        :param record_class: EmulatorInfo or AppInfo.
+        """
+        self.record_class = record_class
+        self.records: dict[int, Any] = {}
+        self._last_output: dict[Any, bytes] = {}
+
+    def update(self, output: bytes, identifier: int | str = "all") -> dict[int, Optional[dict]]:
+        """
+        :param output: stdout of the MuMuManager command.
+        :param identifier: "all" or the index the command was run for.
+        :return: Index to changed fields, a new emulator maps to all its fields, a removed one to None.
+        """
+        if self._last_output.get(identifier) == output:
+            return {}
+        data: dict = json_loads(output)
+        self._last_output[identifier] = output
+
+        if identifier == "all":
+            parsed = {int(key): value for key, value in data.items()}
+            diff = {index: None for index in self.records.keys() - parsed.keys()}
+            for index in diff:
+                del self.records[index]
+        else:
+            parsed = {int(identifier): data}
+            diff = {}
+
+        for index, value in parsed.items():
+            record = self.records.get(index)
+            if record is None:
+                self.records[index] = self.record_class(value)
+                diff[index] = self.records[index].to_dict()
+            else:
+                changed = record.update(value)
+                if changed:
+                    diff[index] = changed
+        return diff
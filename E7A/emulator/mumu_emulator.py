@@ -1,12 +1,22 @@
 import os
+import shlex
+import time
 import subprocess
-import json
 
 from shutil import copyfile
-from typing import Optional
+from typing import Optional, Sequence
 from pprint import pformat
 
 from E7A.common.logger import Logger
+from E7A.common.metrics import metrics_registry
+from E7A.emulator.emulator_info import AppInfo, EmulatorInfo, InfoTable, json_loads
+
+_COMMAND_SECONDS = metrics_registry.histogram(
+    "e7a_mumu_command_seconds", "Latency of MuMuManager commands.", ["command"]
+)
+_COMMAND_FAILURES = metrics_registry.counter(
+    "e7a_mumu_command_failures_total", "MuMuManager commands that exited with a non-zero code.", ["command"]
+)
 
 
 class MuMuEmulator:
@@ -17,15 +27,25 @@ class MuMuEmulator:
     def __init__(
         self,
         logger: Logger = None,
+        manager_command: Optional[Sequence[str]] = None
     ):
+        """
+        :param logger: Parent logger.
+        :param manager_command: Replaces the MuMuManager executable of every command,
+            e.g. FakeMuMuManager.command(state_dir) of the simulator. None runs MuMuManager itself.
+        """
+        self.manager_command = list(manager_command) if manager_command is not None else None
         # Initialize self.logger
         if logger is None:
             self.logger = Logger(self.__class__.__name__)
         else:
             self.logger = logger.get_child_logger(self.__class__.__name__)
 
-        self._emulator_info: dict = {}    # key: emulator index, value: emulator info
-        self._app_info: dict = {}
+        # Records are updated in place, the dicts below are the live tables.
+        self._emulator_table = InfoTable(EmulatorInfo)
+        self._app_table = InfoTable(AppInfo)
+        self._emulator_info: dict[int, EmulatorInfo] = self._emulator_table.records
+        self._app_info: dict[int, AppInfo] = self._app_table.records
 
         # initialize emulator info and app info.
         self.update()
@@ -128,7 +148,7 @@ class MuMuEmulator:
         if self._is_valid_identifier(identifier):
             if self.target_emulator_state == "start_finished":
                 process = self._execute_command(f"MuMuManager.exe control -v {identifier} app info -pkg {pkg}")
-                info: dict = json.loads(process.stdout)
+                info: dict = json_loads(process.stdout)
                 return info.get("state")
             else:
                 self.logger.error(
@@ -143,9 +163,16 @@ class MuMuEmulator:
             )
             return "wrong_identifier"
 
-    def update(self) -> None:
-        self._update_emulator_info()
-        self._update_app_info()
+    def update(self) -> dict[str, dict]:
+        """
+        Poll MuMuManager for emulator and app info.
+
+        :return: {"emulators": diff, "apps": diff}, each diff maps an emulator index to its changed fields.
+        """
+        return {
+            "emulators": self._update_emulator_info(),
+            "apps": self._update_app_info()
+        }
 
     def launch_target_emulator(self) -> subprocess.CompletedProcess:
         """
@@ -292,6 +319,18 @@ class MuMuEmulator:
         :return: Process output.
         """
         self.logger.debug("Command received: $ " + command)
+        # Labelled by the MuMuManager subcommand, e.g. "info", "control" or "adb".
+        name = command.split(maxsplit=2)[1].lower() if " " in command else "none"
+        start = time.perf_counter()
+        process = self._run_command(command, **kwargs)
+        _COMMAND_SECONDS.labels(command=name).observe(time.perf_counter() - start)
+        if process.returncode:
+            _COMMAND_FAILURES.labels(command=name).inc()
+        return process
+
+    def _run_command(self, command: str, **kwargs) -> subprocess.CompletedProcess:
+        if self.manager_command is not None:
+            command = [*self.manager_command, *shlex.split(command)[1:]]
         process = subprocess.run(
             command,
             stdout=subprocess.PIPE,
@@ -315,21 +354,17 @@ class MuMuEmulator:
                     return True
         return False
 
-    def _update_emulator_info(self, identifier: int | str = "all") -> None:
+    def _update_emulator_info(self, identifier: int | str = "all") -> dict:
         """
         Update the info of the existing emulator and update the emulator_info dictionary.
 
         :param identifier: selected emulator identifier.
+        :return: Emulator index to changed fields.
         """
         if self._is_valid_identifier(identifier):
             identifier = "all" if identifier == "all" else int(identifier)
             process = self._execute_command(f"Mumumanager info -v {identifier}")
-            emulators_info: dict = json.loads(process.stdout)
-
-            if identifier == "all":
-                self._emulator_info = {int(key): value for key, value in emulators_info.items()}
-            else:
-                self._emulator_info.update({identifier: emulators_info})
+            return self._emulator_table.update(process.stdout, identifier)
 
         else:
             # Invalid identifier.
@@ -337,21 +372,18 @@ class MuMuEmulator:
                 f"Failed to update emulator info with invalid identifier: {identifier}. "
                 f"Valid identifiers: {self.available_emulators + ['all']}"
             )
+            return {}
 
-    def _update_app_info(self, identifier: int | str = "all") -> None:
+    def _update_app_info(self, identifier: int | str = "all") -> dict:
         """
         Update the info of the Apps installed on the emulators.
 
         :param identifier:
+        :return: Emulator index to changed apps.
         """
         if self._is_valid_identifier(identifier):
             process = self._execute_command(f"MuMuManager.exe control -v {identifier} app info -i")
-            info: dict = json.loads(process.stdout)
-
-            if identifier == "all":
-                self._app_info = {int(key): value for key, value in info.items()}
-            else:
-                self._app_info.update({identifier: info})
+            return self._app_table.update(process.stdout, identifier)
 
         # Check identifier
         else:
@@ -360,9 +392,10 @@ class MuMuEmulator:
                 f"Failed to update app info with invalid identifier: {identifier}. "
                 f"Valid identifiers: {self.available_emulators + ['all']}"
             )
+            return {}
 
     @staticmethod
-    def app_name2pkg_dict(app_info: dict) -> dict:
+    def app_name2pkg_dict(app_info: AppInfo | dict) -> dict:
         reverse_dict = {}
         if "errcode" in app_info.keys():
             return reverse_dict
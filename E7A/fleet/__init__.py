@@ -0,0 +1,12 @@
+from E7A.common.utils import lazy_attributes
+
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    'FleetAgent': '.agent',
+    'FleetCoordinator': '.coordinator',
+    'MessageStream': '.protocol',
+    'Task': '.task_queue',
+    'WorkStealingQueue': '.task_queue'
+})
+
+
+__all__ = ['FleetAgent', 'FleetCoordinator', 'MessageStream', 'Task', 'WorkStealingQueue']
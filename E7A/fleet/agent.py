@@ -0,0 +1,227 @@
+import os
+import time
+import queue
+import socket
+import threading
+from typing import Callable, Optional
+
+from E7A.common import Logger
+from E7A.common.frame_pool import memory_accounting
+from E7A.emulator import MuMuEmulator
+from E7A.fleet.protocol import MessageStream, ProtocolError
+from E7A.fleet.task_queue import TASKS, TASK_SECONDS
+
+
+class FleetAgent:
+    """
+    Run the tasks a FleetCoordinator assigns on the MuMu emulators of this host.
+
+    Every local emulator has one worker thread and one queue, so tasks on the same emulator never overlap.
+    The agent reports CPU usage, queue depth and task metrics every status_interval seconds.
+    """
+    def __init__(
+            self,
+            coordinator: tuple[str, int],
+            indices: list[int],
+            logger: Logger = None,
+            emulator_factory: Optional[Callable[[int], MuMuEmulator]] = None,
+            agent_id: Optional[str] = None,
+            status_interval: float = 1.0,
+            **session_kwargs
+    ):
+        """
+        :param coordinator: (host, port) of the coordinator.
+        :param indices: Local emulator indices this agent drives.
+        :param logger: Parent logger.
+        :param emulator_factory: Creates the MuMuEmulator of an index, e.g. a simulated one. Default MuMuEmulator.
+        :param agent_id: Name reported to the coordinator, default host name and pid.
+        :param status_interval: Seconds between status reports.
+        :param session_kwargs: Arguments of the HeadlessSession of every emulator, e.g. capture=False.
+        """
+        self.agent_id = agent_id or f"{socket.gethostname()}-{os.getpid()}"
+        if logger is None:
+            self.logger = Logger(f"{self.__class__.__name__}-{self.agent_id}")
+        else:
+            self.logger = logger.get_child_logger(f"{self.__class__.__name__}-{self.agent_id}")
+        self.coordinator = coordinator
+        self.indices = list(indices)
+        self.emulator_factory = emulator_factory
+        self.status_interval = status_interval
+        self.session_kwargs = session_kwargs
+
+        self.handlers: dict[str, Callable[[int, dict], dict]] = {
+            "script": self._run_script,
+            "sleep": self._run_sleep,
+        }
+        self.sessions: dict = {}
+        self._queues: dict[int, queue.Queue] = {index: queue.Queue() for index in self.indices}
+        self._running: set[str] = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._stream: Optional[MessageStream] = None
+        self.tasks_done = 0
+        self.tasks_failed = 0
+        self.task_seconds = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Tasks waiting or running on this agent.
+        """
+        with self._lock:
+            return sum(q.qsize() for q in self._queues.values()) + len(self._running)
+
+    def run(self) -> None:
+        """
+        Connect, serve tasks until the coordinator shuts the agent down or the connection drops.
+        """
+        from E7A.automator.headless_runner import HeadlessSession
+
+        for index in self.indices:
+            emulator = self.emulator_factory(index) if self.emulator_factory is not None else None
+            self.sessions[index] = HeadlessSession(index, self.logger, emulator=emulator, **self.session_kwargs)
+
+        sock = socket.create_connection(self.coordinator)
+        self._stream = MessageStream(sock)
+        self._stream.send({
+            "type": "hello",
+            "agent_id": self.agent_id,
+            "instances": self.indices,
+            "pid": os.getpid(),
+            "host": socket.gethostname(),
+        })
+        self.logger.info(f"Connected to coordinator {self.coordinator[0]}:{self.coordinator[1]}")
+
+        threads = [
+            threading.Thread(target=self._work_loop, args=(index,), name=f"FleetWorker-{index}", daemon=True)
+            for index in self.indices
+        ]
+        threads.append(threading.Thread(target=self._status_loop, name="FleetStatus", daemon=True))
+        for thread in threads:
+            thread.start()
+        try:
+            self._receive_loop()
+        finally:
+            self._stop_event.set()
+            for q in self._queues.values():
+                q.put(None)
+            for thread in threads:
+                thread.join()
+            for session in self.sessions.values():
+                session.stop()
+            self._stream.close()
+            self.logger.info(f"Agent stopped after {self.tasks_done} tasks, {self.tasks_failed} failed")
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._stream is not None:
+            self._stream.close()
+
+    def _receive_loop(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                message = self._stream.receive()
+                if message is None:
+                    return
+                match message["type"]:
+                    case "task":
+                        missing = {"task_id", "kind"} - message.keys()
+                        if missing:
+                            raise ProtocolError(f"task message misses {sorted(missing)}")
+                        self._enqueue(message)
+                    case "shutdown":
+                        return
+                    case other:
+                        self.logger.warning(f"Unknown message type from coordinator: {other}")
+            except (OSError, ValueError, ProtocolError) as e:
+                if not self._stop_event.is_set():
+                    self.logger.error(f"Connection to coordinator lost: {e}")
+                return
+
+    def _enqueue(self, task: dict) -> None:
+        index = task.get("index")
+        if index not in self._queues:
+            # Unbound tasks go to the emulator with the shortest queue.
+            with self._lock:
+                index = min(self.indices, key=lambda i: self._queues[i].qsize())
+        self._queues[index].put(task)
+
+    def _work_loop(self, index: int) -> None:
+        session = self.sessions[index]
+        ready = False
+        while True:
+            task = self._queues[index].get()
+            if task is None or self._stop_event.is_set():
+                return
+            task_id = task["task_id"]
+            with self._lock:
+                self._running.add(task_id)
+            start = time.perf_counter()
+            ok, error, output = True, None, {}
+            try:
+                if not ready:
+                    ready = session.start()
+                    if not ready:
+                        raise RuntimeError(f"emulator {index} is not ready")
+                handler = self.handlers.get(task["kind"])
+                if handler is None:
+                    raise ValueError(f"unknown task kind {task['kind']}")
+                output = handler(index, task.get("payload") or {})
+            except Exception as e:
+                ok, error = False, f"{e.__class__.__name__}: {e}"
+            duration = time.perf_counter() - start
+            with self._lock:
+                self._running.discard(task_id)
+                self.task_seconds += duration
+                if ok:
+                    self.tasks_done += 1
+                else:
+                    self.tasks_failed += 1
+            TASKS.labels(kind=task["kind"], result="done" if ok else "failed").inc()
+            TASK_SECONDS.labels(kind=task["kind"]).observe(duration)
+            try:
+                self._stream.send({
+                    "type": "result", "task_id": task_id, "ok": ok, "error": error,
+                    "duration": duration, "index": index, "output": output,
+                })
+            except OSError:
+                return
+
+    def _status_loop(self) -> None:
+        cpu_count = os.cpu_count() or 1
+        last_wall, last_cpu = time.perf_counter(), time.process_time()
+        while not self._stop_event.wait(self.status_interval):
+            wall, cpu = time.perf_counter(), time.process_time()
+            # Share of the whole machine used by this agent process.
+            usage = (cpu - last_cpu) / max(wall - last_wall, 1e-9) / cpu_count
+            last_wall, last_cpu = wall, cpu
+            with self._lock:
+                running = len(self._running)
+                metrics = {
+                    "tasks_done": self.tasks_done,
+                    "tasks_failed": self.tasks_failed,
+                    "task_seconds": self.task_seconds,
+                    "memory_bytes": memory_accounting.snapshot(),
+                }
+            try:
+                self._stream.send({
+                    "type": "status", "cpu": usage, "queue_depth": self.queue_depth,
+                    "running": running, "metrics": metrics,
+                })
+            except OSError:
+                return
+
+    def _run_script(self, index: int, payload: dict) -> dict:
+        session = self.sessions[index]
+        steps_done, errors = session.steps_done, session.errors
+        session.run_script(payload["steps"], payload.get("loops", 1), self._stop_event)
+        errors = session.errors - errors
+        if errors:
+            raise RuntimeError(f"{errors} steps failed")
+        return {"steps": session.steps_done - steps_done}
+
+    @staticmethod
+    def _run_sleep(index: int, payload: dict) -> dict:
+        # Synthetic load for protocol and balancing tests.
+        time.sleep(float(payload.get("seconds", 0.1)))
+        return {}
@@ -0,0 +1,294 @@
+import time
+import uuid
+import socket
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+from E7A.common import Logger
+from E7A.fleet.protocol import MessageStream, ProtocolError
+
+
+@dataclass
+class AgentState:
+    """
+    What the coordinator knows about one connected agent.
+    """
+    agent_id: str
+    stream: MessageStream
+    instances: list[int]
+    host: str = ""
+    cpu: float = 0.0
+    queue_depth: int = 0                  # as last reported by the agent
+    metrics: dict = field(default_factory=dict)
+    inflight: dict[str, dict] = field(default_factory=dict)
+    last_seen: float = field(default_factory=time.monotonic)
+    completed: int = 0
+    failed: int = 0
+
+    @property
+    def load(self) -> float:
+        """
+        Outstanding tasks per emulator, raised by CPU pressure. Lower is better.
+        """
+        outstanding = max(self.queue_depth, len(self.inflight))
+        return outstanding / max(1, len(self.instances)) + 2.0 * self.cpu
+
+
+class FleetCoordinator:
+    """
+    Accept FleetAgent connections, assign submitted tasks to the least loaded agent and collect results.
+
+    Load is the agent's outstanding tasks per emulator plus a CPU penalty. Agents report queue depth
+    and CPU periodically, tasks sent since the last report are counted from the in-flight table, so a burst
+    of submissions is spread instead of piling onto the agent that looked idle. An agent that disconnects or stays
+    silent for agent_timeout is dropped and its unfinished tasks are requeued.
+    """
+    def __init__(
+            self,
+            host: str = "127.0.0.1",
+            port: int = 0,
+            logger: Logger = None,
+            max_outstanding: int = 2,
+            agent_timeout: float = 10.0
+    ):
+        """
+        :param host: Listening address, loopback by default.
+        :param port: Listening port, 0 picks a free one, see address.
+        :param logger: Parent logger.
+        :param max_outstanding: Tasks per emulator an agent may hold before it gets no more.
+        :param agent_timeout: Seconds without a message before an agent counts as lost.
+        """
+        if logger is None:
+            self.logger = Logger(self.__class__.__name__)
+        else:
+            self.logger = logger.get_child_logger(self.__class__.__name__)
+        self.max_outstanding = max_outstanding
+        self.agent_timeout = agent_timeout
+
+        self._server = socket.create_server((host, port))
+        self.address: tuple[str, int] = self._server.getsockname()[:2]
+        self.agents: dict[str, AgentState] = {}
+        self.results: dict[str, dict] = {}
+        self._pending: deque[dict] = deque()
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._started_at = time.monotonic()
+
+    def start(self) -> None:
+        self._started_at = time.monotonic()
+        for target, name in ((self._accept_loop, "FleetAccept"), (self._dispatch_loop, "FleetDispatch")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self.logger.info(f"Coordinator listening on {self.address[0]}:{self.address[1]}")
+
+    def stop(self, shutdown_agents: bool = True) -> None:
+        self._stop_event.set()
+        with self._condition:
+            agents = list(self.agents.values())
+            self._condition.notify_all()
+        for agent in agents:
+            if shutdown_agents:
+                try:
+                    agent.stream.send({"type": "shutdown"})
+                except OSError:
+                    pass
+        self._server.close()
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def submit(self, kind: str, payload: Optional[dict] = None, index: Optional[int] = None) -> str:
+        """
+        Queue a task for the next free agent.
+
+        :param kind: Task kind handled by the agents, e.g. "script".
+        :param payload: Task arguments, e.g. {"steps": [...], "loops": 1}.
+        :param index: Emulator index the task must run on, None for any.
+        :return: Task id.
+        """
+        task = {"type": "task", "task_id": uuid.uuid4().hex, "kind": kind, "index": index, "payload": payload or {}}
+        with self._condition:
+            self._pending.append(task)
+            self._condition.notify_all()
+        return task["task_id"]
+
+    def wait(self, task_ids: list[str], timeout: Optional[float] = None) -> bool:
+        """
+        :return: Whether every task has a result before the timeout.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: all(task_id in self.results for task_id in task_ids), timeout)
+
+    def wait_for_agents(self, count: int, timeout: Optional[float] = None) -> bool:
+        with self._condition:
+            return self._condition.wait_for(lambda: len(self.agents) >= count, timeout)
+
+    def metrics(self) -> dict:
+        """
+        :return: Fleet totals and per-agent numbers.
+        """
+        with self._condition:
+            agents = {
+                agent.agent_id: {
+                    "host": agent.host,
+                    "instances": len(agent.instances),
+                    "cpu": agent.cpu,
+                    "queue_depth": agent.queue_depth,
+                    "inflight": len(agent.inflight),
+                    "completed": agent.completed,
+                    "failed": agent.failed,
+                    **agent.metrics,
+                }
+                for agent in self.agents.values()
+            }
+            results = list(self.results.values())
+            pending = len(self._pending)
+        elapsed = time.monotonic() - self._started_at
+        durations = sorted(result["duration"] for result in results)
+        return {
+            "agents": agents,
+            "instances": sum(agent["instances"] for agent in agents.values()),
+            "pending": pending,
+            "completed": sum(1 for result in results if result["ok"]),
+            "failed": sum(1 for result in results if not result["ok"]),
+            "tasks_per_second": len(results) / elapsed if elapsed > 0 else 0.0,
+            "median_task_seconds": durations[len(durations) // 2] if durations else 0.0,
+        }
+
+    def summary(self) -> str:
+        metrics = self.metrics()
+        lines = [
+            f"{len(metrics['agents'])} agents, {metrics['instances']} emulators: "
+            f"{metrics['completed']} tasks done, {metrics['failed']} failed, {metrics['pending']} pending, "
+            f"{metrics['tasks_per_second']:.2f} tasks/s, median {metrics['median_task_seconds']:.2f}s"
+        ]
+        for agent_id, agent in sorted(metrics["agents"].items()):
+            lines.append(
+                f"  {agent_id:<24} {agent['instances']:>3} emulators {agent['completed']:>6} done "
+                f"{agent['failed']:>4} failed  cpu {agent['cpu'] * 100:5.1f}%  queue {agent['queue_depth']}  "
+                f"memory {sum(agent.get('memory_bytes', {}).values()) / 1024 ** 2:.1f} MB"
+            )
+        return "\n".join(lines)
+
+    def _accept_loop(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                sock, address = self._server.accept()
+            except OSError:
+                return
+            threading.Thread(
+                target=self._serve_agent, args=(sock, address), name=f"FleetAgent-{address[1]}", daemon=True
+            ).start()
+
+    def _serve_agent(self, sock: socket.socket, address) -> None:
+        stream = MessageStream(sock)
+        agent = None
+        try:
+            hello = stream.receive()
+            if hello is None or hello.get("type") != "hello":
+                raise ProtocolError(f"Expected hello from {address}, got {hello}")
+            try:
+                agent = AgentState(hello["agent_id"], stream, list(hello["instances"]), hello.get("host", ""))
+            except KeyError as e:
+                raise ProtocolError(f"hello from {address} misses {e}") from e
+            with self._condition:
+                self.agents[agent.agent_id] = agent
+                self._condition.notify_all()
+            self.logger.info(f"Agent {agent.agent_id} joined with emulators {agent.instances}")
+            while not self._stop_event.is_set():
+                message = stream.receive()
+                if message is None:
+                    break
+                try:
+                    self._handle(agent, message)
+                except KeyError as e:
+                    raise ProtocolError(f"{message.get('type')} message misses {e}") from e
+        except (OSError, ValueError, ProtocolError) as e:
+            if not self._stop_event.is_set():
+                self.logger.error(f"Agent {agent.agent_id if agent else address} failed: {e}")
+        finally:
+            stream.close()
+            if agent is not None:
+                self._drop_agent(agent)
+
+    def _handle(self, agent: AgentState, message: dict) -> None:
+        with self._condition:
+            agent.last_seen = time.monotonic()
+            match message["type"]:
+                case "status":
+                    agent.cpu = message["cpu"]
+                    agent.queue_depth = message["queue_depth"]
+                    agent.metrics = message.get("metrics", {})
+                case "result":
+                    task = agent.inflight.pop(message["task_id"], None)
+                    if task is None:
+                        return
+                    agent.queue_depth = max(0, agent.queue_depth - 1)
+                    if message["ok"]:
+                        agent.completed += 1
+                    else:
+                        agent.failed += 1
+                        self.logger.warning(f"Task {message['task_id']} failed on {agent.agent_id}: {message['error']}")
+                    self.results[message["task_id"]] = {**message, "agent_id": agent.agent_id}
+                case other:
+                    self.logger.warning(f"Unknown message type from {agent.agent_id}: {other}")
+            self._condition.notify_all()
+
+    def _drop_agent(self, agent: AgentState) -> None:
+        with self._condition:
+            if self.agents.get(agent.agent_id) is not agent:
+                # Already dropped, e.g. timed out before its reader thread noticed the closed stream.
+                return
+            del self.agents[agent.agent_id]
+            # Unfinished tasks go back to the front of the queue.
+            self._pending.extendleft(reversed(list(agent.inflight.values())))
+            agent.inflight.clear()
+            self._condition.notify_all()
+        if not self._stop_event.is_set():
+            self.logger.warning(f"Agent {agent.agent_id} left, its unfinished tasks were requeued")
+
+    def _pick_agent(self, task: dict) -> Optional[AgentState]:
+        now = time.monotonic()
+        candidates = [
+            agent for agent in self.agents.values()
+            if now - agent.last_seen < self.agent_timeout
+            and (task["index"] is None or task["index"] in agent.instances)
+            and len(agent.inflight) < self.max_outstanding * len(agent.instances)
+        ]
+        return min(candidates, key=lambda agent: agent.load, default=None)
+
+    def _drop_silent_agents(self) -> None:
+        now = time.monotonic()
+        with self._condition:
+            silent = [agent for agent in self.agents.values() if now - agent.last_seen > self.agent_timeout]
+        for agent in silent:
+            self.logger.warning(f"Agent {agent.agent_id} silent for {now - agent.last_seen:.0f}s, dropping it")
+            # Closing the stream also ends its reader thread, e.g. of a hung process with an open connection.
+            agent.stream.close()
+            self._drop_agent(agent)
+
+    def _dispatch_loop(self) -> None:
+        while not self._stop_event.is_set():
+            self._drop_silent_agents()
+            with self._condition:
+                assignment = None
+                for task in self._pending:
+                    agent = self._pick_agent(task)
+                    if agent is not None:
+                        assignment = (task, agent)
+                        break
+                if assignment is None:
+                    self._condition.wait(0.5)
+                    continue
+                task, agent = assignment
+                self._pending.remove(task)
+                agent.inflight[task["task_id"]] = task
+                agent.queue_depth += 1
+            try:
+                agent.stream.send(task)
+            except OSError:
+                # The reader thread of the agent notices the broken connection and requeues its tasks.
+                pass
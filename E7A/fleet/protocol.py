@@ -0,0 +1,72 @@
+"""
+Wire format between the fleet coordinator and its agents: one JSON object per line over TCP.
+
+Agent -> coordinator:
+    {"type": "hello", "agent_id": str, "instances": [int], "pid": int, "host": str}
+    {"type": "status", "cpu": float, "queue_depth": int, "running": int, "metrics": dict}
+    {"type": "result", "task_id": str, "ok": bool, "error": str | None, "duration": float, "output": dict}
+
+Coordinator -> agent:
+    {"type": "task", "task_id": str, "kind": str, "index": int | None, "payload": dict}
+    {"type": "shutdown"}
+"""
+import json
+import socket
+import threading
+from typing import Optional
+
+from E7A.emulator.emulator_info import json_loads
+
+# A single message larger than this is a protocol error, not a task.
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class MessageStream:
+    """
+    Newline-delimited JSON over a connected socket. Sending is thread-safe, receiving is for one reader thread.
+    """
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = sock.makefile("rb")
+        self._send_lock = threading.Lock()
+
+    def send(self, message: dict) -> None:
+        data = json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        with self._send_lock:
+            self.sock.sendall(data)
+
+    def receive(self) -> Optional[dict]:
+        """
+        :return: The next message, None when the peer closed the connection.
+        """
+        line = self._reader.readline(MAX_MESSAGE_SIZE + 1)
+        if not line:
+            return None
+        if len(line) > MAX_MESSAGE_SIZE or not line.endswith(b"\n"):
+            raise ProtocolError(f"Message larger than {MAX_MESSAGE_SIZE} bytes or truncated")
+        message = json_loads(line)
+        if not isinstance(message, dict) or "type" not in message:
+            raise ProtocolError(f"Malformed message: {line[:200]!r}")
+        return message
+
+    def close(self) -> None:
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._reader.close()
+        self.sock.close()
+
+
+def parse_address(address: str, default_port: int = 0) -> tuple[str, int]:
+    """
+    :param address: "host:port", "host" or ":port".
+    :return: (host, port), host defaults to the loopback address.
+    """
+    host, _, port = address.rpartition(":") if ":" in address else (address, "", "")
+    return host or "127.0.0.1", int(port) if port else default_port
@@ -0,0 +1,358 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Optional
+
+import yaml
+
+from E7A.common import Logger
+from E7A.common.metrics import metrics_registry
+
+# Task states, "running" tasks found in a journal after a crash are pending again.
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+# Shared with FleetAgent. result is "done", "failed", or "retried" for a failed attempt that is run again.
+TASKS = metrics_registry.counter("e7a_tasks_total", "Finished task attempts by outcome.", ["kind", "result"])
+TASK_SECONDS = metrics_registry.histogram("e7a_task_seconds", "Duration of task attempts.", ["kind"])
+
+
+@dataclass
+class Task:
+    """
+    One unit of the daily routine, e.g. the arena of an account.
+    """
+    task_id: str
+    kind: str                        # "arena", "hunt", "expedition"...
+    payload: dict = field(default_factory=dict)
+    cost: float = 60.0               # estimated seconds, used to balance the initial assignment
+    account: Optional[str] = None    # only emulators logged into this account may run it
+    index: Optional[int] = None      # only this emulator may run it
+    state: str = PENDING
+    attempts: int = 0
+    owner: Optional[int] = None
+    error: Optional[str] = None
+    result: Any = None
+
+    @property
+    def pinned(self) -> bool:
+        return self.account is not None or self.index is not None
+
+
+def load_routine(routine_path: str) -> list[Task]:
+    """
+    Load the daily routine, a YAML list of tasks, e.g.
+
+        - {kind: arena, account: main, cost: 300, steps: [{tap_at: [0.9, 0.1]}, {sleep: 2}]}
+        - {kind: hunt, cost: 900, steps: [...]}
+        - {kind: expedition, index: 2, steps: [...]}
+
+    Task ids are derived from kind, account, index and position, so loading the same routine
+    again maps onto the tasks of an existing journal.
+
+    :param routine_path: Path of the YAML routine.
+    :return: Tasks.
+    """
+    with open(routine_path, "rb") as f:
+        entries = yaml.safe_load(f.read().decode("utf-8")) or []
+    tasks = []
+    for position, entry in enumerate(entries):
+        entry = dict(entry)
+        kind = entry.pop("kind")
+        account = entry.pop("account", None)
+        index = entry.pop("index", None)
+        task_id = entry.pop("id", None) or f"{position}:{kind}:{account or '*'}:{'*' if index is None else index}"
+        cost = float(entry.pop("cost", 60.0))
+        tasks.append(Task(task_id, kind, entry, cost, account, index))
+    return tasks
+
+
+class WorkStealingQueue:
+    """
+    Fleet-wide queue of typed tasks with estimated costs.
+
+    Every worker (emulator) owns a deque. Tasks are dealt out longest first to the worker with the least
+    queued cost it may run them on. A worker takes from the front of its own deque, and once it is empty
+    steals from the back of the most loaded deque it is allowed to take from. Tasks pinned to an emulator
+    are never stolen, tasks pinned to an account only by workers of that account.
+
+    Every state change is appended to a JSON-lines journal, reopening the journal after a crash
+    resumes the run: finished tasks stay finished and interrupted ones run again.
+    """
+    def __init__(
+            self,
+            journal_path: Optional[str] = None,
+            logger: Logger = None,
+            max_attempts: int = 2,
+            fsync: bool = False
+    ):
+        """
+        :param journal_path: JSON-lines journal, None for an in-memory queue.
+        :param logger: Parent logger.
+        :param max_attempts: Runs of a failing task before it is given up.
+        :param fsync: Force every journal entry to disk, slower but safe against power loss.
+        """
+        if logger is None:
+            self.logger = Logger(self.__class__.__name__)
+        else:
+            self.logger = logger.get_child_logger(self.__class__.__name__)
+        self.journal_path = journal_path
+        self.max_attempts = max_attempts
+        self.fsync = fsync
+
+        self.tasks: dict[str, Task] = {}
+        self.workers: dict[int, Optional[str]] = {}    # emulator index -> account
+        self._deques: dict[int, deque[str]] = {}
+        self._retired: set[int] = set()
+        self._condition = threading.Condition()
+        self.steals = 0
+        self.busy_seconds: dict[int, float] = {}
+        self._started: dict[str, float] = {}
+
+        self._journal = None
+        if journal_path:
+            self._replay()
+            os.makedirs(os.path.dirname(os.path.abspath(journal_path)), exist_ok=True)
+            self._journal = open(journal_path, "a", encoding="utf-8")
+
+    def register(self, index: int, account: Optional[str] = None) -> None:
+        """
+        Add a worker, before or after tasks were added.
+        Tasks not started yet are dealt out again over all workers, the new one included.
+
+        :param index: Emulator index.
+        :param account: Account logged in on the emulator.
+        """
+        with self._condition:
+            self.workers[index] = account
+            self._deques.setdefault(index, deque())
+            self.busy_seconds.setdefault(index, 0.0)
+            self._retired.discard(index)
+            pending = [task for task in self.tasks.values() if task.state == PENDING]
+            for queued in self._deques.values():
+                queued.clear()
+            for task in pending:
+                task.owner = None
+            self._deal(pending)
+            self._condition.notify_all()
+
+    def add(self, tasks: list[Task]) -> int:
+        """
+        Add tasks, tasks already known from the journal are skipped.
+
+        :return: Number of new tasks.
+        """
+        with self._condition:
+            new = [task for task in tasks if task.task_id not in self.tasks]
+            for task in new:
+                self.tasks[task.task_id] = task
+                self._write({"event": "add", "task": asdict(task)})
+            self._deal(new)
+            self._condition.notify_all()
+        return len(new)
+
+    def take(
+            self,
+            index: int,
+            timeout: Optional[float] = None,
+            stop_event: threading.Event = None
+    ) -> Optional[Task]:
+        """
+        Next task of a worker, stolen from another worker if its own deque is empty.
+        Blocks while other workers run tasks which may still fail and come back.
+
+        :param index: Emulator index of the worker.
+        :param timeout: Maximum seconds to block.
+        :param stop_event: Set to stop waiting.
+        :return: The task, now running, or None when nothing is left for this worker.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while stop_event is None or not stop_event.is_set():
+                task = self._pop_own(index) or self._steal(index)
+                if task is not None:
+                    task.state, task.owner = RUNNING, index
+                    task.attempts += 1
+                    self._started[task.task_id] = time.monotonic()
+                    self._write({"event": "start", "task_id": task.task_id, "owner": index})
+                    return task
+                if not any(task.state == RUNNING for task in self.tasks.values()):
+                    return None
+                remaining = 0.5 if deadline is None else min(0.5, deadline - time.monotonic())
+                if remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+            return None
+
+    def complete(self, task_id: str, ok: bool = True, result: Any = None, error: Optional[str] = None) -> None:
+        """
+        Report the outcome of a task taken with take(). Failed tasks are retried up to max_attempts.
+        """
+        with self._condition:
+            task = self.tasks[task_id]
+            owner = task.owner
+            started = self._started.pop(task_id, None)
+            if started is not None:
+                TASK_SECONDS.labels(kind=task.kind).observe(time.monotonic() - started)
+                if owner in self.busy_seconds:
+                    self.busy_seconds[owner] += time.monotonic() - started
+            if ok:
+                task.state, task.result, task.error = DONE, result, None
+                TASKS.labels(kind=task.kind, result="done").inc()
+            elif task.attempts < self.max_attempts:
+                task.state, task.owner, task.error = PENDING, None, error
+                self._deal([task])
+                TASKS.labels(kind=task.kind, result="retried").inc()
+            else:
+                task.state, task.error = FAILED, error
+                TASKS.labels(kind=task.kind, result="failed").inc()
+                self.logger.error(f"Task {task_id} failed {task.attempts} times: {error}")
+            self._write({
+                "event": "finish", "task_id": task_id, "state": task.state,
+                "attempts": task.attempts, "result": result, "error": error
+            })
+            self._condition.notify_all()
+
+    def retire(self, index: int) -> None:
+        """
+        Remove a worker that can not run tasks any more, e.g. its emulator did not start.
+        Its unpinned tasks are left to be stolen, tasks pinned to it fail.
+        """
+        with self._condition:
+            self._retired.add(index)
+            for task_id in list(self._deques.get(index, ())):
+                task = self.tasks[task_id]
+                if task.index == index or not self._runnable_elsewhere(task):
+                    self._deques[index].remove(task_id)
+                    task.state, task.error = FAILED, f"emulator {index} retired"
+                    self._write({"event": "finish", "task_id": task_id, "state": FAILED, "error": task.error})
+            self._condition.notify_all()
+
+    @property
+    def finished(self) -> bool:
+        with self._condition:
+            return all(task.state in (DONE, FAILED) for task in self.tasks.values())
+
+    def counts(self) -> dict[str, int]:
+        with self._condition:
+            counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for task in self.tasks.values():
+                counts[task.state] += 1
+            return counts
+
+    def summary(self) -> str:
+        counts = self.counts()
+        busy = ", ".join(f"{index}: {seconds:.1f}s" for index, seconds in sorted(self.busy_seconds.items()))
+        return (
+            f"{counts[DONE]} done, {counts[FAILED]} failed, {counts[PENDING] + counts[RUNNING]} left, "
+            f"{self.steals} stolen; busy time per emulator {busy}"
+        )
+
+    def close(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def _allowed(self, task: Task, index: int) -> bool:
+        if index in self._retired:
+            return False
+        if task.index is not None and task.index != index:
+            return False
+        return task.account is None or task.account == self.workers.get(index)
+
+    def _runnable_elsewhere(self, task: Task) -> bool:
+        return any(self._allowed(task, index) for index in self.workers)
+
+    def _queued_cost(self, index: int) -> float:
+        return sum(self.tasks[task_id].cost for task_id in self._deques[index])
+
+    def _deal(self, tasks: list[Task]) -> None:
+        # Longest processing time first onto the least loaded allowed worker.
+        loads = {index: self._queued_cost(index) for index in self._deques if index not in self._retired}
+        for task in sorted(tasks, key=lambda task: task.cost, reverse=True):
+            allowed = [index for index in loads if self._allowed(task, index)]
+            if not allowed:
+                continue    # kept pending until a matching worker registers
+            index = min(allowed, key=lambda i: loads[i])
+            self._deques[index].append(task.task_id)
+            task.owner = index
+            loads[index] += task.cost
+
+    def _pop_own(self, index: int) -> Optional[Task]:
+        own = self._deques.get(index)
+        while own:
+            task = self.tasks[own.popleft()]
+            if task.state == PENDING:
+                return task
+        return None
+
+    def _steal(self, index: int) -> Optional[Task]:
+        victims = sorted(
+            (other for other in self._deques if other != index),
+            key=self._queued_cost,
+            reverse=True
+        )
+        for victim in victims:
+            queued = self._deques[victim]
+            for task_id in reversed(queued):
+                task = self.tasks[task_id]
+                if task.state == PENDING and self._allowed(task, index):
+                    queued.remove(task_id)
+                    self.steals += 1
+                    self.logger.debug(f"Emulator {index} stole {task_id} from emulator {victim}")
+                    return task
+        return None
+
+    def _write(self, entry: dict) -> None:
+        if self._journal is None:
+            return
+        self._journal.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+    def _replay(self) -> None:
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, "rb+") as f:
+            data = f.read()
+            # The last line may be cut off by the crash, new entries must not be appended to it.
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                self.logger.warning(f"Dropping the cut-off last entry of journal {self.journal_path}")
+                f.truncate(end)
+        orphans = 0
+        for line in data[:end].decode("utf-8").splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            match entry["event"]:
+                case "add":
+                    task = Task(**entry["task"])
+                    self.tasks[task.task_id] = task
+                case "start" | "finish" if entry["task_id"] not in self.tasks:
+                    # Its add entry was lost.
+                    orphans += 1
+                case "start":
+                    task = self.tasks[entry["task_id"]]
+                    task.state, task.owner = RUNNING, entry["owner"]
+                    task.attempts += 1
+                case "finish":
+                    task = self.tasks[entry["task_id"]]
+                    task.state, task.error = entry["state"], entry.get("error")
+                    task.result = entry.get("result")
+        if orphans:
+            self.logger.warning(f"Skipped {orphans} entries of unknown tasks in journal {self.journal_path}")
+        resumed = 0
+        for task in self.tasks.values():
+            if task.state in (RUNNING, PENDING):
+                # Interrupted by the crash, or never started: run it (again).
+                task.state, task.owner = PENDING, None
+                resumed += 1
+        if self.tasks:
+            self.logger.info(
+                f"Resumed journal {self.journal_path}: {len(self.tasks) - resumed} tasks finished, {resumed} to run"
+            )
@@ -0,0 +1,35 @@
+from E7A.common.utils import lazy_attributes
+
+# Every recognizer depends on cv2 and numpy, import them on first access only.
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    'HsvFilter': '.hsv_filter',
+    'Match': '.template_matcher',
+    'TemplateMatcher': '.template_matcher',
+    'DigitReader': '.digit_reader',
+    'ScreenClassifier': '.screen_classifier',
+    'Asset': '.asset_store',
+    'AssetStore': '.asset_store',
+    'FrameViews': '.frame_views',
+    'PixelProbe': '.pixel_probe',
+    'SettleDetector': '.settle_detector',
+    'PyramidMatcher': '.pyramid_matcher',
+    'BatchMatcher': '.batch_matcher',
+    'FrameGraph': '.frame_graph'
+})
+
+
+__all__ = [
+    'HsvFilter',
+    'Match',
+    'TemplateMatcher',
+    'DigitReader',
+    'ScreenClassifier',
+    'Asset',
+    'AssetStore',
+    'FrameViews',
+    'PixelProbe',
+    'SettleDetector',
+    'PyramidMatcher',
+    'BatchMatcher',
+    'FrameGraph'
+]
@@ -0,0 +1,323 @@
+import os
+import json
+import struct
+import hashlib
+from typing import Optional
+
+import cv2
+import numpy
+
+from E7A.common.logger import Logger
+from E7A.graphics.hsv_filter import HsvFilter
+
+# Pack layout: MAGIC | header length (uint64, little endian) | JSON header | padding | aligned arrays.
+# Array offsets in the header are relative to the first aligned byte after the header.
+MAGIC = b"E7APACK1"
+ALIGNMENT = 64
+
+
+class Asset:
+    """
+    A template stored in the pack. Every array is a read-only view on the memory-mapped file.
+    """
+    __slots__ = ("name", "bgr", "gray", "hsv", "alpha", "mask", "pyramid")
+
+    def __init__(self, name: str, arrays: dict[str, numpy.ndarray]):
+        self.name = name
+        self.bgr: numpy.ndarray = arrays["bgr"]
+        self.gray: numpy.ndarray = arrays["gray"]
+        self.hsv: numpy.ndarray = arrays["hsv"]
+        self.alpha: Optional[numpy.ndarray] = arrays.get("alpha")
+        self.mask: Optional[numpy.ndarray] = arrays.get("mask")
+        # pyramid[0] is gray itself, pyramid[i] is gray downscaled by 2 ** i.
+        self.pyramid: list[numpy.ndarray] = [self.gray]
+        while f"pyramid_{len(self.pyramid)}" in arrays:
+            self.pyramid.append(arrays[f"pyramid_{len(self.pyramid)}"])
+
+    @property
+    def shape(self) -> tuple:
+        return self.gray.shape
+
+
+class AssetStore:
+    """
+    Single-file store of decoded and preprocessed templates.
+    The pack is memory-mapped read-only, so opening it costs the same for any library size
+    and processes opening the same pack share its pages.
+    The pack is rebuilt only when the content of a source PNG changed.
+    """
+    def __init__(self, pack_path: str, logger: Logger = None):
+        """
+        :param pack_path: Path of an existing pack, see AssetStore.open to build it.
+        :param logger: Parent logger.
+        """
+        if logger is None:
+            self.logger = Logger(self.__class__.__name__)
+        else:
+            self.logger = logger.get_child_logger(self.__class__.__name__)
+        self.pack_path = pack_path
+        self.header, self._data_start = self.read_header(pack_path)
+        self._data = numpy.memmap(pack_path, dtype=numpy.uint8, mode="r")
+        self._assets: dict[str, Asset] = {}
+
+    @classmethod
+    def open(
+            cls,
+            source_dir: str,
+            pack_path: str,
+            pyramid_levels: int = 2,
+            hsv_filters: Optional[dict[str, HsvFilter]] = None,
+            logger: Logger = None
+    ) -> "AssetStore":
+        """
+        Open the pack of source_dir, rebuilding it first if the source PNGs changed.
+
+        :param source_dir: Directory of template PNGs, sub-directories are included.
+        :param pack_path: Path of the pack file.
+        :param pyramid_levels: Number of downscaled levels stored besides full resolution.
+        :param hsv_filters: Template name to HsvFilter, the filtered mask is stored with the template.
+        :param logger: Parent logger.
+        :return: AssetStore instance.
+        """
+        hsv_filters = hsv_filters or {}
+        options = {
+            "pyramid_levels": pyramid_levels,
+            "hsv_filters": {name: vars(hsv_filter) for name, hsv_filter in sorted(hsv_filters.items())}
+        }
+        store_logger = logger if logger is not None else Logger(cls.__name__)
+        if not cls._is_up_to_date(source_dir, pack_path, options, store_logger):
+            store_logger.info(f"Assets in {source_dir} changed, rebuilding {pack_path}")
+            cls.build(source_dir, pack_path, pyramid_levels, hsv_filters)
+        return cls(pack_path, logger)
+
+    def __len__(self) -> int:
+        return len(self.header["assets"])
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.header["assets"]
+
+    @property
+    def names(self) -> list[str]:
+        return list(self.header["assets"].keys())
+
+    def get(self, name: str) -> Asset:
+        """
+        :param name: Template name, its path relative to the source directory without extension.
+        :return: The template views.
+        """
+        asset = self._assets.get(name)
+        if asset is None:
+            entry = self.header["assets"][name]
+            arrays = {
+                key: numpy.ndarray(
+                    shape=tuple(spec["shape"]),
+                    dtype=numpy.dtype(spec["dtype"]),
+                    buffer=self._data,
+                    offset=self._data_start + spec["offset"]
+                )
+                for key, spec in entry["arrays"].items()
+            }
+            asset = Asset(name, arrays)
+            self._assets[name] = asset
+        return asset
+
+    @staticmethod
+    def read_header(pack_path: str) -> tuple[dict, int]:
+        """
+        :param pack_path: Path of the pack file.
+        :return: The JSON header and the file offset of the data section.
+        """
+        with open(pack_path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{pack_path} is not an asset pack")
+            (header_length,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_length).decode("utf-8"))
+        return header, _aligned(len(MAGIC) + 8 + header_length)
+
+    @classmethod
+    def build(
+            cls,
+            source_dir: str,
+            pack_path: str,
+            pyramid_levels: int = 2,
+            hsv_filters: Optional[dict[str, HsvFilter]] = None
+    ) -> None:
+        """
+        Decode and preprocess every PNG under source_dir and write them into a single pack.
+
+        :param source_dir: Directory of template PNGs.
+        :param pack_path: Path of the pack file, replaced atomically.
+        :param pyramid_levels: Number of downscaled levels stored besides full resolution.
+        :param hsv_filters: Template name to HsvFilter for stored HSV masks.
+        """
+        hsv_filters = hsv_filters or {}
+        entries = {}
+        # PNGs cv2 can not decode, recorded so that they do not look like new files on the next open.
+        skipped = {}
+        blobs: list[numpy.ndarray] = []
+        offset = 0
+        for name, path in cls._list_sources(source_dir):
+            image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+            if image is None:
+                skipped[name] = _source_entry(path, source_dir)
+                continue
+            arrays = cls._preprocess(image, pyramid_levels, hsv_filters.get(name))
+            specs = {}
+            for key, array in arrays.items():
+                array = numpy.ascontiguousarray(array)
+                specs[key] = {"offset": offset, "shape": list(array.shape), "dtype": array.dtype.str}
+                blobs.append(array)
+                offset += _aligned(array.nbytes)
+            entries[name] = {**_source_entry(path, source_dir), "arrays": specs}
+
+        header = {
+            "pyramid_levels": pyramid_levels,
+            "hsv_filters": {name: vars(hsv_filter) for name, hsv_filter in sorted(hsv_filters.items())},
+            "assets": entries,
+            "skipped": skipped
+        }
+        padded = (array.tobytes() + b"\0" * (_aligned(array.nbytes) - array.nbytes) for array in blobs)
+        cls._write(pack_path, header, padded)
+        # Stats refreshed for the previous pack are superseded by the new header.
+        if os.path.exists(_stats_path(pack_path)):
+            os.remove(_stats_path(pack_path))
+
+    @staticmethod
+    def _write(pack_path: str, header: dict, data) -> None:
+        """
+        Write a pack to a temporary file and replace pack_path with it.
+
+        :param data: Byte chunks of the data section.
+        """
+        encoded = json.dumps(header).encode("utf-8")
+        data_start = _aligned(len(MAGIC) + 8 + len(encoded))
+        temp_path = pack_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(encoded)))
+            f.write(encoded)
+            f.write(b"\0" * (data_start - f.tell()))
+            for chunk in data:
+                f.write(chunk)
+        os.replace(temp_path, pack_path)
+
+    @staticmethod
+    def _preprocess(
+            image: numpy.ndarray,
+            pyramid_levels: int,
+            hsv_filter: Optional[HsvFilter]
+    ) -> dict[str, numpy.ndarray]:
+        arrays = {}
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        elif image.shape[2] == 4:
+            arrays["alpha"] = image[:, :, 3]
+            image = image[:, :, :3]
+        arrays["bgr"] = image
+        arrays["gray"] = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        arrays["hsv"] = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        if hsv_filter is not None:
+            arrays["mask"] = hsv_filter.mask(arrays["hsv"])
+        level_image = arrays["gray"]
+        for level in range(1, pyramid_levels + 1):
+            if min(level_image.shape[:2]) < 2:
+                break
+            level_image = cv2.pyrDown(level_image)
+            arrays[f"pyramid_{level}"] = level_image
+        return arrays
+
+    @staticmethod
+    def _list_sources(source_dir: str) -> list[tuple[str, str]]:
+        sources = []
+        for root, _, files in os.walk(source_dir):
+            for file_name in files:
+                if file_name.lower().endswith(".png"):
+                    path = os.path.join(root, file_name)
+                    name = os.path.splitext(os.path.relpath(path, source_dir))[0].replace(os.sep, "/")
+                    sources.append((name, path))
+        return sorted(sources)
+
+    @classmethod
+    def _is_up_to_date(cls, source_dir: str, pack_path: str, options: dict, logger: Logger) -> bool:
+        """
+        Compare the sources with the pack header. Size and mtime are checked first,
+        the content hash is only computed for files whose stat changed. When only stats changed,
+        e.g. after a checkout, they are written to a small sidecar file next to the pack so the next
+        open does not hash again. The pack itself is never rewritten for that, it may be mapped by
+        other processes.
+        """
+        if not os.path.exists(pack_path):
+            return False
+        try:
+            header, _ = cls.read_header(pack_path)
+        except (ValueError, OSError, struct.error, json.JSONDecodeError):
+            return False
+        if any(header.get(key) != value for key, value in options.items()):
+            return False
+
+        entries = {**header["assets"], **header.get("skipped", {})}
+        sources = cls._list_sources(source_dir)
+        if [name for name, _ in sources] != sorted(entries):
+            return False
+        stats = _read_stats(pack_path)
+        touched = False
+        for name, path in sources:
+            entry = entries[name]
+            # A sidecar entry counts only for the content the pack was built from.
+            refreshed = stats.get(name)
+            if refreshed is not None and refreshed["sha1"] == entry["sha1"]:
+                entry = refreshed
+            stat = os.stat(path)
+            if stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]:
+                continue
+            if _file_sha1(path) != entry["sha1"]:
+                return False
+            stats[name] = {"sha1": entry["sha1"], "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            touched = True
+        if touched:
+            try:
+                _write_stats(pack_path, stats)
+            except OSError as e:
+                logger.warning(f"Could not record refreshed asset stats of {pack_path}: {e}")
+        return True
+
+
+def _aligned(size: int) -> int:
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _stats_path(pack_path: str) -> str:
+    return pack_path + ".stats.json"
+
+
+def _read_stats(pack_path: str) -> dict[str, dict]:
+    """
+    :return: Source name to the {"sha1", "size", "mtime_ns"} recorded after the pack was built.
+    """
+    try:
+        with open(_stats_path(pack_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_stats(pack_path: str, stats: dict[str, dict]) -> None:
+    temp_path = _stats_path(pack_path) + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(stats, f)
+    os.replace(temp_path, _stats_path(pack_path))
+
+
+def _source_entry(path: str, source_dir: str) -> dict:
+    stat = os.stat(path)
+    return {
+        "source": os.path.relpath(path, source_dir),
+        "sha1": _file_sha1(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns
+    }
+
+
+def _file_sha1(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
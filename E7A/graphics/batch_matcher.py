@@ -0,0 +1,364 @@
+"""
+Correlate a bank of templates against one frame or ROI, sharing the transform of the ROI.
+
+Throughput benchmark, in templates per second per core:
+
+    python -m E7A.graphics.batch_matcher --frames temp/screenshots --templates assets/templates
+"""
+import sys
+import time
+import argparse
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import cv2
+import numpy
+
+from E7A.graphics.template_matcher import Match, TemplateMatcher, to_gray
+
+# Templates with at least this many pixels are correlated by FFT until calibrate() measured the costs.
+DEFAULT_FFT_MIN_AREA = 16 * 16
+
+
+@dataclass
+class MatchCosts:
+    """
+    CPU seconds per template measured by BatchMatcher.calibrate() for one ROI size.
+    """
+    areas: list[int]              # template areas timed with cv2.matchTemplate, ascending
+    direct: list[float]           # cv2.matchTemplate seconds at each area
+    inverse_fft: float            # product and inverse FFT of one template
+    normalization: float          # window norms, computed once per template shape
+
+    def use_fft(self, area: int, same_shape: int) -> bool:
+        """
+        :param area: Template area.
+        :param same_shape: Templates of the batch sharing the shape, they share the normalization.
+        """
+        direct = float(numpy.interp(area, self.areas, self.direct))
+        return self.inverse_fft + self.normalization / same_shape < direct
+
+
+class BatchMatcher:
+    """
+    Normalized cross-correlation (the score of cv2.TM_CCOEFF_NORMED) of many templates on the same image.
+
+    The FFT path transforms the ROI once, multiplies it with the pre-transformed, zero-mean templates in
+    batches of batch_size and transforms the products back, all vectorized in NumPy. Window norms come from
+    one integral image per ROI and are computed once per template shape. method="auto" correlates a template
+    by FFT if that is cheaper than cv2.matchTemplate for its size: by the costs measured with calibrate(),
+    which account for templates sharing a shape, or else from fft_min_area pixels on.
+
+    Template transforms depend on the ROI size, they are computed on first use for a size and cached.
+    """
+    def __init__(
+            self,
+            threshold: float = 0.8,
+            method: str = "auto",
+            fft_min_area: int = DEFAULT_FFT_MIN_AREA,
+            batch_size: int = 8
+    ):
+        """
+        :param threshold: Minimum score for a match.
+        :param method: "fft", "direct" or "auto".
+        :param fft_min_area: Template area from which "auto" uses the FFT path before calibration.
+        :param batch_size: Templates correlated per vectorized step, bounds the memory of the products.
+        """
+        if method not in ("fft", "direct", "auto"):
+            raise ValueError(f"Unknown batch match method: {method}")
+        self.threshold = threshold
+        self.method = method
+        self.fft_min_area = fft_min_area
+        self.batch_size = batch_size
+        self.templates: dict[str, numpy.ndarray] = {}
+        self.costs: dict[tuple[int, int], MatchCosts] = {}
+        self._direct = TemplateMatcher(cv2.TM_CCOEFF_NORMED, threshold)
+        # FFT shape -> template name -> (conjugated spectrum of the zero-mean template, its norm).
+        self._spectra: dict[tuple[int, int], dict[str, tuple[numpy.ndarray, float]]] = {}
+        self.templates_matched = 0
+        self.fft_templates = 0
+        self.cpu_seconds = 0.0
+
+    @property
+    def templates_per_second_per_core(self) -> float:
+        """
+        Templates matched per CPU second of the process, i.e. per fully used core.
+        """
+        return self.templates_matched / self.cpu_seconds if self.cpu_seconds > 0 else 0.0
+
+    def add(self, name: str, template: numpy.ndarray) -> None:
+        """
+        :param name: Template name.
+        :param template: Template image, gray or BGR(A).
+        """
+        self.templates[name] = numpy.ascontiguousarray(to_gray(template))
+        for spectra in self._spectra.values():
+            spectra.pop(name, None)
+
+    def plan(self, image_shape: tuple[int, int], names: Iterable[str]) -> tuple[list[str], list[str]]:
+        """
+        Split templates into those correlated by FFT and those matched directly.
+
+        :param image_shape: (height, width) of the searched image.
+        :param names: Templates fitting into the image.
+        :return: (FFT names, direct names).
+        """
+        names = list(names)
+        match self.method:
+            case "fft":
+                return names, []
+            case "direct":
+                return [], names
+        costs = self.costs.get(tuple(image_shape[:2]))
+        same_shape = Counter(self.templates[name].shape for name in names)
+        fft_names, direct_names = [], []
+        for name in names:
+            shape = self.templates[name].shape
+            area = shape[0] * shape[1]
+            use_fft = costs.use_fft(area, same_shape[shape]) if costs is not None else area >= self.fft_min_area
+            (fft_names if use_fft else direct_names).append(name)
+        return fft_names, direct_names
+
+    def score_maps(self, image: numpy.ndarray, names: Optional[Iterable[str]] = None) -> dict[str, numpy.ndarray]:
+        """
+        :param image: Frame or ROI, gray or BGR(A).
+        :param names: Template names, default every template.
+        :return: Template name to score map, templates larger than the image are left out.
+        """
+        start = time.process_time()
+        gray = to_gray(image)
+        fitting = [
+            name for name in (self.templates if names is None else names)
+            if self.templates[name].shape[0] <= gray.shape[0] and self.templates[name].shape[1] <= gray.shape[1]
+        ]
+        fft_names, direct_names = self.plan(gray.shape, fitting)
+        maps = {name: self._direct.score_map(gray, self.templates[name]) for name in direct_names}
+        if fft_names:
+            maps.update(self._fft_score_maps(gray, fft_names))
+        self.templates_matched += len(fitting)
+        self.fft_templates += len(fft_names)
+        self.cpu_seconds += time.process_time() - start
+        return maps
+
+    def match_all(
+            self,
+            image: numpy.ndarray,
+            names: Optional[Iterable[str]] = None,
+            threshold: Optional[float] = None
+    ) -> dict[str, Match]:
+        """
+        Best match of every template on the image.
+
+        :param image: Frame or ROI, coordinates of the matches are pixels of this image.
+        :param names: Template names, default every template.
+        :param threshold: Override of the default threshold.
+        :return: Template name to match, templates without a match are left out.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        matches = {}
+        for name, scores in self.score_maps(image, names).items():
+            _, max_score, _, (x, y) = cv2.minMaxLoc(scores)
+            if max_score >= threshold:
+                height, width = self.templates[name].shape
+                matches[name] = Match(x, y, width, height, float(max_score))
+        return matches
+
+    def calibrate(
+            self,
+            image_shape: tuple[int, int],
+            sizes: Iterable[int] = (8, 16, 24, 32, 48, 64, 96, 128),
+            count: int = 8
+    ) -> MatchCosts:
+        """
+        Time both paths on a random image of image_shape, "auto" then decides by these costs for that size.
+
+        :param image_shape: (height, width) of the ROIs that will be matched.
+        :param sizes: Square template sizes timed with cv2.matchTemplate.
+        :param count: Templates timed per measurement.
+        :return: The measured costs.
+        """
+        rng = numpy.random.default_rng(0)
+        image_shape = tuple(image_shape[:2])
+        image = rng.integers(0, 256, image_shape, dtype=numpy.uint8)
+        probe = BatchMatcher(self.threshold, "direct", batch_size=self.batch_size)
+        areas, direct = [], []
+        for size in sorted(sizes):
+            if size > min(image_shape):
+                break
+            probe.templates.clear()
+            for i in range(count):
+                probe.add(str(i), rng.integers(0, 256, (size, size), dtype=numpy.uint8))
+            areas.append(size * size)
+            direct.append(_best_cpu_time(lambda: probe.score_maps(image)) / count)
+
+        # Same shape: one normalization for all. Distinct shapes: one each, the difference is its cost.
+        size = min(32, min(image_shape) - count)
+        probe.method = "fft"
+        probe.templates.clear()
+        for i in range(count):
+            probe.add(str(i), rng.integers(0, 256, (size, size), dtype=numpy.uint8))
+        probe.score_maps(image)    # template spectra are cached outside the timing
+        shared = _best_cpu_time(lambda: probe.score_maps(image)) / count
+        probe.templates.clear()
+        for i in range(count):
+            probe.add(str(i), rng.integers(0, 256, (size, size + i), dtype=numpy.uint8))
+        probe.score_maps(image)
+        distinct = _best_cpu_time(lambda: probe.score_maps(image)) / count
+        costs = MatchCosts(areas, direct, shared, max(0.0, distinct - shared) * count / (count - 1))
+        self.costs[image_shape] = costs
+        return costs
+
+    def _spectrum(self, fft_shape: tuple[int, int], name: str) -> tuple[numpy.ndarray, float]:
+        spectra = self._spectra.setdefault(fft_shape, {})
+        entry = spectra.get(name)
+        if entry is None:
+            template = self.templates[name].astype(numpy.float32)
+            template -= template.mean()
+            norm = float(numpy.sqrt(numpy.square(template, dtype=numpy.float64).sum()))
+            # Conjugated once here, the correlation is then a plain product.
+            entry = numpy.conj(numpy.fft.rfft2(template, s=fft_shape)), norm
+            spectra[name] = entry
+        return entry
+
+    def _fft_score_maps(self, gray: numpy.ndarray, names: list[str]) -> dict[str, numpy.ndarray]:
+        height, width = gray.shape
+        fft_shape = (cv2.getOptimalDFTSize(height), cv2.getOptimalDFTSize(width))
+        image_spectrum = numpy.fft.rfft2(gray.astype(numpy.float32), s=fft_shape)
+        sums, square_sums = cv2.integral2(gray, sdepth=cv2.CV_64F)
+        products = numpy.empty((min(self.batch_size, len(names)),) + image_spectrum.shape, dtype=numpy.complex64)
+
+        inverse_norms: dict[tuple[int, int], numpy.ndarray] = {}
+        maps = {}
+        for start in range(0, len(names), self.batch_size):
+            batch = names[start:start + self.batch_size]
+            norms = []
+            for i, name in enumerate(batch):
+                spectrum, norm = self._spectrum(fft_shape, name)
+                numpy.multiply(image_spectrum, spectrum, out=products[i])
+                norms.append(norm)
+            # The template is zero-mean, so its correlation with the image equals that with the
+            # window-mean-subtracted image: the numerator of TM_CCOEFF_NORMED.
+            correlations = numpy.fft.irfft2(products[:len(batch)], s=fft_shape)
+            for name, correlation, norm in zip(batch, correlations, norms):
+                h, w = self.templates[name].shape
+                if (h, w) not in inverse_norms:
+                    inverse_norms[h, w] = _inverse_window_norms(sums, square_sums, h, w)
+                scores = numpy.multiply(correlation[:height - h + 1, :width - w + 1], inverse_norms[h, w])
+                if norm > 0:
+                    scores *= 1.0 / norm
+                else:
+                    scores[:] = 0.0    # flat template
+                maps[name] = numpy.clip(scores, -1.0, 1.0, out=scores)
+        return maps
+
+
+def _inverse_window_norms(sums: numpy.ndarray, square_sums: numpy.ndarray, h: int, w: int) -> numpy.ndarray:
+    """
+    1 / sqrt(sum((I - mean(I)) ** 2)) of every h x w window from the integral images, 0 for flat windows.
+    Computed in place, this runs once per template shape and ROI.
+    """
+    window_sum = sums[h:, w:] - sums[:-h, w:]
+    window_sum -= sums[h:, :-w]
+    window_sum += sums[:-h, :-w]
+    variance = square_sums[h:, w:] - square_sums[:-h, w:]
+    variance -= square_sums[h:, :-w]
+    variance += square_sums[:-h, :-w]
+    window_sum *= window_sum
+    window_sum *= 1.0 / (h * w)
+    variance -= window_sum
+    norms = numpy.sqrt(variance, out=variance).astype(numpy.float32)
+    inverse = numpy.zeros_like(norms)
+    numpy.divide(1.0, norms, out=inverse, where=norms > 1e-3)
+    return inverse
+
+
+def _best_cpu_time(function, repeats: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.process_time()
+        function()
+        best = min(best, time.process_time() - start)
+    return best
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Batched FFT against per-template direct matching.")
+    parser.add_argument("--frames", default=None,
+                        help="Recorded frame or directory of frames, default synthetic screens.")
+    parser.add_argument("--templates", default=None,
+                        help="Template file or directory, default crops of the frames.")
+    parser.add_argument("--crops", type=int, default=64, help="Number of templates cut from the frames.")
+    parser.add_argument("--roi", type=int, nargs=4, default=None, metavar=("X", "Y", "WIDTH", "HEIGHT"),
+                        help="Region of the frames searched, default the whole frame.")
+    parser.add_argument("--sizes", type=int, nargs=2, default=(16, 128), metavar=("MIN", "MAX"),
+                        help="Side lengths of the templates cut from the frames.")
+    parser.add_argument("--batch-size", type=int, default=8, help="Templates per vectorized FFT step.")
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    from E7A.graphics.pyramid_matcher import crop_templates, load_images
+
+    args = build_parser().parse_args(argv)
+    if args.frames:
+        frames = list(load_images(args.frames).values())
+    else:
+        from E7A.simulator.screens import synthetic_screens
+        rng = numpy.random.default_rng(0)
+        frames = [
+            cv2.add(screen, rng.integers(0, 12, screen.shape, dtype=numpy.uint8)) for screen in synthetic_screens()
+        ]
+    if not frames:
+        sys.stderr.write(f"No frames found in {args.frames}\n")
+        return 2
+    if args.roi:
+        x, y, width, height = args.roi
+        frames = [frame[y:y + height, x:x + width] for frame in frames]
+    if args.templates:
+        templates = load_images(args.templates, cv2.IMREAD_UNCHANGED)
+    else:
+        size = min(frames[0].shape[:2]) // 2
+        templates = crop_templates(frames, args.crops, (min(args.sizes[0], size), min(args.sizes[1], size)))
+
+    auto = BatchMatcher(method="auto", batch_size=args.batch_size)
+    costs = auto.calibrate(frames[0].shape[:2])
+    print(f"{len(frames)} frames {frames[0].shape[1]}x{frames[0].shape[0]}, {len(templates)} templates")
+    print(
+        f"per template: inverse FFT {costs.inverse_fft * 1000:.2f} ms + normalization "
+        f"{costs.normalization * 1000:.2f} ms per shape, direct {costs.direct[0] * 1000:.2f}"
+        f"-{costs.direct[-1] * 1000:.2f} ms"
+    )
+    results = {}
+    for method in ("direct", "fft", "auto"):
+        matcher = auto if method == "auto" else BatchMatcher(method=method, batch_size=args.batch_size)
+        for name, template in templates.items():
+            matcher.add(name, template)
+        matcher.score_maps(frames[0])    # template spectra are built once per ROI size
+        matcher.templates_matched, matcher.fft_templates, matcher.cpu_seconds = 0, 0, 0.0
+        start = time.perf_counter()
+        results[method] = [matcher.match_all(frame) for frame in frames]
+        wall = time.perf_counter() - start
+        print(
+            f"{method:<7} {matcher.templates_per_second_per_core:9.1f} templates/s/core  "
+            f"{wall / len(frames) * 1000:8.1f} ms per frame  "
+            f"{matcher.fft_templates / max(1, matcher.templates_matched) * 100:5.1f}% by FFT"
+        )
+
+    differences = [
+        abs(reference[name].score - other[name].score)
+        for method in ("fft", "auto")
+        for reference, other in zip(results["direct"], results[method])
+        for name in reference.keys() & other.keys()
+    ]
+    agreement = sum(
+        len(reference.keys() & other.keys()) + len(set(templates) - reference.keys() - other.keys())
+        for reference, other in zip(results["direct"], results["fft"])
+    ) / (len(frames) * len(templates))
+    print(f"FFT agrees with direct on {agreement * 100:.1f}% of searches, "
+          f"max score difference {max(differences, default=0.0):.4f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import os
+import hashlib
+from collections import OrderedDict
+from typing import Optional
+
+import cv2
+import numpy
+
+from E7A.common.logger import Logger
+from E7A.graphics.template_matcher import Match, TemplateMatcher, suppress_overlaps, to_gray
+
+# Glyph file names that cannot be the character itself.
+GLYPH_FILE_NAMES = {
+    "slash": "/",
+    "comma": ",",
+    "dot": ".",
+    "colon": ":",
+    "plus": "+",
+    "percent": "%",
+}
+
+
+class DigitReader:
+    """
+    Read numbers from fixed UI regions (stamina, gold, bookmarks...) by matching glyph templates.
+    Results are cached by a hash of the region pixels, so an unchanged counter is never re-read.
+    """
+    def __init__(
+            self,
+            glyphs: dict[str, numpy.ndarray],
+            regions: Optional[dict[str, tuple[int, int, int, int]]] = None,
+            logger: Logger = None,
+            threshold: float = 0.8,
+            binarize: bool = True,
+            cache_size: int = 256
+    ):
+        """
+        :param glyphs: Character to glyph image, cropped tight around the character.
+        :param regions: Region name to (x, y, width, height) in frame pixels.
+        :param logger: Parent logger.
+        :param threshold: Minimum match score for a glyph.
+        :param binarize: Binarize glyphs and regions with Otsu before matching.
+        :param cache_size: Maximum number of cached region readings.
+        """
+        if logger is None:
+            self.logger = Logger(self.__class__.__name__)
+        else:
+            self.logger = logger.get_child_logger(self.__class__.__name__)
+        self.regions = dict(regions or {})
+        self.binarize = binarize
+        self.matcher = TemplateMatcher(cv2.TM_CCOEFF_NORMED, threshold)
+        self.glyphs = {char: self._preprocess(glyph) for char, glyph in glyphs.items()}
+
+        self._cache: OrderedDict[tuple, str] = OrderedDict()
+        self._cache_size = cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @classmethod
+    def from_directory(cls, glyph_dir: str, **kwargs) -> "DigitReader":
+        """
+        Create a reader from a directory of glyph images named after their character, e.g. "7.png".
+        Characters which can not be file names use the names in GLYPH_FILE_NAMES, e.g. "slash.png".
+
+        :param glyph_dir: Directory holding the glyph images.
+        :param kwargs: Other arguments of DigitReader.
+        :return: DigitReader instance.
+        """
+        glyphs = {}
+        for file_name in sorted(os.listdir(glyph_dir)):
+            stem, ext = os.path.splitext(file_name)
+            if ext.lower() != ".png":
+                continue
+            image = cv2.imread(os.path.join(glyph_dir, file_name), cv2.IMREAD_GRAYSCALE)
+            if image is None:
+                continue
+            glyphs[GLYPH_FILE_NAMES.get(stem, stem)] = image
+        return cls(glyphs, **kwargs)
+
+    def read_text(self, frame: numpy.ndarray, region: str | tuple[int, int, int, int]) -> str:
+        """
+        Read the characters shown in a region of the frame.
+
+        :param frame: BGR or gray frame, e.g. ScrcpyManager.views.gray which skips the per-region conversion.
+        :param region: Region name registered in self.regions, or (x, y, width, height).
+        :return: The recognized characters, empty if nothing matched.
+        """
+        x, y, width, height = self.regions[region] if isinstance(region, str) else region
+        roi = numpy.ascontiguousarray(frame[y:y + height, x:x + width])
+        key = (roi.shape, hashlib.blake2b(roi, digest_size=16).digest())
+
+        text = self._cache.get(key)
+        if text is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return text
+
+        self.cache_misses += 1
+        text = self._recognize(roi)
+        self._cache[key] = text
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return text
+
+    def read_number(self, frame: numpy.ndarray, region: str | tuple[int, int, int, int]) -> Optional[int]:
+        """
+        Read an integer from a region, separators such as "," are ignored.
+        For counters like "12/80" only the part before "/" is returned.
+
+        :param frame: BGR or gray frame.
+        :param region: Region name or (x, y, width, height).
+        :return: The number, or None if no digit was recognized.
+        """
+        text = self.read_text(frame, region).split("/")[0]
+        digits = "".join(char for char in text if char.isdigit())
+        return int(digits) if digits else None
+
+    def read_all(self, frame: numpy.ndarray) -> dict[str, Optional[int]]:
+        """
+        Read every registered region of the frame.
+
+        :param frame: BGR or gray frame.
+        :return: Region name to number.
+        """
+        return {name: self.read_number(frame, name) for name in self.regions}
+
+    def clear_cache(self) -> None:
+        self._cache.clear()
+
+    def _preprocess(self, image: numpy.ndarray) -> numpy.ndarray:
+        gray = to_gray(image)
+        if self.binarize:
+            _, gray = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        return gray
+
+    def _recognize(self, roi: numpy.ndarray) -> str:
+        image = self._preprocess(roi)
+        hits: list[tuple[Match, str]] = []
+        for char, glyph in self.glyphs.items():
+            for match in self.matcher.match_all(image, glyph):
+                hits.append((match, char))
+        if not hits:
+            return ""
+
+        # Glyphs of similar shapes (e.g. "3" and "8") hit the same place, keep the best one.
+        hits.sort(key=lambda hit: hit[0].score, reverse=True)
+        chars = {id(match): char for match, char in hits}
+        kept = suppress_overlaps([match for match, _ in hits])
+        kept.sort(key=lambda match: match.x)
+        text = "".join(chars[id(match)] for match in kept)
+        self.logger.debug(f"Recognized '{text}' in region of shape {roi.shape}")
+        return text
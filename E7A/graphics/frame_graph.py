@@ -0,0 +1,240 @@
+import time
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Optional, Sequence
+
+import numpy
+
+from E7A.common.metrics import metrics_registry
+from E7A.graphics.frame_views import VIEW_CONVERSIONS, FrameViews
+
+_NODE_SECONDS = metrics_registry.histogram(
+    "e7a_recognizer_seconds", "Time to compute a FrameGraph node, without its inputs.", ["node"]
+)
+
+
+@dataclass
+class NodeStats:
+    """
+    Profile of one node. seconds is the node's own time, without computing its inputs.
+    """
+    computations: int = 0
+    hits: int = 0
+    seconds: float = 0.0
+
+    @property
+    def mean_seconds(self) -> float:
+        return self.seconds / self.computations if self.computations else 0.0
+
+
+@dataclass(frozen=True)
+class Node:
+    name: str
+    function: Callable[..., Any]
+    inputs: tuple[str, ...]
+
+
+class FrameGraph:
+    """
+    Per-frame computation graph of recognizers and the intermediate results they share.
+
+    Nodes declare their inputs by name and are computed lazily, at most once per frame id: the first get()
+    of a frame computes the node and its missing inputs, later gets return the memoized result until
+    update() sets a new frame. Checks sharing a gray conversion, an ROI crop, an HSV mask or a hash
+    therefore cost the union of their nodes, not the sum.
+
+    "bgr", "gray" and "hsv" are built in and come from FrameViews, sharing its buffers.
+    Results are shared between consumers, do not modify them.
+
+        graph = FrameGraph()
+        graph.add_roi("banner", (0.0, 0.0, 1.0, 0.12), source="hsv")
+        graph.add_hsv_mask("banner_lit", HsvFilter(v_min=200), source="banner")
+        graph.add("banner_is_lit", lambda mask: cv2.countNonZero(mask) > 500, ["banner_lit"])
+        graph.update(frame, frame_id)
+        graph.get("banner_is_lit")
+    """
+    def __init__(self, views: Optional[FrameViews] = None):
+        """
+        :param views: FrameViews to take the colour views from, e.g. ScrcpyManager.views. Default a private one.
+        """
+        self.views = views if views is not None else FrameViews()
+        self.nodes: dict[str, Node] = {}
+        self.stats: dict[str, NodeStats] = {}
+        self.frame_id: int = -1
+        self._values: dict[str, Any] = {}
+        self._node_metrics: dict[str, Any] = {}
+        self._has_frame = False
+        self._lock = threading.RLock()
+        for view in VIEW_CONVERSIONS:
+            self.add(view, lambda view=view: self.views.get(view), [])
+
+    def add(self, name: str, function: Callable[..., Any], inputs: Sequence[str] = ("bgr",)) -> str:
+        """
+        Add a node. Inputs must exist already, and a replaced node must not depend on itself through them.
+
+        :param name: Node name, replacing a node of the same name.
+        :param function: Called with the values of the inputs, in order.
+        :param inputs: Names of the input nodes.
+        :return: name.
+        """
+        missing = [node for node in inputs if node not in self.nodes]
+        if missing:
+            raise ValueError(f"Node {name} depends on unknown nodes {missing}")
+        if name in self.nodes and name in self.dependencies(inputs):
+            raise ValueError(f"Node {name} would depend on itself through {list(inputs)}")
+        with self._lock:
+            self.nodes[name] = Node(name, function, tuple(inputs))
+            self.stats.setdefault(name, NodeStats())
+            self._node_metrics[name] = _NODE_SECONDS.labels(node=name)
+            # Nodes depending on a replaced node are recomputed on their next get().
+            for dependent in self.dependents(name):
+                self._values.pop(dependent, None)
+        return name
+
+    def node(self, name: str, inputs: Sequence[str] = ("bgr",)) -> Callable:
+        """
+        Decorator form of add().
+        """
+        def decorator(function: Callable) -> Callable:
+            self.add(name, function, inputs)
+            return function
+        return decorator
+
+    def add_roi(self, name: str, region: tuple[float, float, float, float], source: str = "bgr") -> str:
+        """
+        Crop of a source node, a view without copy.
+
+        :param region: Normalized (x, y, width, height).
+        """
+        def crop(image: numpy.ndarray) -> numpy.ndarray:
+            height, width = image.shape[:2]
+            x, y = min(width - 1, round(region[0] * width)), min(height - 1, round(region[1] * height))
+            return image[y:y + max(1, round(region[3] * height)), x:x + max(1, round(region[2] * width))]
+        return self.add(name, crop, [source])
+
+    def add_hsv_mask(self, name: str, hsv_filter, source: str = "hsv") -> str:
+        """
+        HsvFilter mask of an HSV node, e.g. the hsv view or an ROI of it.
+        """
+        return self.add(name, hsv_filter.mask, [source])
+
+    def add_hash(self, name: str, source: str = "gray", hash_size: int = 8) -> str:
+        """
+        Difference hash of a node, see screen_classifier.dhash.
+        """
+        from E7A.graphics.screen_classifier import dhash
+        return self.add(name, lambda image: dhash(image, hash_size), [source])
+
+    def add_match(self, name: str, matcher, template: numpy.ndarray, source: str = "gray", **kwargs) -> str:
+        """
+        Best match of a template, TemplateMatcher.match on a gray or BGR node.
+        """
+        return self.add(name, lambda image: matcher.match(image, template, **kwargs), [source])
+
+    def add_probe(self, name: str, probe, source: str = "bgr") -> str:
+        """
+        Result of a PixelProbe on a node.
+        """
+        return self.add(name, probe.test, [source])
+
+    def update(self, frame: numpy.ndarray, frame_id: Optional[int] = None) -> "FrameGraph":
+        """
+        Set the current BGR frame, memoized results are dropped. The same frame_id again does nothing.
+
+        :param frame: BGR frame.
+        :param frame_id: Id of the frame, e.g. ScrcpyManager.frame_count. None always updates.
+        :return: self.
+        """
+        with self._lock:
+            if frame_id is not None and frame_id == self.frame_id and self._has_frame:
+                return self
+            self.views.update(frame, frame_id)
+            self.frame_id = self.views.frame_id
+            self._values.clear()
+            self._has_frame = True
+        return self
+
+    def get(self, name: str) -> Any:
+        """
+        :param name: Node name.
+        :return: Value of the node for the current frame.
+        """
+        with self._lock:
+            if not self._has_frame:
+                raise RuntimeError("FrameGraph has no frame yet")
+            return self._evaluate(name)
+
+    def evaluate(self, names: Iterable[str]) -> dict[str, Any]:
+        """
+        :return: Node name to value for the current frame.
+        """
+        with self._lock:
+            return {name: self.get(name) for name in names}
+
+    def dependencies(self, names: Iterable[str]) -> set[str]:
+        """
+        :return: The nodes and every node they depend on, directly or not.
+        """
+        seen = set()
+        stack = list(names)
+        while stack:
+            name = stack.pop()
+            if name not in seen:
+                seen.add(name)
+                stack.extend(self.nodes[name].inputs)
+        return seen
+
+    def dependents(self, name: str) -> set[str]:
+        """
+        :return: The node and every node depending on it.
+        """
+        result = {name}
+        changed = True
+        while changed:
+            changed = False
+            for node in self.nodes.values():
+                if node.name not in result and result.intersection(node.inputs):
+                    result.add(node.name)
+                    changed = True
+        return result
+
+    def cost(self, names: Iterable[str]) -> float:
+        """
+        Expected seconds per frame to evaluate the nodes together, from the measured mean cost
+        of the union of their dependencies.
+        """
+        return sum(self.stats[name].mean_seconds for name in self.dependencies(names))
+
+    def reset_profile(self) -> None:
+        with self._lock:
+            for name in self.stats:
+                self.stats[name] = NodeStats()
+
+    def report(self) -> str:
+        """
+        Per-node profile, most expensive first.
+        """
+        lines = [f"{'node':<24} {'computed':>9} {'hits':>7} {'mean ms':>9} {'total ms':>10}"]
+        for name, stats in sorted(self.stats.items(), key=lambda item: item[1].seconds, reverse=True):
+            if stats.computations or stats.hits:
+                lines.append(
+                    f"{name:<24} {stats.computations:>9} {stats.hits:>7} "
+                    f"{stats.mean_seconds * 1000:>9.3f} {stats.seconds * 1000:>10.1f}"
+                )
+        return "\n".join(lines)
+
+    def _evaluate(self, name: str) -> Any:
+        stats = self.stats[name]
+        if name in self._values:
+            stats.hits += 1
+            return self._values[name]
+        node = self.nodes[name]
+        arguments = [self._evaluate(input_name) for input_name in node.inputs]
+        start = time.perf_counter()
+        value = node.function(*arguments)
+        seconds = time.perf_counter() - start
+        stats.seconds += seconds
+        self._node_metrics[name].observe(seconds)
+        stats.computations += 1
+        self._values[name] = value
+        return value
@@ -0,0 +1,117 @@
+import threading
+from typing import Iterable, Optional
+
+import cv2
+import numpy
+
+from E7A.common.frame_pool import memory_accounting
+
+# View name -> cv2 conversion from BGR, None for the frame itself.
+VIEW_CONVERSIONS = {
+    "bgr": None,
+    "gray": cv2.COLOR_BGR2GRAY,
+    "hsv": cv2.COLOR_BGR2HSV,
+}
+
+
+class FrameViews:
+    """
+    Colour representations of the current frame, each converted at most once per frame
+    into buffers that are reused as long as the frame size does not change.
+
+    Consumers declare what they need with require(), update() then converts the union of the
+    declared views eagerly. Views nobody declared are still available, they are converted lazily
+    on first access and cached until the next frame.
+
+    The returned arrays are overwritten by the next update(), copy them to keep them.
+    """
+    def __init__(self):
+        self._requirements: dict[str, frozenset[str]] = {}
+        self._needed: frozenset[str] = frozenset()
+        self._buffers: dict[str, numpy.ndarray] = {}
+        self._fresh: set[str] = set()
+        self._frame: Optional[numpy.ndarray] = None
+        self._lock = threading.Lock()
+        self.frame_id: int = -1
+        self.conversions: int = 0
+
+    @property
+    def needed(self) -> frozenset[str]:
+        return self._needed
+
+    def require(self, consumer: str, views: Iterable[str]) -> None:
+        """
+        Declare the views a consumer reads every frame.
+
+        :param consumer: Consumer name, e.g. "DigitReader".
+        :param views: View names, keys of VIEW_CONVERSIONS.
+        """
+        views = frozenset(views)
+        unknown = views - VIEW_CONVERSIONS.keys()
+        if unknown:
+            raise ValueError(f"Unknown frame views: {sorted(unknown)}. Valid views: {list(VIEW_CONVERSIONS)}")
+        with self._lock:
+            self._requirements[consumer] = views
+            self._needed = frozenset().union(*self._requirements.values())
+
+    def release(self, consumer: str) -> None:
+        with self._lock:
+            self._requirements.pop(consumer, None)
+            self._needed = frozenset().union(*self._requirements.values())
+
+    def update(self, frame: numpy.ndarray, frame_id: Optional[int] = None) -> "FrameViews":
+        """
+        Set the current BGR frame and convert the declared views.
+        Calling it again with the same frame_id does nothing.
+
+        :param frame: BGR frame, e.g. ScrcpyManager.frame.
+        :param frame_id: Id of the frame, e.g. ScrcpyManager.frame_count. None always updates.
+        :return: self.
+        """
+        with self._lock:
+            if frame_id is not None and frame_id == self.frame_id and self._frame is not None:
+                return self
+            self._frame = frame
+            self.frame_id = frame_id if frame_id is not None else self.frame_id + 1
+            self._fresh = {"bgr"}
+            for view in self._needed:
+                self._convert(view)
+        return self
+
+    def get(self, view: str) -> numpy.ndarray:
+        """
+        :param view: View name.
+        :return: The view of the current frame.
+        """
+        with self._lock:
+            if self._frame is None:
+                raise RuntimeError("FrameViews has no frame yet")
+            if view not in self._fresh:
+                self._convert(view)
+            return self._frame if view == "bgr" else self._buffers[view]
+
+    @property
+    def bgr(self) -> numpy.ndarray:
+        return self.get("bgr")
+
+    @property
+    def gray(self) -> numpy.ndarray:
+        return self.get("gray")
+
+    @property
+    def hsv(self) -> numpy.ndarray:
+        return self.get("hsv")
+
+    def _convert(self, view: str) -> None:
+        code = VIEW_CONVERSIONS[view]
+        if code is not None:
+            height, width = self._frame.shape[:2]
+            shape = (height, width) if view == "gray" else (height, width, 3)
+            buffer = self._buffers.get(view)
+            if buffer is None or buffer.shape != shape:
+                buffer = numpy.empty(shape, dtype=numpy.uint8)
+                self._buffers[view] = buffer
+                memory_accounting.set("recognizers", self, sum(b.nbytes for b in self._buffers.values()))
+            cv2.cvtColor(self._frame, code, dst=buffer)
+            self.conversions += 1
+        self._fresh.add(view)
@@ -1,3 +1,7 @@
+import cv2
+import numpy
+
+
 class HsvFilter:
     def __init__(self, h_min=None, h_max=None, s_min=None, s_max=None, v_min=None, v_max=None,
                  s_sub=None, v_sub=None, s_add=None, v_add=None):
@@ -11,3 +15,27 @@ class HsvFilter:
         self.v_sub = v_sub
         self.s_add = s_add
         self.v_add = v_add
+
+    @property
+    def lower(self) -> numpy.ndarray:
+        return numpy.array([self.h_min or 0, self.s_min or 0, self.v_min or 0], dtype=numpy.uint8)
+
+    @property
+    def upper(self) -> numpy.ndarray:
+        return numpy.array(
+            [
+                179 if self.h_max is None else self.h_max,
+                255 if self.s_max is None else self.s_max,
+                255 if self.v_max is None else self.v_max
+            ],
+            dtype=numpy.uint8
+        )
+
+    def mask(self, hsv_image: numpy.ndarray) -> numpy.ndarray:
+        """
+        Binary mask of the pixels inside the h/s/v ranges, unset bounds are open.
+
+        :param hsv_image: Image in cv2 HSV format (H in 0-179).
+        :return: uint8 mask, 255 inside the ranges.
+        """
+        return cv2.inRange(hsv_image, self.lower, self.upper)
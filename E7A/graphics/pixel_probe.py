@@ -0,0 +1,162 @@
+from typing import Callable, Optional, Sequence, TypeVar
+
+import cv2
+import numpy
+
+from E7A.graphics.hsv_filter import HsvFilter
+
+T = TypeVar("T")
+
+
+class PixelProbe:
+    """
+    Cheap check of a screen state by sampling a handful of pixels, e.g. "is the start button lit".
+
+    Each point either expects a BGR colour within a tolerance, or a colour inside the ranges of an HsvFilter.
+    All points are sampled at once with fancy indexing, so a probe costs microseconds where matchTemplate
+    costs milliseconds. Use it as a pre-filter: TemplateMatcher.match(..., probe=probe) skips matching
+    when the probe fails, and gate() wraps any other recognizer the same way.
+
+    Coordinates are pixels of the image the probe is tested on.
+    """
+    def __init__(
+            self,
+            points: Sequence[tuple[int, int]],
+            colors: Optional[Sequence[tuple[int, int, int]]] = None,
+            tolerance: int | Sequence[int] = 20,
+            hsv_filter: Optional[HsvFilter] = None,
+            min_hits: Optional[int] = None,
+            name: str = ""
+    ):
+        """
+        :param points: (x, y) of every sampled pixel.
+        :param colors: Expected BGR colour of every point, None to check the points with hsv_filter only.
+        :param tolerance: Maximum difference per channel, one for all points or one per point.
+        :param hsv_filter: Ranges every point must lie in, checked in addition to colors.
+        :param min_hits: Points that must pass for the probe to pass, default all of them.
+        :param name: Name used in logs and repr.
+        """
+        if colors is None and hsv_filter is None:
+            raise ValueError("PixelProbe needs colors, an hsv_filter or both")
+        points = numpy.asarray(points, dtype=numpy.intp).reshape(-1, 2)
+        if len(points) == 0:
+            raise ValueError("PixelProbe needs at least one point")
+        if (points < 0).any():
+            # Negative indices would silently sample from the opposite edge of the image.
+            raise ValueError(f"PixelProbe {name} has negative points: {points[(points < 0).any(axis=1)].tolist()}")
+        self.xs = points[:, 0].copy()
+        self.ys = points[:, 1].copy()
+        self._max_x = int(self.xs.max())
+        self._max_y = int(self.ys.max())
+        self.name = name
+        self.min_hits = len(points) if min_hits is None else min_hits
+        self.hsv_filter = hsv_filter
+
+        self.colors: Optional[numpy.ndarray] = None
+        self.gray_colors: Optional[numpy.ndarray] = None
+        if colors is not None:
+            colors = numpy.asarray(colors, dtype=numpy.uint8).reshape(-1, 3)
+            if len(colors) != len(points):
+                raise ValueError(f"PixelProbe got {len(points)} points but {len(colors)} colors")
+            self.colors = colors.astype(numpy.int16)
+            self.gray_colors = cv2.cvtColor(colors[numpy.newaxis], cv2.COLOR_BGR2GRAY)[0].astype(numpy.int16)
+        self.tolerance = numpy.broadcast_to(numpy.asarray(tolerance, dtype=numpy.int16), (len(points),)).copy()
+
+        self.evaluations = 0
+        self.rejections = 0
+
+    @classmethod
+    def from_config(cls, config: dict, name: str = "") -> "PixelProbe":
+        """
+        Create a probe from a declarative description, e.g. a YAML entry:
+
+            points: [[640, 600, [40, 180, 230]], [700, 600, [40, 180, 230], 30]]
+            tolerance: 20
+            hsv: {h_min: 10, h_max: 30, s_min: 120}
+            min_hits: 2
+
+        Every point is [x, y], [x, y, [b, g, r]] or [x, y, [b, g, r], tolerance].
+        Either every point has a colour or none has.
+
+        :param config: Probe description.
+        :param name: Name of the probe.
+        :return: PixelProbe instance.
+        """
+        default_tolerance = config.get("tolerance", 20)
+        points, colors, tolerances = [], [], []
+        for point in config["points"]:
+            points.append((point[0], point[1]))
+            if len(point) > 2:
+                colors.append(tuple(point[2]))
+            tolerances.append(point[3] if len(point) > 3 else default_tolerance)
+        if colors and len(colors) != len(points):
+            raise ValueError(f"Probe {name}: either every point has a colour or none has")
+        hsv = config.get("hsv")
+        return cls(
+            points,
+            colors or None,
+            tolerances,
+            HsvFilter(**hsv) if hsv else None,
+            config.get("min_hits"),
+            name
+        )
+
+    def scaled(self, scale_x: float, scale_y: float) -> "PixelProbe":
+        """
+        The same probe at another resolution, e.g. with DeviceTransform.scale_x/scale_y.
+        """
+        points = numpy.stack([numpy.rint(self.xs * scale_x), numpy.rint(self.ys * scale_y)], axis=1)
+        colors = None if self.colors is None else self.colors.astype(numpy.uint8)
+        return PixelProbe(points, colors, self.tolerance, self.hsv_filter, self.min_hits, self.name)
+
+    def hits(self, image: numpy.ndarray) -> numpy.ndarray:
+        """
+        :param image: BGR or gray image. HSV checks need a BGR image.
+        :return: Boolean array, whether each point passed.
+        """
+        if self._max_x >= image.shape[1] or self._max_y >= image.shape[0]:
+            raise ValueError(
+                f"Probe {self.name} samples up to ({self._max_x}, {self._max_y}), "
+                f"outside of the {image.shape[1]}x{image.shape[0]} image"
+            )
+        samples = image[self.ys, self.xs]
+        passed = numpy.ones(len(self.xs), dtype=bool)
+        if self.colors is not None:
+            if image.ndim == 2:
+                passed &= numpy.abs(samples.astype(numpy.int16) - self.gray_colors) <= self.tolerance
+            else:
+                diff = numpy.abs(samples[:, :3].astype(numpy.int16) - self.colors)
+                passed &= (diff <= self.tolerance[:, numpy.newaxis]).all(axis=1)
+        if self.hsv_filter is not None:
+            if image.ndim == 2:
+                raise ValueError(f"Probe {self.name} checks HSV ranges and needs a BGR image")
+            # Only the sampled pixels are converted, not the whole image.
+            hsv = cv2.cvtColor(numpy.ascontiguousarray(samples[numpy.newaxis, :, :3]), cv2.COLOR_BGR2HSV)[0]
+            passed &= ((hsv >= self.hsv_filter.lower) & (hsv <= self.hsv_filter.upper)).all(axis=1)
+        return passed
+
+    def test(self, image: numpy.ndarray) -> bool:
+        """
+        :param image: BGR or gray image.
+        :return: Whether at least min_hits points passed.
+        """
+        self.evaluations += 1
+        if int(numpy.count_nonzero(self.hits(image))) >= self.min_hits:
+            return True
+        self.rejections += 1
+        return False
+
+    def gate(self, check: Callable[[numpy.ndarray], T], default: T = None) -> Callable[[numpy.ndarray], T]:
+        """
+        Wrap an expensive check so that it only runs on images passing the probe.
+
+        :param check: Function of the image, e.g. a screen recognizer.
+        :param default: Result when the probe fails.
+        :return: The gated function.
+        """
+        def gated(image: numpy.ndarray) -> T:
+            return check(image) if self.test(image) else default
+        return gated
+
+    def __repr__(self):
+        return f"PixelProbe({self.name!r}, {len(self.xs)} points, {self.rejections}/{self.evaluations} rejected)"
@@ -0,0 +1,398 @@
+"""
+Coarse-to-fine template matching for large template libraries.
+
+Benchmark against the naive full-frame search on recorded frames:
+
+    python -m E7A.graphics.pyramid_matcher --frames temp/screenshots --templates assets/templates
+"""
+import os
+import sys
+import time
+import argparse
+from dataclasses import dataclass
+from typing import Iterable, Optional, Sequence
+
+import cv2
+import numpy
+
+from E7A.graphics.template_matcher import Match, TemplateMatcher, to_gray
+
+
+@dataclass
+class _Variant:
+    """
+    One scale of a template, with its gray pyramid. levels[i] is downscaled by 2 ** i.
+    """
+    scale: float
+    levels: list[numpy.ndarray]
+
+    @property
+    def shape(self) -> tuple:
+        return self.levels[0].shape
+
+
+class PyramidMatcher:
+    """
+    Search a template on a downscaled level of the frame first and refine only around the best
+    coarse peaks at full resolution.
+
+    Matching at pyramid level L costs about 1 / 16 ** L of the full-resolution search, refinement adds
+    a few small windows per candidate. The frame pyramid is built once per call and shared by every
+    template of match_many() and first(). Templates can be registered at several scales, scales closest
+    to 1 are searched first and the search stops as soon as a score reaches early_exit.
+
+    Scores are those of the full-resolution refinement, so thresholds mean the same as for TemplateMatcher.
+    """
+    def __init__(
+            self,
+            matcher: Optional[TemplateMatcher] = None,
+            levels: int = 2,
+            min_template_size: int = 12,
+            candidates: int = 3,
+            coarse_margin: float = 0.2,
+            refine_radius: int = 2,
+            early_exit: float = 0.98
+    ):
+        """
+        :param matcher: Method and default threshold, default TemplateMatcher().
+        :param levels: Deepest pyramid level searched, 0 disables the pyramid.
+        :param min_template_size: Smallest template side allowed at the coarse level, smaller templates
+            are searched on a shallower level.
+        :param candidates: Coarse peaks refined per template and scale.
+        :param coarse_margin: Coarse peaks may score this much below the threshold, downscaling blurs them.
+        :param refine_radius: Pixels of the coarse level searched around each peak at full resolution.
+        :param early_exit: Score at which a match is accepted without trying further scales or candidates.
+        """
+        self.matcher = matcher or TemplateMatcher()
+        self.levels = levels
+        self.min_template_size = min_template_size
+        self.candidates = candidates
+        self.coarse_margin = coarse_margin
+        self.refine_radius = refine_radius
+        self.early_exit = early_exit
+        self.templates: dict[str, list[_Variant]] = {}
+        self.coarse_searches = 0
+        self.refinements = 0
+
+    def add(self, name: str, template: numpy.ndarray, scales: Sequence[float] = (1.0,)) -> None:
+        """
+        Register a template.
+
+        :param name: Template name.
+        :param template: Template image, gray or BGR(A).
+        :param scales: Scales the template may appear at on screen, e.g. (0.9, 1.0, 1.1).
+        """
+        gray = to_gray(template)
+        variants = []
+        for scale in sorted(scales, key=lambda s: abs(s - 1.0)):
+            scaled = gray if scale == 1.0 else cv2.resize(
+                gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+            )
+            variants.append(_Variant(scale, self._template_pyramid(scaled)))
+        self.templates[name] = variants
+
+    def add_asset(self, asset, scales: Sequence[float] = (1.0,)) -> None:
+        """
+        Register an Asset of an AssetStore, its stored pyramid is used for scale 1.
+        """
+        if tuple(scales) == (1.0,) and len(asset.pyramid) > self.levels:
+            self.templates[asset.name] = [_Variant(1.0, list(asset.pyramid[:self.levels + 1]))]
+        else:
+            self.add(asset.name, asset.gray, scales)
+
+    def pyramid(self, image: numpy.ndarray) -> list[numpy.ndarray]:
+        """
+        :param image: Frame, gray or BGR(A).
+        :return: Gray pyramid of the frame, level 0 is full resolution.
+        """
+        levels = [to_gray(image)]
+        for _ in range(self.levels):
+            if min(levels[-1].shape[:2]) < 2 * self.min_template_size:
+                break
+            levels.append(cv2.pyrDown(levels[-1]))
+        return levels
+
+    def match(
+            self,
+            image: numpy.ndarray | list[numpy.ndarray],
+            name: str,
+            threshold: Optional[float] = None
+    ) -> Optional[Match]:
+        """
+        Find the best match of a registered template.
+
+        :param image: Frame, or its pyramid() to share it between calls.
+        :param name: Template name.
+        :param threshold: Override of the matcher threshold.
+        :return: Best match in full-resolution coordinates, None if below the threshold.
+        """
+        frame_levels = image if isinstance(image, list) else self.pyramid(image)
+        threshold = self.matcher.threshold if threshold is None else threshold
+        best = None
+        for variant in self.templates[name]:
+            match = self._match_variant(frame_levels, variant, threshold)
+            if match is not None and (best is None or match.score > best.score):
+                best = match
+                if best.score >= self.early_exit:
+                    break
+        return best
+
+    def match_many(
+            self,
+            image: numpy.ndarray,
+            names: Optional[Iterable[str]] = None,
+            threshold: Optional[float] = None
+    ) -> dict[str, Match]:
+        """
+        Match several templates against one frame, building its pyramid once.
+
+        :param image: Frame.
+        :param names: Template names, default every registered template.
+        :param threshold: Override of the matcher threshold.
+        :return: Template name to match, templates without a match are left out.
+        """
+        frame_levels = self.pyramid(image)
+        results = {}
+        for name in self.templates if names is None else names:
+            match = self.match(frame_levels, name, threshold)
+            if match is not None:
+                results[name] = match
+        return results
+
+    def first(
+            self,
+            image: numpy.ndarray,
+            names: Optional[Iterable[str]] = None,
+            threshold: Optional[float] = None
+    ) -> Optional[tuple[str, Match]]:
+        """
+        Stop at the first template found with a score of at least early_exit, e.g. to tell which
+        of several mutually exclusive buttons is on screen.
+
+        :return: (name, match) of the confident match, otherwise of the best match, None if nothing matched.
+        """
+        frame_levels = self.pyramid(image)
+        best = None
+        for name in self.templates if names is None else names:
+            match = self.match(frame_levels, name, threshold)
+            if match is None:
+                continue
+            if match.score >= self.early_exit:
+                return name, match
+            if best is None or match.score > best[1].score:
+                best = name, match
+        return best
+
+    def _template_pyramid(self, gray: numpy.ndarray) -> list[numpy.ndarray]:
+        levels = [numpy.ascontiguousarray(gray)]
+        for _ in range(self.levels):
+            if min(levels[-1].shape[:2]) // 2 < self.min_template_size:
+                break
+            levels.append(cv2.pyrDown(levels[-1]))
+        return levels
+
+    def _match_variant(
+            self,
+            frame_levels: list[numpy.ndarray],
+            variant: _Variant,
+            threshold: float
+    ) -> Optional[Match]:
+        frame = frame_levels[0]
+        height, width = variant.shape[:2]
+        if height > frame.shape[0] or width > frame.shape[1]:
+            return None
+        level = min(len(variant.levels), len(frame_levels)) - 1
+        if level == 0:
+            # Too small for a coarse level, plain full-frame search.
+            return self.matcher.match(frame, variant.levels[0], threshold)
+
+        self.coarse_searches += 1
+        coarse = frame_levels[level]
+        coarse_template = variant.levels[level]
+        scores = self.matcher.score_map(coarse, coarse_template)
+        if scores is None:
+            return self.matcher.match(frame, variant.levels[0], threshold)
+
+        factor = 2 ** level
+        radius = self.refine_radius * factor
+        coarse_threshold = threshold - self.coarse_margin
+        suppress_h, suppress_w = max(1, coarse_template.shape[0] // 2), max(1, coarse_template.shape[1] // 2)
+        best = None
+        for _ in range(self.candidates):
+            _, coarse_score, _, (x, y) = cv2.minMaxLoc(scores)
+            if coarse_score < coarse_threshold:
+                break
+            # Suppress the neighbourhood of this peak so the next candidate is another location.
+            scores[max(0, y - suppress_h):y + suppress_h + 1, max(0, x - suppress_w):x + suppress_w + 1] = -1.0
+
+            self.refinements += 1
+            left, top = max(0, x * factor - radius), max(0, y * factor - radius)
+            right = min(frame.shape[1], x * factor + radius + width)
+            bottom = min(frame.shape[0], y * factor + radius + height)
+            window_scores = self.matcher.score_map(frame[top:bottom, left:right], variant.levels[0])
+            if window_scores is None:
+                continue
+            _, score, _, (dx, dy) = cv2.minMaxLoc(window_scores)
+            if best is None or score > best.score:
+                best = Match(left + dx, top + dy, width, height, float(score))
+                if score >= self.early_exit:
+                    break
+        if best is None or best.score < threshold:
+            return None
+        return best
+
+
+def load_images(path: str, flags: int = cv2.IMREAD_COLOR) -> dict[str, numpy.ndarray]:
+    """
+    :param path: An image file or a directory searched recursively for PNG and JPG files.
+    :return: Name relative to path to image.
+    """
+    if os.path.isfile(path):
+        return {os.path.basename(path): cv2.imread(path, flags)}
+    images = {}
+    for root, _, files in os.walk(path):
+        for file_name in sorted(files):
+            if file_name.lower().endswith((".png", ".jpg", ".jpeg")):
+                image = cv2.imread(os.path.join(root, file_name), flags)
+                if image is not None:
+                    images[os.path.relpath(os.path.join(root, file_name), path).replace(os.sep, "/")] = image
+    return images
+
+
+def crop_templates(
+        frames: list[numpy.ndarray],
+        count: int,
+        size_range: tuple[int, int] = (32, 128),
+        min_std: float = 30.0,
+        seed: int = 0
+) -> dict[str, numpy.ndarray]:
+    """
+    Cut templates out of the frames when no template library is given, so that every template
+    has a known true location on at least one frame. Flat crops are skipped, normalized
+    correlation is undefined on them.
+    """
+    rng = numpy.random.default_rng(seed)
+    templates = {}
+    attempts = 0
+    while len(templates) < count and attempts < count * 50:
+        attempts += 1
+        frame = frames[len(templates) % len(frames)]
+        height, width = frame.shape[:2]
+        w, h = (int(v) for v in rng.integers(size_range[0], size_range[1] + 1, 2))
+        x, y = int(rng.integers(0, width - w)), int(rng.integers(0, height - h))
+        crop = frame[y:y + h, x:x + w]
+        if to_gray(crop).std() < min_std:
+            continue
+        templates[f"crop_{len(templates)}_{x}_{y}"] = crop.copy()
+    return templates
+
+
+def benchmark(
+        frames: dict[str, numpy.ndarray],
+        templates: dict[str, numpy.ndarray],
+        matcher: PyramidMatcher,
+        tolerance: int = 2,
+        score_tolerance: float = 0.01
+) -> dict:
+    """
+    Match every template on every frame with the naive full-frame search and with the pyramid.
+    Both agree if they find the same location, or locations whose scores tie.
+
+    :return: Timings, speedup and agreement of the two searches.
+    """
+    naive = matcher.matcher
+    for name, template in templates.items():
+        matcher.add(name, template)
+    naive_templates = {name: to_gray(template) for name, template in templates.items()}
+
+    naive_seconds = pyramid_seconds = 0.0
+    agree = found_naive = found_pyramid = missed = false_positives = 0
+    for frame in frames.values():
+        gray = to_gray(frame)
+        start = time.perf_counter()
+        expected = {name: naive.match(gray, template) for name, template in naive_templates.items()}
+        naive_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        frame_levels = matcher.pyramid(gray)
+        actual = {name: matcher.match(frame_levels, name) for name in naive_templates}
+        pyramid_seconds += time.perf_counter() - start
+
+        for name, want in expected.items():
+            got = actual[name]
+            found_naive += want is not None
+            found_pyramid += got is not None
+            if want is None and got is None:
+                agree += 1
+            elif want is None:
+                false_positives += 1
+            elif got is None:
+                missed += 1
+            elif abs(want.x - got.x) <= tolerance and abs(want.y - got.y) <= tolerance:
+                agree += 1
+            elif got.score >= want.score - score_tolerance:
+                agree += 1
+    searches = len(frames) * len(templates)
+    return {
+        "frames": len(frames),
+        "templates": len(templates),
+        "naive_ms": naive_seconds / max(1, len(frames)) * 1000,
+        "pyramid_ms": pyramid_seconds / max(1, len(frames)) * 1000,
+        "speedup": naive_seconds / max(pyramid_seconds, 1e-9),
+        "agreement": agree / max(1, searches),
+        "found_naive": found_naive,
+        "found_pyramid": found_pyramid,
+        "missed": missed,
+        "false_positives": false_positives,
+        "refinements_per_search": matcher.refinements / max(1, searches),
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Pyramid against full-frame template matching.")
+    parser.add_argument("--frames", default=None,
+                        help="Recorded frame or directory of frames, default synthetic screens.")
+    parser.add_argument("--templates", default=None,
+                        help="Template file or directory, default crops of the frames.")
+    parser.add_argument("--crops", type=int, default=50, help="Number of templates cut from the frames.")
+    parser.add_argument("--levels", type=int, default=2, help="Deepest pyramid level.")
+    parser.add_argument("--candidates", type=int, default=3, help="Coarse peaks refined per template.")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Match threshold.")
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.frames:
+        frames = load_images(args.frames)
+    else:
+        from E7A.simulator.screens import synthetic_screens
+        # Sensor and encoder noise of recorded frames, flat synthetic screens match everywhere equally.
+        rng = numpy.random.default_rng(0)
+        frames = {
+            f"synthetic_{i}": cv2.add(screen, rng.integers(0, 12, screen.shape, dtype=numpy.uint8))
+            for i, screen in enumerate(synthetic_screens())
+        }
+    if not frames:
+        sys.stderr.write(f"No frames found in {args.frames}\n")
+        return 2
+    if args.templates:
+        templates = load_images(args.templates, cv2.IMREAD_UNCHANGED)
+    else:
+        templates = crop_templates(list(frames.values()), args.crops)
+
+    matcher = PyramidMatcher(TemplateMatcher(threshold=args.threshold), args.levels, candidates=args.candidates)
+    report = benchmark(frames, templates, matcher)
+    print(f"{report['frames']} frames x {report['templates']} templates")
+    print(f"full frame: {report['naive_ms']:9.1f} ms per frame")
+    print(f"pyramid:    {report['pyramid_ms']:9.1f} ms per frame  ({report['speedup']:.1f}x)")
+    print(
+        f"agreement {report['agreement'] * 100:.1f}%: found {report['found_pyramid']}/{report['found_naive']}, "
+        f"{report['missed']} missed, {report['false_positives']} false positives, "
+        f"{report['refinements_per_search']:.2f} refinements per search"
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
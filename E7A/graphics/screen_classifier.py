@@ -0,0 +1,220 @@
+import os
+import json
+from typing import Callable, Optional
+
+import cv2
+import numpy
+
+from E7A.common.logger import Logger
+
+
+def dhash(frame: numpy.ndarray, hash_size: int = 8) -> int:
+    """
+    Compute the difference hash of a frame.
+    The frame is first sub-sampled by striding so the resize only touches a few thousand pixels.
+
+    :param frame: BGR or gray frame.
+    :param hash_size: The hash has hash_size * hash_size bits.
+    :return: The hash as an integer.
+    """
+    height, width = frame.shape[:2]
+    step = max(1, min(height // (hash_size * 4), width // ((hash_size + 1) * 4)))
+    small = cv2.resize(frame[::step, ::step], (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(numpy.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over integer hashes for Hamming-radius queries.
+    Each node is [hash, labels, children] where children maps distance to child node.
+    """
+    def __init__(self):
+        self._root: Optional[list] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, value: int, label: str) -> None:
+        if self._root is None:
+            self._root = [value, {label}, {}]
+            self._size += 1
+            return
+        node = self._root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].add(label)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, {label}, {}]
+                self._size += 1
+                return
+            node = child
+
+    def query(self, value: int, radius: int) -> list[tuple[int, int, set[str]]]:
+        """
+        Find every stored hash within radius of value.
+
+        :param value: Queried hash.
+        :param radius: Maximum Hamming distance.
+        :return: (distance, hash, labels) tuples sorted by distance.
+        """
+        if self._root is None:
+            return []
+        results = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= radius:
+                results.append((distance, node[0], node[1]))
+            for child_distance, child in node[2].items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        results.sort(key=lambda result: result[0])
+        return results
+
+    def items(self):
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            for label in node[1]:
+                yield node[0], label
+            stack.extend(node[2].values())
+
+
+class ScreenClassifier:
+    """
+    Tell which game screen a frame shows by looking up its perceptual hash in an index of known screens.
+    Exact hashes are answered from a dict, near hashes from a BK-tree, and only misses
+    fall back to full (template) matching.
+    """
+    def __init__(
+            self,
+            logger: Logger = None,
+            hash_size: int = 8,
+            radius: int = 6
+    ):
+        """
+        :param logger: Parent logger.
+        :param hash_size: dHash size, the hash has hash_size ** 2 bits.
+        :param radius: Maximum Hamming distance for a frame to count as a known screen.
+        """
+        if logger is None:
+            self.logger = Logger(self.__class__.__name__)
+        else:
+            self.logger = logger.get_child_logger(self.__class__.__name__)
+        self.hash_size = hash_size
+        self.radius = radius
+        self._exact: dict[int, str] = {}
+        self._tree = BKTree()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._tree)
+
+    def add(self, label: str, frame: numpy.ndarray) -> int:
+        """
+        Register a frame of a known screen.
+
+        :param label: Screen name.
+        :param frame: Recorded frame of the screen.
+        :return: The hash of the frame.
+        """
+        value = dhash(frame, self.hash_size)
+        self.add_hash(label, value)
+        return value
+
+    def add_hash(self, label: str, value: int) -> None:
+        # A hash shared by several screens resolves to the smallest label, as in the BK-tree lookup.
+        known = self._exact.get(value)
+        self._exact[value] = label if known is None else min(known, label)
+        self._tree.add(value, label)
+
+    def classify(
+            self,
+            frame: numpy.ndarray,
+            fallback: Optional[Callable[[numpy.ndarray], Optional[str]]] = None,
+            learn: bool = True
+    ) -> Optional[str]:
+        """
+        Classify a frame.
+
+        :param frame: Current frame, e.g. ScrcpyManager.frame.
+        :param fallback: Full matcher called on a miss, returns the screen name or None.
+        :param learn: Add the frame hash to the index when the fallback recognizes it.
+        :return: Screen name, or None if unknown.
+        """
+        value = dhash(frame, self.hash_size)
+        label = self._exact.get(value)
+        if label is None:
+            neighbours = self._tree.query(value, self.radius)
+            if neighbours:
+                label = min(neighbours[0][2])
+        if label is not None:
+            self.hits += 1
+            return label
+
+        self.misses += 1
+        if fallback is None:
+            return None
+        label = fallback(frame)
+        if label is not None and learn:
+            self.add_hash(label, value)
+            self.logger.debug(f"Learned hash {value:x} for screen '{label}'")
+        return label
+
+    def build_from_directory(self, frames_dir: str) -> int:
+        """
+        Index recorded frames stored as frames_dir/<screen name>/<any>.png.
+
+        :param frames_dir: Directory of recorded frames.
+        :return: Number of indexed frames.
+        """
+        count = 0
+        for label in sorted(os.listdir(frames_dir)):
+            label_dir = os.path.join(frames_dir, label)
+            if not os.path.isdir(label_dir):
+                continue
+            for file_name in sorted(os.listdir(label_dir)):
+                frame = cv2.imread(os.path.join(label_dir, file_name), cv2.IMREAD_COLOR)
+                if frame is None:
+                    continue
+                self.add(label, frame)
+                count += 1
+        self.logger.info(f"Indexed {count} frames from {frames_dir}, {len(self)} distinct hashes")
+        return count
+
+    def save(self, index_path: str) -> None:
+        data = {
+            "hash_size": self.hash_size,
+            "hashes": [[f"{value:x}", label] for value, label in self._tree.items()]
+        }
+        with open(index_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, index_path: str, **kwargs) -> "ScreenClassifier":
+        """
+        :param index_path: Index written by save().
+        :param kwargs: ScreenClassifier arguments, hash_size comes from the index.
+        """
+        with open(index_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        hash_size = kwargs.pop("hash_size", data["hash_size"])
+        if hash_size != data["hash_size"]:
+            raise ValueError(f"{index_path} was built with hash_size {data['hash_size']}, not {hash_size}")
+        classifier = cls(hash_size=hash_size, **kwargs)
+        for value, label in data["hashes"]:
+            classifier.add_hash(label, int(value, 16))
+        return classifier
@@ -0,0 +1,120 @@
+import time
+import threading
+from typing import Optional
+
+import cv2
+import numpy
+
+
+class SettleDetector:
+    """
+    Detect when the screen stops moving, e.g. at the end of a transition animation.
+
+    Every frame is compared with the previous one inside an optional ROI, sub-sampled with a stride.
+    The screen counts as settled once the mean absolute difference stayed below threshold for
+    stable_frames consecutive frames. Memory is constant: two sample buffers reused for the whole stream.
+    """
+    def __init__(
+            self,
+            threshold: float = 2.0,
+            stable_frames: int = 5,
+            region: Optional[tuple[float, float, float, float]] = None,
+            stride: int = 4,
+            smoothing: float = 0.3
+    ):
+        """
+        :param threshold: Mean absolute difference (0-255) below which two frames count as equal.
+        :param stable_frames: Consecutive equal frames needed to count as settled.
+        :param region: Normalized (x, y, width, height) to watch, None for the whole frame.
+        :param stride: Only every stride-th pixel of every stride-th row is compared.
+        :param smoothing: Weight of the newest difference in the rolling average reported by difference.
+        """
+        self.threshold = threshold
+        self.stable_frames = stable_frames
+        self.region = region
+        self.stride = max(1, stride)
+        self.smoothing = smoothing
+
+        self._previous: Optional[numpy.ndarray] = None
+        self._current: Optional[numpy.ndarray] = None
+        self._frame_id: Optional[int] = None
+        self.stable_count: int = 0
+        self.last_difference: float = 0.0
+        self.difference: float = 0.0    # rolling average of the inter-frame difference
+
+    @property
+    def settled(self) -> bool:
+        return self.stable_count >= self.stable_frames
+
+    def reset(self) -> None:
+        """
+        Forget the previous frame, e.g. right after sending an input.
+        """
+        self._previous = None
+        self._frame_id = None
+        self.stable_count = 0
+        self.difference = 0.0
+
+    def feed(self, frame: numpy.ndarray, frame_id: Optional[int] = None) -> bool:
+        """
+        :param frame: BGR or gray frame.
+        :param frame_id: Id of the frame, e.g. ScrcpyManager.frame_count, a repeated id is ignored.
+        :return: Whether the screen is settled.
+        """
+        if frame_id is not None:
+            if frame_id == self._frame_id:
+                return self.settled
+            self._frame_id = frame_id
+        sample = self._sample(frame)
+        if self._current is None or self._current.shape != sample.shape:
+            self._previous = None
+            self._current = numpy.empty_like(sample)
+        numpy.copyto(self._current, sample)
+
+        if self._previous is None:
+            self._previous = numpy.empty_like(self._current)
+            self.stable_count = 0
+        else:
+            channels = self._current.shape[2] if self._current.ndim == 3 else 1
+            self.last_difference = sum(cv2.mean(cv2.absdiff(self._current, self._previous))[:channels]) / channels
+            self.difference += self.smoothing * (self.last_difference - self.difference)
+            self.stable_count = self.stable_count + 1 if self.last_difference < self.threshold else 0
+        self._previous, self._current = self._current, self._previous
+        return self.settled
+
+    def wait(
+            self,
+            scrcpy_manager,
+            timeout: float = 10.0,
+            stop_event: Optional[threading.Event] = None
+    ) -> bool:
+        """
+        Block until the stream of scrcpy_manager settles.
+
+        :param scrcpy_manager: ScrcpyManager of the instance.
+        :param timeout: Maximum seconds to wait.
+        :param stop_event: Set to abort waiting.
+        :return: Whether the screen settled in time.
+        """
+        self.reset()
+        deadline = time.monotonic() + timeout
+        seen = scrcpy_manager.frame_count
+        while (remaining := deadline - time.monotonic()) > 0:
+            if stop_event is not None and stop_event.is_set():
+                return False
+            # Short waits so that stop_event is noticed on a stalled stream.
+            if not scrcpy_manager.wait_for_frame(seen, min(remaining, 0.5)):
+                continue
+            seen = scrcpy_manager.frame_count
+            if self.feed(scrcpy_manager.frame, seen):
+                return True
+        return False
+
+    def _sample(self, frame: numpy.ndarray) -> numpy.ndarray:
+        height, width = frame.shape[:2]
+        if self.region is None:
+            x, y, w, h = 0, 0, width, height
+        else:
+            x, y = round(self.region[0] * width), round(self.region[1] * height)
+            w, h = max(1, round(self.region[2] * width)), max(1, round(self.region[3] * height))
+        return frame[y:y + h:self.stride, x:x + w:self.stride]
@@ -0,0 +1,151 @@
+from dataclasses import dataclass
+from typing import Optional, TYPE_CHECKING
+
+import cv2
+import numpy
+
+if TYPE_CHECKING:
+    from E7A.graphics.pixel_probe import PixelProbe
+
+
+@dataclass(frozen=True)
+class Match:
+    """
+    A single template match inside an image, in pixel coordinates of that image.
+    """
+    x: int
+    y: int
+    width: int
+    height: int
+    score: float
+
+    @property
+    def center(self) -> (int, int):
+        return self.x + self.width // 2, self.y + self.height // 2
+
+
+def to_gray(image: numpy.ndarray) -> numpy.ndarray:
+    """
+    Convert a BGR/BGRA image to grayscale, gray images are returned unchanged.
+
+    :param image: Image in BGR, BGRA or gray format.
+    :return: Grayscale image.
+    """
+    if image.ndim == 2:
+        return image
+    if image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY)
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+class TemplateMatcher:
+    """
+    Thin wrapper around cv2.matchTemplate used by the recognizers in E7A.graphics.
+    Only normalized methods are supported so that a single threshold works for every template.
+    """
+    def __init__(
+            self,
+            method: int = cv2.TM_CCOEFF_NORMED,
+            threshold: float = 0.8
+    ):
+        """
+        :param method: cv2 template matching method, TM_CCOEFF_NORMED or TM_CCORR_NORMED.
+        :param threshold: Minimum score for a location to count as a match.
+        """
+        if method not in (cv2.TM_CCOEFF_NORMED, cv2.TM_CCORR_NORMED):
+            raise ValueError(f"Unsupported match method: {method}")
+        self.method = method
+        self.threshold = threshold
+
+    def score_map(self, image: numpy.ndarray, template: numpy.ndarray) -> Optional[numpy.ndarray]:
+        """
+        Compute the raw score map of template over image.
+
+        :param image: Searched image, gray or BGR.
+        :param template: Template with the same number of channels as image.
+        :return: Score map, or None if the template is larger than the image.
+        """
+        if template.shape[0] > image.shape[0] or template.shape[1] > image.shape[1]:
+            return None
+        return cv2.matchTemplate(image, template, self.method)
+
+    def match(
+            self,
+            image: numpy.ndarray,
+            template: numpy.ndarray,
+            threshold: Optional[float] = None,
+            probe: Optional["PixelProbe"] = None
+    ) -> Optional[Match]:
+        """
+        Find the best match of template in image.
+
+        :param image: Searched image.
+        :param template: Template image.
+        :param threshold: Override of the default threshold.
+        :param probe: PixelProbe tested on image first, matching is skipped if it fails.
+        :return: The best match, or None if its score is below the threshold.
+        """
+        if probe is not None and not probe.test(image):
+            return None
+        threshold = self.threshold if threshold is None else threshold
+        scores = self.score_map(image, template)
+        if scores is None:
+            return None
+        _, max_score, _, (x, y) = cv2.minMaxLoc(scores)
+        if max_score < threshold:
+            return None
+        return Match(x, y, template.shape[1], template.shape[0], float(max_score))
+
+    def match_all(
+            self,
+            image: numpy.ndarray,
+            template: numpy.ndarray,
+            threshold: Optional[float] = None,
+            probe: Optional["PixelProbe"] = None
+    ) -> list[Match]:
+        """
+        Find every non-overlapping match of template in image, best first.
+
+        :param image: Searched image.
+        :param template: Template image.
+        :param threshold: Override of the default threshold.
+        :param probe: PixelProbe tested on image first, matching is skipped if it fails.
+        :return: Matches sorted by descending score.
+        """
+        if probe is not None and not probe.test(image):
+            return []
+        threshold = self.threshold if threshold is None else threshold
+        scores = self.score_map(image, template)
+        if scores is None:
+            return []
+        height, width = template.shape[:2]
+        ys, xs = numpy.nonzero(scores >= threshold)
+        candidates = sorted(
+            (Match(int(x), int(y), width, height, float(scores[y, x])) for x, y in zip(xs, ys)),
+            key=lambda m: m.score,
+            reverse=True
+        )
+        return suppress_overlaps(candidates)
+
+
+def suppress_overlaps(matches: list[Match], max_overlap: float = 0.5) -> list[Match]:
+    """
+    Greedy non-maximum suppression. Matches must be sorted by descending score.
+
+    :param matches: Candidate matches, best first.
+    :param max_overlap: Maximum allowed intersection over the smaller box area.
+    :return: Kept matches, best first.
+    """
+    kept: list[Match] = []
+    for candidate in matches:
+        for other in kept:
+            overlap_w = min(candidate.x + candidate.width, other.x + other.width) - max(candidate.x, other.x)
+            overlap_h = min(candidate.y + candidate.height, other.y + other.height) - max(candidate.y, other.y)
+            if overlap_w <= 0 or overlap_h <= 0:
+                continue
+            smaller = min(candidate.width * candidate.height, other.width * other.height)
+            if overlap_w * overlap_h > max_overlap * smaller:
+                break
+        else:
+            kept.append(candidate)
+    return kept
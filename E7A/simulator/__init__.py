@@ -0,0 +1,23 @@
+from E7A.common.utils import lazy_attributes
+
+# The frame source needs cv2 and scrcpy, import on first access only.
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    'FakeMuMuManager': '.fake_manager',
+    'SimulatedMuMuEmulator': '.fake_manager',
+    'FrameSource': '.frame_source',
+    'FakeScrcpyClient': '.frame_source',
+    'SimulatedScrcpyManager': '.frame_source',
+    'synthetic_screens': '.screens',
+    'run_load': '.load_test'
+})
+
+
+__all__ = [
+    'FakeMuMuManager',
+    'SimulatedMuMuEmulator',
+    'FrameSource',
+    'FakeScrcpyClient',
+    'SimulatedScrcpyManager',
+    'synthetic_screens',
+    'run_load'
+]
@@ -0,0 +1,320 @@
+"""
+Fake MuMuManager speaking the JSON of the real one, for load tests without MuMu VMs.
+
+In process:
+
+    manager = FakeMuMuManager.create(count=16, latency=0.05)
+    emulator = SimulatedMuMuEmulator(manager)
+
+As a command line replacing MuMuManager.exe, state is kept in a directory shared by all calls:
+
+    FakeMuMuManager.create("temp/sim", count=16)
+    MuMuEmulator(manager_command=FakeMuMuManager.command("temp/sim"))
+"""
+import os
+import sys
+import json
+import time
+import random
+import shlex
+import subprocess
+import threading
+from typing import Callable, Optional, Sequence
+
+from E7A.emulator.mumu_emulator import MuMuEmulator
+
+# Apps installed on every simulated VM.
+DEFAULT_APPS = {
+    "com.stove.epic7.google": {"app_name": "第七史诗", "version": "1.0.900"},
+    "com.android.settings": {"app_name": "设置", "version": "12"},
+    "com.mumu.launcher": {"app_name": "MuMu桌面", "version": "4.0"},
+}
+LAUNCHER_PACKAGE = "com.mumu.launcher"
+ADB_BASE_PORT = 16384
+
+
+class FakeMuMuManager:
+    """
+    State of the simulated VMs and the command interpreter of the fake MuMuManager.
+
+    Supported commands, as sent by MuMuEmulator:
+        info -v <index|all>
+        control -v <index> launch|shutdown
+        control -v <index|all> app info -i
+        control -v <index> app info -pkg <pkg>
+        control -v <index> app launch|close -pkg <pkg>
+        adb -v <index> -c <adb command...>
+    """
+    def __init__(
+            self,
+            state_dir: Optional[str] = None,
+            count: int = 1,
+            latency: float = 0.0,
+            jitter: float = 0.0,
+            failure_rate: float = 0.0,
+            boot_time: float = 0.0,
+            running: bool = True,
+            seed: Optional[int] = None
+    ):
+        """
+        :param state_dir: Directory holding the state of every VM, None to keep it in memory.
+        :param count: Number of VMs, ignored if state_dir already holds a fleet.
+        :param latency: Mean seconds each command takes.
+        :param jitter: Standard deviation of the latency.
+        :param failure_rate: Probability that a command fails with a non-zero exit code and no output.
+        :param boot_time: Seconds between launch and "start_finished".
+        :param running: Whether the VMs are running from the start.
+        :param seed: Random seed of latency and failures.
+        """
+        self.state_dir = state_dir
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._vms: dict[int, dict] = {}
+        self.listeners: list[Callable[[int, list[str]], None]] = []
+
+        settings_path = os.path.join(state_dir, "settings.json") if state_dir else None
+        if settings_path and os.path.exists(settings_path):
+            with open(settings_path, "r", encoding="utf-8") as f:
+                settings = json.load(f)
+            self.latency, self.jitter = settings["latency"], settings["jitter"]
+            self.failure_rate, self.boot_time = settings["failure_rate"], settings["boot_time"]
+            self.count = settings["count"]
+        else:
+            self.latency, self.jitter, self.failure_rate, self.boot_time = latency, jitter, failure_rate, boot_time
+            self.count = count
+            now = time.time() if running else None
+            for index in range(count):
+                self._vms[index] = {
+                    "index": index,
+                    "name": f"MuMu安卓设备-{index}",
+                    "launch_time": now - boot_time if now is not None else None,
+                    "active": LAUNCHER_PACKAGE if running else None,
+                    "running_apps": [LAUNCHER_PACKAGE] if running else [],
+                    "inputs": 0,
+                }
+            if state_dir:
+                os.makedirs(state_dir, exist_ok=True)
+                self._save_settings()
+                for index in self._vms:
+                    self._save(index)
+
+    @classmethod
+    def create(cls, state_dir: Optional[str] = None, count: int = 1, **kwargs) -> "FakeMuMuManager":
+        """
+        Create a new fleet, replacing the state left in state_dir by a previous one.
+        """
+        if state_dir and os.path.isdir(state_dir):
+            for file_name in os.listdir(state_dir):
+                if file_name.endswith(".json"):
+                    os.remove(os.path.join(state_dir, file_name))
+        return cls(state_dir, count, **kwargs)
+
+    @staticmethod
+    def command(state_dir: str) -> list[str]:
+        """
+        :return: manager_command of MuMuEmulator running this module on state_dir.
+        """
+        return [sys.executable, "-m", "E7A.simulator.fake_manager", "--state", state_dir, "--"]
+
+    def configure(self, **settings) -> None:
+        """
+        Change latency, jitter, failure_rate or boot_time, also for the command line calls sharing state_dir.
+        """
+        for name, value in settings.items():
+            if name not in ("latency", "jitter", "failure_rate", "boot_time"):
+                raise ValueError(f"Unknown simulator setting: {name}")
+            setattr(self, name, value)
+        if self.state_dir:
+            self._save_settings()
+
+    def execute(self, args: Sequence[str]) -> subprocess.CompletedProcess:
+        """
+        Run one MuMuManager command.
+
+        :param args: Command arguments without the executable, e.g. ["info", "-v", "all"].
+        :return: CompletedProcess with the JSON output as bytes.
+        """
+        args = list(args)
+        delay = max(0.0, self._random.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+        if delay:
+            time.sleep(delay)
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            return subprocess.CompletedProcess(args, 1, b"", b"simulated MuMuManager failure")
+        try:
+            output = self._dispatch(args)
+        except (KeyError, ValueError, IndexError) as e:
+            return subprocess.CompletedProcess(args, 1, b"", f"bad command {args}: {e}".encode("utf-8"))
+        return subprocess.CompletedProcess(args, 0, json.dumps(output, ensure_ascii=False).encode("utf-8"), b"")
+
+    def _dispatch(self, args: list[str]):
+        if args[1] != "-v":
+            raise ValueError("missing -v")
+        target = args[2]
+        match args[0], args[3:]:
+            case "info", []:
+                return self._for_targets(target, self._emulator_info)
+            case "control", ["launch"]:
+                return self._update_vm(int(target), self._launch)
+            case "control", ["shutdown"]:
+                return self._update_vm(int(target), self._shutdown)
+            case "control", ["app", "info", "-i"]:
+                return self._for_targets(target, self._apps_info)
+            case "control", ["app", "info", "-pkg", pkg]:
+                vm = self._load(int(target))
+                if pkg not in DEFAULT_APPS:
+                    return {"state": "not_installed"}
+                return {"state": "running" if pkg in vm["running_apps"] else "stopped"}
+            case "control", ["app", "launch", "-pkg", pkg]:
+                return self._update_vm(int(target), lambda vm: self._launch_app(vm, pkg))
+            case "control", ["app", "close", "-pkg", pkg]:
+                return self._update_vm(int(target), lambda vm: self._close_app(vm, pkg))
+            case "adb", ["-c", *command]:
+                index = int(target)
+                result = self._update_vm(index, self._input)
+                for listener in self.listeners:
+                    listener(index, command)
+                return result
+        raise ValueError("unknown command")
+
+    def _for_targets(self, target: str, describe: Callable[[dict], dict]) -> dict:
+        if target == "all":
+            return {str(index): describe(self._load(index)) for index in range(self.count)}
+        return describe(self._load(int(target)))
+
+    def _state(self, vm: dict) -> Optional[str]:
+        if vm["launch_time"] is None:
+            return None
+        return "start_finished" if time.time() - vm["launch_time"] >= self.boot_time else "starting_rom"
+
+    def _emulator_info(self, vm: dict) -> dict:
+        index = vm["index"]
+        info = {
+            "index": str(index),
+            "name": vm["name"],
+            "is_process_started": vm["launch_time"] is not None,
+            "is_android_started": self._state(vm) == "start_finished",
+            "disk_size_bytes": 4 * 1024 ** 3,
+            "created_timestamp": 1700000000000000,
+            "hyperv_enabled": False,
+            "vt_enabled": True,
+            "is_main": index == 0,
+        }
+        if vm["launch_time"] is not None:
+            info.update({
+                "player_state": self._state(vm),
+                "pid": 10000 + index,
+                "headless_pid": 20000 + index,
+                "launch_time": int(vm["launch_time"] * 1000000),
+                "launch_err_code": 0,
+                "launch_err_msg": "",
+            })
+            if info["is_android_started"]:
+                info.update({"adb_host_ip": "127.0.0.1", "adb_port": ADB_BASE_PORT + 32 * index})
+        return info
+
+    def _apps_info(self, vm: dict) -> dict:
+        if self._state(vm) != "start_finished":
+            return {"errcode": -1, "errmsg": "android not started"}
+        info = dict(DEFAULT_APPS)
+        if vm["active"] is not None:
+            info["active"] = vm["active"]
+        return info
+
+    @staticmethod
+    def _launch(vm: dict) -> dict:
+        if vm["launch_time"] is None:
+            vm["launch_time"] = time.time()
+            vm["active"] = LAUNCHER_PACKAGE
+            vm["running_apps"] = [LAUNCHER_PACKAGE]
+        return {"errcode": 0}
+
+    @staticmethod
+    def _shutdown(vm: dict) -> dict:
+        vm["launch_time"] = None
+        vm["active"] = None
+        vm["running_apps"] = []
+        return {"errcode": 0}
+
+    @staticmethod
+    def _launch_app(vm: dict, pkg: str) -> dict:
+        if pkg not in vm["running_apps"]:
+            vm["running_apps"].append(pkg)
+        vm["active"] = pkg
+        return {"errcode": 0}
+
+    @staticmethod
+    def _close_app(vm: dict, pkg: str) -> dict:
+        if pkg in vm["running_apps"] and pkg != LAUNCHER_PACKAGE:
+            vm["running_apps"].remove(pkg)
+        if vm["active"] == pkg:
+            vm["active"] = LAUNCHER_PACKAGE
+        return {"errcode": 0}
+
+    @staticmethod
+    def _input(vm: dict) -> dict:
+        vm["inputs"] += 1
+        return {"errcode": 0}
+
+    def _update_vm(self, index: int, update: Callable[[dict], dict]) -> dict:
+        # Each VM is usually driven by one thread, the lock only guards concurrent in-process callers.
+        with self._lock:
+            vm = self._load(index)
+            result = update(vm)
+            self._save(index)
+        return result
+
+    def _save_settings(self) -> None:
+        with open(os.path.join(self.state_dir, "settings.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "latency": self.latency, "jitter": self.jitter, "failure_rate": self.failure_rate,
+                "boot_time": self.boot_time, "count": self.count
+            }, f)
+
+    def _vm_path(self, index: int) -> str:
+        return os.path.join(self.state_dir, f"vm_{index}.json")
+
+    def _load(self, index: int) -> dict:
+        if not 0 <= index < self.count:
+            raise KeyError(index)
+        if self.state_dir:
+            with open(self._vm_path(index), "r", encoding="utf-8") as f:
+                self._vms[index] = json.load(f)
+        return self._vms[index]
+
+    def _save(self, index: int) -> None:
+        if self.state_dir:
+            # Written to a temporary file first so that concurrent readers never see half a file.
+            path = self._vm_path(index)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self._vms[index], f, ensure_ascii=False)
+            os.replace(temp_path, path)
+
+
+class SimulatedMuMuEmulator(MuMuEmulator):
+    """
+    MuMuEmulator answered by a FakeMuMuManager in the same process, without spawning processes.
+    """
+    def __init__(self, manager: FakeMuMuManager, logger=None):
+        self.manager = manager
+        super().__init__(logger)
+
+    def _run_command(self, command: str, **kwargs) -> subprocess.CompletedProcess:
+        return self.manager.execute(shlex.split(command)[1:])
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if "--" not in argv or argv[:1] != ["--state"]:
+        sys.stderr.write("usage: python -m E7A.simulator.fake_manager --state DIR -- <MuMuManager arguments>\n")
+        return 2
+    separator = argv.index("--")
+    manager = FakeMuMuManager(argv[1])
+    process = manager.execute(argv[separator + 1:])
+    sys.stdout.buffer.write(process.stdout)
+    sys.stderr.buffer.write(process.stderr)
+    return process.returncode
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+import os
+import time
+import threading
+from typing import Callable, Optional
+
+import cv2
+import numpy
+
+from E7A.common import ScrcpyManager
+from E7A.simulator.screens import synthetic_screens
+
+
+class FrameSource:
+    """
+    Screens of a simulated emulator: recorded screenshots or synthetic ones.
+
+    A screen is shown still until poke() (e.g. a tap) or screen_time moves to the next one,
+    the change is a cross-fade of animation_time seconds, like a game transition.
+    """
+    def __init__(
+            self,
+            screens: Optional[list[numpy.ndarray]] = None,
+            width: int = 1280,
+            height: int = 720,
+            screen_time: float = 0.0,
+            animation_time: float = 0.5,
+            copy_frames: bool = True
+    ):
+        """
+        :param screens: BGR screens shown in turn, default synthetic_screens(width, height).
+        :param width: Width of the synthetic screens.
+        :param height: Height of the synthetic screens.
+        :param screen_time: Seconds after which the next screen is shown by itself, 0 to wait for poke().
+        :param animation_time: Seconds of the transition between two screens.
+        :param copy_frames: Return a new array for every frame, as a real decoder does.
+        """
+        self.screens = screens if screens else synthetic_screens(width, height)
+        self.height, self.width = self.screens[0].shape[:2]
+        self.screen_time = screen_time
+        self.animation_time = animation_time
+        self.copy_frames = copy_frames
+        self._lock = threading.Lock()
+        self._screen = 0
+        self._changed_at = time.monotonic() - animation_time
+        self.transitions = 0
+
+    @classmethod
+    def from_directory(cls, screen_dir: str, **kwargs) -> "FrameSource":
+        """
+        Replay recorded screens, every png of screen_dir in name order.
+        """
+        screens = []
+        for file_name in sorted(os.listdir(screen_dir)):
+            if file_name.lower().endswith(".png"):
+                image = cv2.imread(os.path.join(screen_dir, file_name), cv2.IMREAD_COLOR)
+                if image is not None:
+                    screens.append(image)
+        if not screens:
+            raise FileNotFoundError(f"No png screens in {screen_dir}")
+        return cls(screens, **kwargs)
+
+    def poke(self) -> None:
+        """
+        Move to the next screen, e.g. because a button was tapped.
+        """
+        with self._lock:
+            self._advance(time.monotonic())
+
+    def frame(self) -> numpy.ndarray:
+        """
+        :return: The current BGR frame.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self.screen_time and now - self._changed_at >= self.screen_time + self.animation_time:
+                self._advance(now)
+            current = self.screens[self._screen]
+            progress = (now - self._changed_at) / self.animation_time if self.animation_time else 1.0
+            if progress >= 1.0:
+                return current.copy() if self.copy_frames else current
+            previous = self.screens[self._screen - 1]
+        return cv2.addWeighted(previous, 1.0 - progress, current, progress, 0.0)
+
+    def _advance(self, now: float) -> None:
+        self._screen = (self._screen + 1) % len(self.screens)
+        self._changed_at = now
+        self.transitions += 1
+
+
+class FakeScrcpyClient:
+    """
+    Stand-in for scrcpy.Client that pushes frames of a FrameSource at max_fps from its own thread.
+    """
+    def __init__(self, source: FrameSource, max_fps: int = 30, device_name: str = "simulated"):
+        self.source = source
+        self.max_fps = max_fps
+        self.device_name = device_name
+        self.alive = False
+        self.last_frame: Optional[numpy.ndarray] = None
+        self._listeners: dict[str, list[Callable]] = {"frame": [], "init": []}
+        self._thread: Optional[threading.Thread] = None
+
+    def add_listener(self, event: str, listener: Callable) -> None:
+        self._listeners[event].append(listener)
+
+    def start(self, threaded: bool = True) -> None:
+        self.alive = True
+        for listener in self._listeners["init"]:
+            listener()
+        if threaded:
+            self._thread = threading.Thread(target=self._stream_loop, name="FakeScrcpyClient", daemon=True)
+            self._thread.start()
+        else:
+            self._stream_loop()
+
+    def stop(self) -> None:
+        self.alive = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def _stream_loop(self) -> None:
+        interval = 1.0 / self.max_fps
+        next_time = time.monotonic()
+        while self.alive:
+            self.last_frame = self.source.frame()
+            for listener in self._listeners["frame"]:
+                listener(self.last_frame)
+            next_time += interval
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Fell behind, like a real stream frames are dropped rather than queued.
+                next_time = time.monotonic()
+
+
+class SimulatedDevice:
+    """
+    The parts of AdbDevice used by ScrcpyManager and DeviceTransform.
+    """
+    def __init__(self, serial: str, width: int, height: int):
+        self.serial = serial
+        self._size = (width, height)
+
+    def window_size(self) -> tuple[int, int]:
+        return self._size
+
+
+class SimulatedScrcpyManager(ScrcpyManager):
+    """
+    ScrcpyManager streaming a FrameSource instead of an adb device.
+    """
+    def __init__(self, source: FrameSource, logger=None, max_frame: int = 30, serial: str = "simulated"):
+        self.source = source
+        super().__init__(logger, SimulatedDevice(serial, source.width, source.height), max_frame)
+
+    def connect(self, device, max_frame: int = 30):
+        self.client = FakeScrcpyClient(self.source, max_frame, device.serial)
+        self.client.add_listener("frame", self._on_frame)
+        self.client.add_listener("init", self._on_init)
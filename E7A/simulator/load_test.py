@@ -0,0 +1,233 @@
+"""
+Load test of the emulator control stack against simulated emulators.
+
+    python -m E7A.simulator.load_test --counts 1 4 16 64 --duration 10 --latency 0.05 --frames
+"""
+import sys
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+from typing import Optional
+
+from E7A.common import Logger
+from E7A.automator.headless_runner import LatencyStats
+from E7A.emulator import MuMuEmulator
+from E7A.simulator.fake_manager import FakeMuMuManager, SimulatedMuMuEmulator
+
+DEFAULT_COUNTS = [1, 2, 4, 8, 16, 32, 64]
+GAME_PACKAGE = "com.stove.epic7.google"
+
+
+class InstanceDriver:
+    """
+    Drive one simulated emulator like a headless session: poll info, tap, check the game state.
+    """
+    def __init__(
+            self,
+            emulator: MuMuEmulator,
+            index: int,
+            scrcpy_manager=None,
+            seed: Optional[int] = None
+    ):
+        self.emulator = emulator
+        self.emulator.target_emulator_index = index
+        self.index = index
+        self.scrcpy_manager = scrcpy_manager
+        self.stats: dict[str, LatencyStats] = {}
+        self.errors = 0
+        self.frames_processed = 0
+        self.frame_lag = LatencyStats()
+        self._random = random.Random(seed)
+
+    def run(self, stop_event: threading.Event) -> None:
+        consumer = None
+        if self.scrcpy_manager is not None:
+            self.scrcpy_manager.start()
+            consumer = threading.Thread(target=self._consume_frames, args=(stop_event,), daemon=True)
+            consumer.start()
+        try:
+            while not stop_event.is_set():
+                self._timed("update", self.emulator.update)
+                self._timed(
+                    "tap", self.emulator.send_tap, self._random.randrange(1280), self._random.randrange(720)
+                )
+                self._timed("app_state", self.emulator.get_app_state, self.index, GAME_PACKAGE)
+        finally:
+            if consumer is not None:
+                consumer.join()
+                self.scrcpy_manager.stop()
+
+    def _timed(self, name: str, function, *args) -> None:
+        start = time.perf_counter()
+        try:
+            function(*args)
+        except Exception:
+            # Failed commands leave no or broken output, which the control stack has to survive.
+            self.errors += 1
+            return
+        self.stats.setdefault(name, LatencyStats()).add(time.perf_counter() - start)
+
+    def _consume_frames(self, stop_event: threading.Event) -> None:
+        from E7A.graphics.frame_views import FrameViews
+        from E7A.graphics.settle_detector import SettleDetector
+
+        views = FrameViews()
+        views.require("load_test", {"gray"})
+        settle = SettleDetector()
+        seen = self.scrcpy_manager.frame_count
+        while not stop_event.is_set():
+            if not self.scrcpy_manager.wait_for_frame(seen, 0.5):
+                continue
+            seen = self.scrcpy_manager.frame_count
+            self.frame_lag.add(time.monotonic() - self.scrcpy_manager.frame_time)
+            views.update(self.scrcpy_manager.frame, seen)
+            settle.feed(views.gray, seen)
+            self.frames_processed += 1
+
+
+def run_load(
+        count: int,
+        duration: float,
+        mode: str = "inprocess",
+        frames: bool = False,
+        fps: int = 30,
+        state_dir: Optional[str] = None,
+        logger: Logger = None,
+        **manager_kwargs
+) -> dict:
+    """
+    Drive count simulated emulators in parallel for duration seconds.
+
+    :param count: Number of simulated emulators.
+    :param duration: Seconds of load.
+    :param mode: "inprocess" answers commands in this process, "process" spawns the fake MuMuManager per command.
+    :param frames: Also stream and consume synthetic frames for every instance.
+    :param fps: Frame rate of the streams.
+    :param state_dir: State directory of the "process" mode, default a temporary directory.
+    :param logger: Parent logger.
+    :param manager_kwargs: Latency, jitter, failure_rate... of FakeMuMuManager.
+    :return: Report with throughput, latency percentiles, errors and frame rates.
+    """
+    temp_dir = None
+    if mode == "process" and state_dir is None:
+        temp_dir = tempfile.TemporaryDirectory(prefix="e7a_sim_")
+        state_dir = temp_dir.name
+    # MuMuEmulator polls while it is created, failures are only injected once every instance exists.
+    failure_rate = manager_kwargs.pop("failure_rate", 0.0)
+    manager = FakeMuMuManager.create(state_dir if mode == "process" else None, count, **manager_kwargs)
+
+    sources = {}
+    if frames:
+        from E7A.simulator.frame_source import FrameSource
+        sources = {index: FrameSource() for index in range(count)}
+        # Taps move the synthetic screens on, so frames carry transitions as well as still screens.
+        manager.listeners.append(lambda index, command: sources[index].poke() if "tap" in command else None)
+
+    drivers = []
+    for index in range(count):
+        if mode == "process":
+            emulator = MuMuEmulator(logger, manager_command=FakeMuMuManager.command(state_dir))
+        else:
+            emulator = SimulatedMuMuEmulator(manager, logger)
+        scrcpy_manager = None
+        if frames:
+            from E7A.simulator.frame_source import SimulatedScrcpyManager
+            scrcpy_manager = SimulatedScrcpyManager(sources[index], logger, fps, f"sim-{index}")
+        drivers.append(InstanceDriver(emulator, index, scrcpy_manager, seed=index))
+
+    manager.configure(failure_rate=failure_rate)
+    stop_event = threading.Event()
+    threads = [
+        threading.Thread(target=driver.run, args=(stop_event,), name=f"LoadTest-{driver.index}", daemon=True)
+        for driver in drivers
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    stop_event.wait(duration)
+    stop_event.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if temp_dir is not None:
+        temp_dir.cleanup()
+
+    merged: dict[str, LatencyStats] = {}
+    for driver in drivers:
+        for name, stats in driver.stats.items():
+            merged.setdefault(name, LatencyStats()).samples.extend(stats.samples)
+    frame_lag = LatencyStats()
+    for driver in drivers:
+        frame_lag.samples.extend(driver.frame_lag.samples)
+    operations = sum(stats.count for stats in merged.values())
+    frames_processed = sum(driver.frames_processed for driver in drivers)
+    return {
+        "count": count,
+        "elapsed": elapsed,
+        "operations": operations,
+        "ops_per_second": operations / elapsed,
+        "errors": sum(driver.errors for driver in drivers),
+        "latency": merged,
+        "frames_per_second": frames_processed / elapsed,
+        "fps_per_instance": frames_processed / elapsed / count,
+        "frame_lag": frame_lag,
+    }
+
+
+def format_header(frames: bool = False) -> str:
+    header = f"{'VMs':>4} {'ops/s':>8} {'errors':>7} {'update p50/p95 ms':>18} {'tap p50/p95 ms':>16}"
+    if frames:
+        header += f" {'fps total':>10} {'fps/VM':>7} {'lag p95 ms':>11}"
+    return header
+
+
+def format_report(report: dict, frames: bool = False) -> str:
+    update = report["latency"].get("update", LatencyStats())
+    tap = report["latency"].get("tap", LatencyStats())
+    line = (
+        f"{report['count']:>4} {report['ops_per_second']:>8.1f} {report['errors']:>7} "
+        f"{update.percentile(50) * 1000:>8.1f}/{update.percentile(95) * 1000:<9.1f} "
+        f"{tap.percentile(50) * 1000:>7.1f}/{tap.percentile(95) * 1000:<8.1f}"
+    )
+    if frames:
+        line += (
+            f" {report['frames_per_second']:>10.1f} {report['fps_per_instance']:>7.1f} "
+            f"{report['frame_lag'].percentile(95) * 1000:>11.1f}"
+        )
+    return line
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Load test against simulated MuMu emulators.")
+    parser.add_argument("--counts", type=int, nargs="+", default=DEFAULT_COUNTS, help="Numbers of emulators.")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds of load per count.")
+    parser.add_argument("--mode", choices=["inprocess", "process"], default="inprocess",
+                        help="Answer commands in process or spawn the fake MuMuManager for each command.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean seconds per MuMuManager command.")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Standard deviation of the latency.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability of a failing command.")
+    parser.add_argument("--frames", action="store_true", help="Stream and consume synthetic frames.")
+    parser.add_argument("--fps", type=int, default=30, help="Frame rate of the streams.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the simulated latency and failures.")
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    # Command logging of 64 instances would dominate the measurement.
+    logger = Logger("LoadTest", logger_level=logging.WARNING)
+    print(format_header(args.frames), flush=True)
+    for count in args.counts:
+        report = run_load(
+            count, args.duration, args.mode, args.frames, args.fps, logger=logger,
+            latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate, seed=args.seed
+        )
+        print(format_report(report, args.frames), flush=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,23 @@
+"""
+Synthetic game screens, for the simulator and the matcher benchmarks. Only cv2 and numpy are needed.
+"""
+import cv2
+import numpy
+
+
+def synthetic_screens(width: int = 1280, height: int = 720, count: int = 4) -> list[numpy.ndarray]:
+    """
+    Distinct screens with a background, a banner and a lit button, enough texture for matching and probes.
+    """
+    screens = []
+    for i in range(count):
+        hue = int(180 * i / count)
+        screen = numpy.empty((height, width, 3), dtype=numpy.uint8)
+        screen[:] = cv2.cvtColor(numpy.uint8([[[hue, 120, 90]]]), cv2.COLOR_HSV2BGR)[0, 0]
+        cv2.rectangle(screen, (0, 0), (width, height // 8), (30, 30, 30), -1)
+        cv2.putText(screen, f"SCREEN {i}", (width // 20, height // 12), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 2)
+        button = (width * 7 // 10, height * 3 // 4, width * 9 // 10, height * 7 // 8)
+        cv2.rectangle(screen, button[:2], button[2:], (40, 180, 230), -1)
+        cv2.circle(screen, (width // 2, height // 2), height // 6, (255 - hue, 200, hue), 6)
+        screens.append(screen)
+    return screens
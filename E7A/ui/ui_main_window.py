@@ -1,29 +1,39 @@
-from adbutils import adb
-from adbutils.errors import AdbError
 from PyQt6.QtWidgets import QMainWindow, QApplication
 from PyQt6.QtCore import (
     Qt, QThread, pyqtSignal, pyqtSlot, QRunnable, QObject, QThreadPool, QTimer
 )
 
 from E7A.ui.ui_main_window_Qt_generated import Ui_UIMain
-from E7A.ui.utils import QTextBrowserHandler
-from E7A.common import Logger
+from E7A.ui.utils import QTextBrowserHandler, DiffCoalescer, EmulatorListModel, AppListModel
+from E7A.common import Logger, AdbDevicePool
 from E7A.emulator import MuMuEmulator
 
 
 class UIMain(QMainWindow, Ui_UIMain):
     def __init__(
             self,
-            logger: Logger
+            logger: Logger,
+            adb_pool: AdbDevicePool = None
     ):
         super().__init__()
         self.setupUi(self)
         self.logger = logger.get_child_logger(self.__class__.__name__)
+        # adb state and name are read from the pool cache, never from adb on the GUI thread.
+        self.adb_pool = adb_pool if adb_pool is not None else AdbDevicePool(self.logger)
         text_browser_handler = QTextBrowserHandler(self.log_textBrowser)
         text_browser_handler.setLevel(logger.level)
         text_browser_handler.setFormatter(self.logger.formatter)
         self.logger.addHandler(text_browser_handler)
 
+        # Lists are backed by models which apply diffs row by row, bursts of updates are coalesced.
+        self._emulator: MuMuEmulator = None
+        self._apps_source: tuple[int, bool] = None
+        self.emulator_model = EmulatorListModel(self)
+        self.app_model = AppListModel(self)
+        self.emulator_index_comboBox.setModel(self.emulator_model)
+        self.applist_combobox.setModel(self.app_model)
+        self._coalescer = DiffCoalescer(self._flush_updates, parent=self)
+
         self._setup_connections()
 
     def _setup_connections(self):
@@ -31,15 +41,45 @@ class UIMain(QMainWindow, Ui_UIMain):
 
     @pyqtSlot(MuMuEmulator)
     def on_emulator_info_updated(self, emulator: MuMuEmulator):
-        # Update available emulator indices.
-        self.emulator_index_comboBox.clear()
-        for index in emulator.available_emulators:
-            self.emulator_index_comboBox.addItem(str(index))
-        current_index = self.emulator_index_comboBox.findText(
-            str(emulator.target_emulator_index)
-        )
-        self.emulator_index_comboBox.setCurrentIndex(current_index)
+        self._emulator = emulator
+        self._coalescer.add("emulator_labels")
+
+    @pyqtSlot(MuMuEmulator)
+    def on_apps_info_updated(self, emulator: MuMuEmulator):
+        self._emulator = emulator
+        self._coalescer.add("app_labels")
+
+    @pyqtSlot(dict)
+    def on_emulators_diff(self, diff: dict):
+        self._coalescer.add("emulators", diff)
+
+    @pyqtSlot(dict)
+    def on_apps_diff(self, diff: dict):
+        self._coalescer.add("apps", diff)
+
+    def reset_models(self, emulator: MuMuEmulator):
+        """
+        Fill the emulator and app lists from the current records, diffs are applied on top of them.
+        """
+        self._emulator = emulator
+        self.emulator_model.reset(emulator.get_emulator_info("all"))
+        self.emulator_index_comboBox.setCurrentIndex(self.emulator_model.row_of(emulator.target_emulator_index))
+        self._apps_source = None
+        self._coalescer.add("emulator_labels")
+        self._coalescer.add("app_labels")
 
+    def _flush_updates(self, pending: dict[str, dict]):
+        emulator = self._emulator
+        if emulator is None:
+            return
+        if "emulators" in pending:
+            self.emulator_model.apply(pending["emulators"])
+        if pending.keys() & {"emulators", "emulator_labels"}:
+            self._update_emulator_labels(emulator)
+        if pending.keys() & {"emulators", "emulator_labels", "apps", "app_labels"}:
+            self._update_apps(emulator, pending.get("apps", {}))
+
+    def _update_emulator_labels(self, emulator: MuMuEmulator):
         # Update target emulator info.
         self.emulator_name_label.setText(emulator.target_emulator_info["name"])
         self.emulator_state_label.setText(emulator.target_emulator_state)
@@ -48,27 +88,14 @@ class UIMain(QMainWindow, Ui_UIMain):
         target_adb_ip, target_adb_port = emulator.target_emulator_adb_address
         if target_adb_ip and target_adb_port:
             adb_serial = f"{target_adb_ip}:{target_adb_port}"
-            adb_device = adb.device(serial=adb_serial)
-
-            try:
-                adb_state = adb_device.get_state()
-            except AdbError as e:
-                adb_state = e
-
-            try:
-                adb_name = adb_device.prop.name
-            except AdbError as e:
-                adb_name = e
+            adb_state = self.adb_pool.state(adb_serial)
+            adb_name = self.adb_pool.name(adb_serial) or ""
 
             self.adb_address_lineEdit.setText(adb_serial)
             self.adb_ip_label.setText(target_adb_ip)
             self.adb_port_label.setText(f"{target_adb_port}")
-            self.adb_device_label.setText(
-                f"{adb_name}".replace(f" '{adb_serial}'", "")
-            )
-            self.adb_state_label.setText(
-                f"{adb_state}".replace(f" '{adb_serial}'", "")
-            )
+            self.adb_device_label.setText(adb_name)
+            self.adb_state_label.setText(adb_state)
 
         else:
             self.adb_address_lineEdit.setText("")
@@ -77,25 +104,15 @@ class UIMain(QMainWindow, Ui_UIMain):
             self.adb_device_label.setText("")
             self.adb_state_label.setText("")
 
-    @pyqtSlot(MuMuEmulator)
-    def on_apps_info_updated(self, emulator: MuMuEmulator):
-        # update app state
-        app_info = emulator.target_emulator_apps_info
-        previous_selected_app = self.applist_combobox.currentText()
-        self.applist_combobox.clear()
-        if len(app_info) == 0:
-            self.activate_app_label.setText("")
-        for pkg, info in app_info.items():
-            if pkg == "active":
-                if info in app_info.keys():
-                    self.activate_app_label.setText(app_info[info]["app_name"])
-                else:
-                    self.activate_app_label.setText(info)
-            else:
-                self.applist_combobox.addItem(info["app_name"])
-        current_index = self.applist_combobox.findText(previous_selected_app)
-        current_index = max(0, current_index)
-        self.applist_combobox.setCurrentIndex(current_index)
+    def _update_apps(self, emulator: MuMuEmulator, apps_diff: dict):
+        # Apps are only listed for a running target, another target or a state change reloads the list.
+        source = (emulator.target_emulator_index, emulator.target_emulator_state == "start_finished")
+        if source != self._apps_source:
+            self._apps_source = source
+            self.app_model.reset(emulator.target_emulator_apps_info or {})
+        elif source[1] and apps_diff.get(source[0]):
+            self.app_model.apply(apps_diff[source[0]])
+        self.activate_app_label.setText(self.app_model.active_app_name)
 
     def closeEvent(self, event):
         """
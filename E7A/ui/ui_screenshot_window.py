@@ -1,8 +1,10 @@
 import sys
+import threading
 import traceback
 from datetime import time
 
 import cv2
+import numpy
 import scrcpy
 import time
 from numpy import ndarray
@@ -18,6 +20,7 @@ from E7A.ui.ui_screenshot_window_Qt_generated import Ui_UIScreenshotWindow
 from E7A.emulator import MuMuEmulator
 from E7A.common.logger import Logger
 from E7A.common.config import Config
+from E7A.common.frame_pool import memory_accounting
 
 
 class UIScreenshotWindow(QMainWindow, Ui_UIScreenshotWindow):
@@ -41,6 +44,13 @@ class UIScreenshotWindow(QMainWindow, Ui_UIScreenshotWindow):
         self.screenshot_item = QGraphicsPixmapItem()
         self.screenshot_scene.addItem(self.screenshot_item)
 
+        # One display buffer wrapped by one QImage, reused across frames. The pixmap is new per frame,
+        # the scene item shares the one it was given, so converting into it would detach anyway.
+        self._display_buffer: Optional[ndarray] = None
+        self._display_image: Optional[QImage] = None
+        self._pending_frame: Optional[ndarray] = None
+        self._pending_lock = threading.Lock()
+
         adb.connect(Config.emulator.adb_address)
         self.scrcpy_client = scrcpy.Client()
         self.scrcpy_client.add_listener(scrcpy.EVENT_FRAME, self.on_frame)
@@ -61,7 +71,8 @@ class UIScreenshotWindow(QMainWindow, Ui_UIScreenshotWindow):
     def update_screenshot(self):
         state, info = self.emulator.get_screenshot_adb(
             file_name=Config.ui.screenshot_file_name,
-            save_dir_windows=Config.ui.screenshot_save_dir
+            save_dir_windows=Config.profile(self.emulator.target_emulator_index).screenshot_save_dir
+            or Config.ui.screenshot_save_dir
         )
         if state != 0:
             self.logger.error(f"Getting screenshot through ADB, failed {info.stdout}")
@@ -97,33 +108,47 @@ class UIScreenshotWindow(QMainWindow, Ui_UIScreenshotWindow):
     def on_frame(self, frame):
         """
         Slot for handling new frames from the scrcpy client.
+        Only the newest frame is kept, frames arriving while the UI is busy are skipped instead of queued.
         """
-        self.on_frame_signal.emit(frame)
+        if frame is None:
+            return
+        with self._pending_lock:
+            pending = self._pending_frame
+            self._pending_frame = frame
+        if pending is None:
+            self.on_frame_signal.emit(None)
 
     @pyqtSlot(object)
     def update_frame(self, frame: Optional[ndarray]):
         """
         Update the displayed frame in the UI.
 
-        :param frame: The new frame to be displayed.
+        :param frame: The new frame to be displayed, None for the latest frame of the scrcpy client.
         """
-        if frame is not None:
-            height, width, channels = frame.shape
-            bytes_per_line = width * 3
-            q_image = QImage(
-                frame,
+        if frame is None:
+            with self._pending_lock:
+                frame, self._pending_frame = self._pending_frame, None
+        if frame is None:
+            return
+        height, width = frame.shape[:2]
+        resized = self._display_buffer is None or self._display_buffer.shape != frame.shape
+        if resized:
+            self._display_buffer = numpy.empty(frame.shape, dtype=numpy.uint8)
+            self._display_image = QImage(
+                self._display_buffer.data,
                 width,
                 height,
-                bytes_per_line,
+                width * 3,
                 QImage.Format.Format_BGR888
             )
-            q_image = QPixmap.fromImage(q_image)
-            self.screenshot_item.setPixmap(q_image)
+            memory_accounting.set("ui", self, 2 * self._display_buffer.nbytes)    # buffer and pixmap
+        numpy.copyto(self._display_buffer, frame)
+        self.screenshot_item.setPixmap(QPixmap.fromImage(self._display_image))
+        if resized:
             self.screenshot_view.fitInView(
                 self.screenshot_scene.itemsBoundingRect(),
                 Qt.AspectRatioMode.KeepAspectRatio
             )
-            self.screenshot_scene.update()
 
     def track_screen(self):
         """
@@ -1,2 +1,3 @@
 from .text_browser_handler import QTextBrowserHandler
 from .workers import ThreadWorker, RunnableWorker
+from .info_models import DiffCoalescer, EmulatorListModel, AppListModel
@@ -0,0 +1,199 @@
+import bisect
+from typing import Any, Callable, Optional
+
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QObject, QTimer
+
+# About one frame at 60 Hz, updates arriving within it are applied together.
+COALESCE_INTERVAL_MS = 16
+
+
+def merge_diff(pending: dict, diff: dict) -> None:
+    """
+    Merge an InfoTable diff into a pending one, later values win.
+
+    :param pending: Pending diff, modified in place.
+    :param diff: Index to changed fields, None for a removed emulator.
+    """
+    for index, changed in diff.items():
+        if changed is None or pending.get(index) is None:
+            pending[index] = None if changed is None else dict(changed)
+        else:
+            pending[index].update(changed)
+
+
+class DiffCoalescer(QObject):
+    """
+    Collect diffs of several channels and hand them over at most once per interval.
+    Must be used from the GUI thread, signals from worker threads are queued there anyway.
+    """
+    def __init__(
+            self,
+            flush: Callable[[dict[str, dict]], None],
+            interval_ms: int = COALESCE_INTERVAL_MS,
+            parent: Optional[QObject] = None
+    ):
+        """
+        :param flush: Called with channel name to merged diff.
+        :param interval_ms: Milliseconds updates are collected before flushing.
+        :param parent: Parent QObject.
+        """
+        super().__init__(parent)
+        self._flush_callback = flush
+        self._pending: dict[str, dict] = {}
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.flush)
+
+    def add(self, channel: str, diff: Optional[dict] = None) -> None:
+        """
+        :param channel: Channel name, e.g. "emulators".
+        :param diff: Diff to merge, None only marks the channel as dirty.
+        """
+        merge_diff(self._pending.setdefault(channel, {}), diff or {})
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self) -> None:
+        self._timer.stop()
+        pending, self._pending = self._pending, {}
+        if pending:
+            self._flush_callback(pending)
+
+
+class EmulatorListModel(QAbstractListModel):
+    """
+    Emulator indices sorted ascending, the display text is the index and the tooltip the emulator name.
+    """
+    def __init__(self, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self._indices: list[int] = []
+        self._names: dict[int, str] = {}
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._indices)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        emulator_index = self._indices[index.row()]
+        match role:
+            case Qt.ItemDataRole.DisplayRole:
+                return str(emulator_index)
+            case Qt.ItemDataRole.UserRole:
+                return emulator_index
+            case Qt.ItemDataRole.ToolTipRole:
+                return self._names.get(emulator_index)
+        return None
+
+    def row_of(self, emulator_index: int) -> int:
+        """
+        :return: Row of the emulator, -1 if it is not listed.
+        """
+        row = bisect.bisect_left(self._indices, emulator_index)
+        if row < len(self._indices) and self._indices[row] == emulator_index:
+            return row
+        return -1
+
+    def reset(self, records: dict) -> None:
+        """
+        :param records: Emulator index to EmulatorInfo.
+        """
+        self.beginResetModel()
+        self._indices = sorted(records)
+        self._names = {index: record.get("name") for index, record in records.items()}
+        self.endResetModel()
+
+    def apply(self, diff: dict) -> None:
+        """
+        Insert, remove or refresh only the rows in the diff.
+
+        :param diff: Emulator index to changed fields, None for a removed emulator.
+        """
+        for emulator_index, changed in sorted(diff.items()):
+            row = self.row_of(emulator_index)
+            if changed is None:
+                if row >= 0:
+                    self.beginRemoveRows(QModelIndex(), row, row)
+                    del self._indices[row]
+                    self._names.pop(emulator_index, None)
+                    self.endRemoveRows()
+            elif row < 0:
+                row = bisect.bisect_left(self._indices, emulator_index)
+                self.beginInsertRows(QModelIndex(), row, row)
+                self._indices.insert(row, emulator_index)
+                self._names[emulator_index] = changed.get("name")
+                self.endInsertRows()
+            elif "name" in changed:
+                self._names[emulator_index] = changed["name"]
+                model_index = self.index(row)
+                self.dataChanged.emit(model_index, model_index, [Qt.ItemDataRole.ToolTipRole])
+
+
+class AppListModel(QAbstractListModel):
+    """
+    Apps installed on one emulator in install order, the display text is the app name and UserRole the package.
+    """
+    def __init__(self, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self._packages: list[str] = []
+        self._infos: dict[str, dict] = {}
+        self.active: Optional[str] = None
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._packages)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        package = self._packages[index.row()]
+        match role:
+            case Qt.ItemDataRole.DisplayRole:
+                return self._infos[package].get("app_name", package)
+            case Qt.ItemDataRole.UserRole | Qt.ItemDataRole.ToolTipRole:
+                return package
+        return None
+
+    @property
+    def active_app_name(self) -> str:
+        """
+        :return: App name of the active package, the package itself if it is not listed, "" if none.
+        """
+        if self.active is None:
+            return ""
+        return self._infos.get(self.active, {}).get("app_name", self.active)
+
+    def reset(self, app_info) -> None:
+        """
+        :param app_info: AppInfo or dict of package -> info plus "active", as MuMuEmulator.target_emulator_apps_info.
+        """
+        self.beginResetModel()
+        self._infos = {package: info for package, info in app_info.items() if isinstance(info, dict)}
+        self._packages = list(self._infos)
+        self.active = app_info.get("active")
+        self.endResetModel()
+
+    def apply(self, changed: dict) -> None:
+        """
+        :param changed: Changed keys of one AppInfo, removed packages map to None.
+        """
+        for key, value in changed.items():
+            if key == "active":
+                self.active = value
+            elif isinstance(value, dict):
+                if key in self._infos:
+                    self._infos[key] = value
+                    model_index = self.index(self._packages.index(key))
+                    self.dataChanged.emit(model_index, model_index, [Qt.ItemDataRole.DisplayRole])
+                else:
+                    row = len(self._packages)
+                    self.beginInsertRows(QModelIndex(), row, row)
+                    self._packages.append(key)
+                    self._infos[key] = value
+                    self.endInsertRows()
+            elif value is None and key in self._infos:
+                row = self._packages.index(key)
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._packages[row]
+                del self._infos[key]
+                self.endRemoveRows()
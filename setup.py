@@ -17,7 +17,7 @@ setup(
     entry_points={
         'console_scripts': [
             # 如果有命令行脚本的话，可以在这里定义
-            # 'your_command=module:function',
+            'e7a=E7A.cli:main',
         ],
     },
 )